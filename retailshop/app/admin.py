@@ -1,16 +1,71 @@
 # retailshop/app/admin.py
 
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem 
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import BooleanField, Count, Exists, ExpressionWrapper, OuterRef, Q
+from django.db.models.functions import Upper
+from django.utils.functional import cached_property
+from .models import Category, Product, Cart, CartItem, Order, Job
+from .jobs import enqueue
 # Ensure all necessary models are imported
 
+
+# --- 0. Paginator for big tables ---
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoids a full COUNT(*) on the unfiltered changelist of a big table.
+    PostgreSQL: reads the planner's row estimate from pg_class (instant, roughly right).
+    Other databases: MAX(id), which is exact until rows get deleted.
+    Filtered/searched lists still get a real count, since those are usually small.
+    """
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+
+        model = self.object_list.model
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [model._meta.db_table])
+                row = cursor.fetchone()
+            # reltuples is -1/0 until the table has been ANALYZEd
+            if row and row[0] > 0:
+                return row[0]
+            return super().count
+
+        last_id = model._default_manager.using(self.object_list.db).order_by('-pk').values_list('pk', flat=True).first()
+        return last_id or 0
+
+    def page(self, number):
+        """
+        The estimate can be too high (deleted rows), so the last page links may point past
+        the real end. Such a page comes back empty: count for real then, and serve the
+        real last page instead of an empty list.
+        """
+        page = super().page(number)
+        if page.number > 1 and not page.object_list:
+            self.count = super().count
+            self.__dict__.pop('num_pages', None)  # cached from the estimate
+            page = super().page(max(self.num_pages, 1))
+        return page
+
+    def get_elided_page_range(self, number=1, **kwargs):
+        # The changelist passes the page number from the URL, which page() may have moved back
+        return super().get_elided_page_range(min(int(number), self.num_pages), **kwargs)
+
 # --- 1. Custom Admin for Category ---
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'slug', 'banner_image')
+    list_display = ('name', 'parent', 'product_count', 'slug', 'banner_image')
+    list_select_related = ('parent',)
     prepopulated_fields = {'slug': ('name',)} 
-    fields = ('name', 'slug', 'description', 'banner_image')
+    fields = ('name', 'slug', 'parent', 'description', 'banner_image', 'product_count')
+    readonly_fields = ('product_count',)
 
 
 # --- 2. Custom Admin for Product (Errors Fixed) ---
@@ -19,15 +74,42 @@ class CategoryAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     # REMOVED: 'is_active' (since it likely doesn't exist)
     list_display = ('name', 'category', 'price', 'stock')
+    # Fetch each row's category in the same query (no per-row lookup for the 'category' column)
+    list_select_related = ('category',)
     
     # REMOVED: 'is_active', 'created_at' (since they likely don't exist)
     list_filter = ('category',) 
     
-    search_fields = ('name', 'description', 'category__name') 
+    # Search only what an index can answer: exact sku or a name prefix (see get_search_results).
+    # description/category__name searches were '%term%' LIKE scans over the whole table;
+    # use the category filter on the right instead.
+    search_fields = ('sku', 'name') 
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skips the extra COUNT(*) on filtered pages
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        # Case-insensitive prefix match written as a RANGE on UPPER(name), so the database
+        # can walk the product_name_upper_idx index (LIKE 'x%' can't use it on every backend)
+        prefix = term.upper()
+        by_name = queryset.alias(name_upper=Upper('name')).filter(
+            name_upper__gte=prefix, name_upper__lt=prefix + '\U0010ffff'
+        )
+        by_sku = queryset.filter(sku=term)  # unique index
+        return by_name | by_sku, False
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Thumbnails are built by a background worker, not while the admin waits
+        if 'image' in form.changed_data and obj.image:
+            enqueue('media.product_thumbnail', {'image': obj.image.name}, idempotency_key=f"thumb:{obj.image.name}")
     
     fieldsets = (
         (None, {
-            'fields': ('name', 'category', 'description', 'image')
+            'fields': ('name', 'sku', 'category', 'description', 'image')
         }),
         ('Pricing & Stock', {
             'fields': ('price', 'stock')
@@ -57,12 +139,43 @@ class CartAdmin(admin.ModelAdmin):
     # REMOVED: 'updated_at' from readonly_fields (since it likely doesn't exist)
     readonly_fields = ('user', 'created_at')
 
+    list_select_related = ('user',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # Both columns are computed for the whole page in ONE query instead of per row.
+        # Carts are kept (one per user) and checkout empties them: a cart is checked out
+        # while it is empty and its user has ordered. Adding an item re-opens it.
+        return super().get_queryset(request).annotate(
+            _item_count=Count('items'),
+        ).annotate(
+            _is_checked_out=ExpressionWrapper(
+                Q(_item_count=0) & Exists(Order.objects.filter(user=OuterRef('user'))),
+                output_field=BooleanField(),
+            ),
+        )
+
     def item_count(self, obj):
-        return obj.items.count()
+        return obj._item_count
     item_count.short_description = 'Items in Cart'
+    item_count.admin_order_field = '_item_count'
     
     def is_checked_out(self, obj):
-        # Placeholder logic
-        return False
+        return obj._is_checked_out
     is_checked_out.boolean = True
-    is_checked_out.short_description = 'Order Placed'
\ No newline at end of file
+    is_checked_out.short_description = 'Order Placed'
+    is_checked_out.admin_order_field = '_is_checked_out'
+
+
+# --- 4. Background Jobs (read-only view of the queue) ---
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('=idempotency_key',)
+    ordering = ('-id',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    readonly_fields = [f.name for f in Job._meta.fields]
@@ -0,0 +1,393 @@
+# retailshop/app/analytics.py
+# Sales analytics for the staff dashboard, over any date range.
+#
+# Orders and order lines are pulled as columns (raw cursor + fetchmany, no model instances
+# or per-row Django converters) into NumPy arrays, one calendar month at a time, and every
+# figure is computed with vectorised operations (bincount, unique, cumsum).
+# Finished months' columns are cached, and so is each report (per range). Both carry the
+# version of every month they cover: saving or deleting an order (a late payment, a refund)
+# bumps its month's version, which orphans them (see invalidate_sales_month in app/models.py).
+#
+# Old orders live in ArchivedOrder/ArchivedOrderItem (app/order_archive.py). Every read
+# here is one UNION ALL over the hot and archive tables: a single statement, so an order
+# being moved while a report loads is counted exactly once, and totals don't change when
+# orders are archived.
+#
+# NumPy is imported inside the functions, so only processes that build a report load it.
+
+import csv
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import BigIntegerField, Func
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Category, Order, OrderItem, Product
+
+# Orders that count as a sale (M-Pesa paid, cash on delivery, delivered)
+SALES_STATUSES = ('Paid', 'Processing', 'Complete')
+FETCH_CHUNK_SIZE = 20000
+MOVING_AVERAGE_DAYS = 7
+TOP_SELLERS = 10
+
+# A range that includes today keeps changing; a range fully in the past doesn't
+REPORT_CACHE_TIMEOUT_OPEN = 5 * 60
+REPORT_CACHE_TIMEOUT_CLOSED = 24 * 60 * 60
+
+# The longest range a report covers; an earlier ?start= is cut to the most recent days
+MAX_REPORT_DAYS = 3 * 366
+
+
+# --- RANGES ---
+
+def range_bounds(start, end):
+    """Aware datetimes [start 00:00, day after end 00:00) - a plain range on created_at."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start, time.min), tz),
+        timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min), tz),
+    )
+
+
+def clamp_range(start, end):
+    """[start, end] with end no later than today and at most MAX_REPORT_DAYS long."""
+    today = timezone.localdate()
+    end = min(end, today)
+    start = min(start, end)
+    if (end - start).days >= MAX_REPORT_DAYS:
+        start = end - timedelta(days=MAX_REPORT_DAYS - 1)
+    return start, end
+
+
+def months_between(start, end):
+    """The first day of every calendar month [start, end] touches."""
+    months = []
+    month = start.replace(day=1)
+    while month <= end:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    return months
+
+
+# --- CACHE VERSIONS ---
+
+def month_version_key(month_start):
+    return f"sales-month-version:{month_start:%Y-%m}"
+
+
+def month_versions(months):
+    """The cached version of each month, in one round trip (two when some are new)."""
+    keys = [month_version_key(month) for month in months]
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        # add(), not set(): a bump that lands in between must not be overwritten
+        for key in missing:
+            cache.add(key, 1, None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, 1) for key in keys]
+
+
+def bump_sales_month_version(created_at):
+    """Expires the cached columns and reports of the month an order was placed in."""
+    key = month_version_key(timezone.localtime(created_at).date().replace(day=1))
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not cached yet (or evicted): any new value works, old entries used a different one
+        cache.set(key, int(timezone.now().timestamp()), None)
+
+
+# --- COLUMNAR LOADING ---
+
+class EpochSeconds(Func):
+    """
+    A datetime column as Unix seconds, computed by the database. Bucketing plain integers
+    in NumPy is far cheaper than TruncDate, which on SQLite calls back into Python per row.
+    """
+    output_field = BigIntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(strftime('%%%%s', %(expressions)s) AS INTEGER)", **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(EXTRACT(EPOCH FROM %(expressions)s) AS BIGINT)", **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="UNIX_TIMESTAMP(%(expressions)s)", **extra_context)
+
+
+def fetch_columns(queryset, *fields):
+    """
+    Runs the queryset's SQL on a raw cursor and returns one list per field.
+    Skips Django's per-value converters: money comes back as floats or Decimals,
+    both of which NumPy takes as they are.
+    """
+    sql, params = queryset.values_list(*fields).query.sql_with_params()
+    columns = [[] for _ in fields]
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        while rows := cursor.fetchmany(FETCH_CHUNK_SIZE):
+            for column, values in zip(columns, zip(*rows)):
+                column.extend(values)
+    return columns
+
+
+def hot_and_archived(queryset_for, hot_model, archive_model):
+    """queryset_for(model) over the hot table UNION ALL the same over the archive one."""
+    return queryset_for(hot_model).union(queryset_for(archive_model), all=True)
+
+
+def day_numbers(epochs, start, end):
+    """
+    Which day of the range (0 = start) each Unix timestamp falls on, in the current
+    time zone: a binary search over the range's local midnights, so DST is handled.
+    """
+    import numpy as np
+
+    tz = timezone.get_current_timezone()
+    midnights = np.array([
+        timezone.make_aware(datetime.combine(start + timedelta(days=i), time.min), tz).timestamp()
+        for i in range((end - start).days + 2)
+    ])
+    return np.searchsorted(midnights, epochs, side='right') - 1
+
+
+def load_orders(low, high):
+    """Sales orders created in [low, high) as arrays: user (-1 = deleted user), epoch, total."""
+    import numpy as np
+
+    fields = ('user_id', 'epoch', 'total_amount')
+    queryset = hot_and_archived(
+        lambda model: model.objects.filter(status__in=SALES_STATUSES, created_at__gte=low, created_at__lt=high)
+        .annotate(epoch=EpochSeconds('created_at')).order_by().values_list(*fields),
+        Order, ArchivedOrder,
+    )
+    users, epochs, totals = fetch_columns(queryset, *fields)
+    return {
+        'user': np.array([u if u is not None else -1 for u in users], dtype=np.int64),
+        'epoch': np.asarray(epochs, dtype=np.int64),
+        'total': np.asarray(totals, dtype=np.float64),
+    }
+
+
+def load_order_lines(low, high):
+    """Lines of those orders: product and category (-1 = deleted), quantity, revenue, order epoch."""
+    import numpy as np
+
+    fields = ('product_id', 'product__category_id', 'quantity', 'price', 'epoch')
+    queryset = hot_and_archived(
+        lambda model: model.objects.filter(
+            order__status__in=SALES_STATUSES, order__created_at__gte=low, order__created_at__lt=high,
+        )
+        .annotate(epoch=EpochSeconds('order__created_at')).order_by().values_list(*fields),
+        OrderItem, ArchivedOrderItem,
+    )
+    products, categories, quantities, prices, epochs = fetch_columns(queryset, *fields)
+    return {
+        'product': np.array([p if p is not None else -1 for p in products], dtype=np.int64),
+        'category': np.array([c if c is not None else -1 for c in categories], dtype=np.int64),
+        'quantity': np.asarray(quantities, dtype=np.int64),
+        'revenue': np.asarray(quantities, dtype=np.float64) * np.asarray(prices, dtype=np.float64),
+        'epoch': np.asarray(epochs, dtype=np.int64),
+    }
+
+
+def load_month(month_start, version):
+    """
+    One calendar month of columns. Months that are over are cached (under the month's
+    version), so a long range only goes to the database for the current month.
+    """
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    key = f"sales-columns:{month_start:%Y-%m}:{version}"
+    is_closed = next_month <= timezone.localdate()
+    if is_closed:
+        columns = cache.get(key)
+        if columns is not None:
+            return columns
+
+    low, _ = range_bounds(month_start, month_start)
+    high, _ = range_bounds(next_month, next_month)
+    columns = (load_orders(low, high), load_order_lines(low, high))
+    if is_closed:
+        cache.set(key, columns, REPORT_CACHE_TIMEOUT_CLOSED)
+    return columns
+
+
+def load_columns(start, end):
+    """Orders and lines of [start, end], assembled from month chunks and clipped to the range."""
+    import numpy as np
+
+    months = months_between(start, end)
+    chunks = [load_month(month, version) for month, version in zip(months, month_versions(months))]
+
+    low, high = (bound.timestamp() for bound in range_bounds(start, end))
+    result = []
+    for part in (0, 1):
+        table = {name: np.concatenate([chunk[part][name] for chunk in chunks]) for name in chunks[0][part]}
+        keep = (table['epoch'] >= low) & (table['epoch'] < high)
+        table = {name: column[keep] for name, column in table.items()}
+        table['day'] = day_numbers(table['epoch'], start, end)
+        result.append(table)
+    return result
+
+
+# --- COMPUTATIONS ---
+
+def daily_series(orders, start, end):
+    """Revenue, order count, average order value and trailing moving average for every day."""
+    import numpy as np
+
+    n_days = (end - start).days + 1
+    revenue = np.bincount(orders['day'], weights=orders['total'], minlength=n_days)
+    counts = np.bincount(orders['day'], minlength=n_days)
+
+    # Trailing average over the last 7 days (fewer at the start of the range)
+    window = MOVING_AVERAGE_DAYS
+    cumulative = np.concatenate([[0.0], np.cumsum(revenue)])
+    lengths = np.minimum(np.arange(1, n_days + 1), window)
+    moving_average = (cumulative[1:] - cumulative[np.arange(n_days) + 1 - lengths]) / lengths
+
+    average_value = np.divide(revenue, counts, out=np.zeros(n_days), where=counts > 0)
+    return [
+        {
+            'date': start + timedelta(days=i),
+            'order_count': int(counts[i]),
+            'revenue': round(float(revenue[i]), 2),
+            'avg_order_value': round(float(average_value[i]), 2),
+            'moving_average': round(float(moving_average[i]), 2),
+        }
+        for i in range(n_days)
+    ]
+
+
+def revenue_by(keys, lines):
+    """(key, revenue, units) per distinct key, highest revenue first."""
+    import numpy as np
+
+    if not len(keys):
+        return []
+    unique, inverse = np.unique(keys, return_inverse=True)
+    revenue = np.bincount(inverse, weights=lines['revenue'])
+    units = np.bincount(inverse, weights=lines['quantity'])
+    order = np.argsort(-revenue, kind='stable')
+    return [(int(unique[i]), round(float(revenue[i]), 2), int(units[i])) for i in order]
+
+
+def repeat_purchase_cohorts(orders, start):
+    """
+    Customers grouped by the month of their first order in the range, with the share
+    of them who ordered again within the range.
+    """
+    import numpy as np
+
+    known = orders['user'] >= 0
+    users, days = orders['user'][known], orders['day'][known]
+    if not len(users):
+        return []
+
+    # Sort by (user, day): each user's first row is their first order
+    sort = np.lexsort((days, users))
+    users, days = users[sort], days[sort]
+    _, first_rows, order_counts = np.unique(users, return_index=True, return_counts=True)
+    cohort_month = (np.datetime64(start, 'D') + days[first_rows]).astype('datetime64[M]')
+
+    months, cohort = np.unique(cohort_month, return_inverse=True)
+    customers = np.bincount(cohort)
+    repeaters = np.bincount(cohort, weights=order_counts > 1)
+    return [
+        {
+            'month': months[i].astype(object),
+            'customers': int(customers[i]),
+            'repeat_customers': int(repeaters[i]),
+            'repeat_rate': round(100 * float(repeaters[i]) / int(customers[i]), 1),
+        }
+        for i in range(len(months))
+    ]
+
+
+def build_report(start, end):
+    orders, lines = load_columns(start, end)
+
+    daily = daily_series(orders, start, end)
+    products = revenue_by(lines['product'], lines)
+    categories = revenue_by(lines['category'], lines)
+
+    # Names for the rows actually shown: two small IN queries
+    top = products[:TOP_SELLERS]
+    product_names = dict(Product.objects.filter(pk__in=[p for p, *_ in top]).values_list('pk', 'name'))
+    category_names = dict(Category.objects.filter(pk__in=[c for c, *_ in categories]).values_list('pk', 'name'))
+
+    order_count = len(orders['total'])
+    revenue = float(orders['total'].sum())
+    last_week = daily[-MOVING_AVERAGE_DAYS:]
+    return {
+        'start': start,
+        'end': end,
+        'revenue': round(revenue, 2),
+        'order_count': order_count,
+        'avg_order_value': round(revenue / order_count, 2) if order_count else 0,
+        'last_7_days_revenue': round(sum(day['revenue'] for day in last_week), 2),
+        'last_7_days_orders': sum(day['order_count'] for day in last_week),
+        'daily': daily,
+        'top_sellers': [
+            {'product_id': pk, 'name': product_names.get(pk, "(product removed)"), 'revenue': rev, 'units': units}
+            for pk, rev, units in top
+        ],
+        'categories': [
+            {'name': category_names.get(pk, "(no category)"), 'revenue': rev, 'units': units}
+            for pk, rev, units in categories
+        ],
+        'cohorts': repeat_purchase_cohorts(orders, start),
+    }
+
+
+def get_sales_report(start, end):
+    """The report for [start, end], from the cache when possible (plain data, no arrays)."""
+    versions = '-'.join(map(str, month_versions(months_between(start, end))))
+    key = f"sales-report:{start.isoformat()}:{end.isoformat()}:{hashlib.md5(versions.encode()).hexdigest()}"
+    report = cache.get(key)
+    if report is None:
+        report = build_report(start, end)
+        is_open = end >= timezone.localdate()
+        cache.set(key, report, REPORT_CACHE_TIMEOUT_OPEN if is_open else REPORT_CACHE_TIMEOUT_CLOSED)
+    return report
+
+
+# --- CSV EXPORT ---
+
+class Echo:
+    """File-like object whose write() just returns the line, for csv.writer + streaming."""
+    def write(self, value):
+        return value
+
+
+EXPORT_COLUMNS = ['order_id', 'created_at', 'status', 'customer', 'product_id', 'product', 'quantity', 'price', 'line_total']
+
+
+def export_rows(start, end):
+    """Yields CSV lines for every sales order line in the range, fetched in chunks."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+
+    low, high = range_bounds(start, end)
+    rows = (
+        hot_and_archived(
+            lambda model: model.objects.filter(
+                order__status__in=SALES_STATUSES, order__created_at__gte=low, order__created_at__lt=high,
+            )
+            .order_by()
+            .values_list('order_id', 'order__created_at', 'order__status', 'order__user__username',
+                         'product_id', 'product__name', 'quantity', 'price', 'pk'),
+            OrderItem, ArchivedOrderItem,
+        )
+        .order_by('order__created_at', 'order_id', 'pk')
+        .iterator(chunk_size=FETCH_CHUNK_SIZE)
+    )
+    for order_id, created_at, status, username, product_id, name, quantity, price, _ in rows:
+        yield writer.writerow([
+            order_id, created_at.isoformat(), status, username or '', product_id or '',
+            name or "(product removed)", quantity, price, quantity * price,
+        ])
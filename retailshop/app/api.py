@@ -0,0 +1,236 @@
+# retailshop/app/api.py
+# Read-only JSON API over the catalogue (for the mobile client and partner feeds).
+# Responses are compressed by app/compression.py like every other page.
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Avg, Count
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import urlencode
+from django.views.decorators.http import require_GET
+
+from .autocomplete import CATEGORY, autocomplete_index
+from .category_tree import products_in_category
+from .models import Category, Product, ProductChange
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_IDS = 200
+
+# Public field name -> ORM lookup passed to values_list()
+PRODUCT_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'sku': 'sku',
+    'price': 'price',
+    'description': 'description',
+    'stock': 'stock',
+    'image': 'image',
+    'category': 'category__slug',
+    'updated_at': 'updated_at',
+    # Review aggregates (only joined when asked for)
+    'rating': 'rating',
+    'review_count': 'review_count',
+}
+PRODUCT_AGGREGATES = {
+    'rating': Avg('reviews__rating'),
+    'review_count': Count('reviews'),
+}
+DEFAULT_PRODUCT_FIELDS = ['id', 'name', 'price', 'stock', 'image', 'category']
+
+CATEGORY_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'slug': 'slug',
+    'description': 'description',
+    'banner_image': 'banner_image',
+    'updated_at': 'updated_at',
+    'parent': 'parent_id',
+    'product_count': 'product_count',  # stored, kept up to date incrementally
+}
+CATEGORY_AGGREGATES = {}
+DEFAULT_CATEGORY_FIELDS = ['id', 'name', 'slug', 'banner_image']
+
+# The price/stock change feed (ProductChange outbox), oldest first
+PRODUCT_CHANGE_FIELDS = {
+    'id': 'id',
+    'product': 'product_id',
+    'field': 'field',
+    'old_value': 'old_value',
+    'new_value': 'new_value',
+    'changed_at': 'changed_at',
+}
+DEFAULT_PRODUCT_CHANGE_FIELDS = list(PRODUCT_CHANGE_FIELDS)
+
+AUTOCOMPLETE_LIMIT = 8
+MAX_AUTOCOMPLETE_LIMIT = 20
+
+# Columns holding a FileField path that should be returned as a URL
+IMAGE_FIELDS = {'image', 'banner_image'}
+
+
+class BadRequest(Exception):
+    pass
+
+
+# --- HELPERS ---
+
+def parse_fields(request, allowed, default):
+    """Reads ?fields=a,b,c (sparse fieldset). 'id' is always included, it's the cursor."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise BadRequest(f"Unknown field(s): {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def parse_int(request, name, default=None, minimum=0, maximum=None):
+    raw = request.GET.get(name)
+    if raw in (None, ''):
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise BadRequest(f"'{name}' must be an integer.")
+    if value < minimum:
+        raise BadRequest(f"'{name}' must be >= {minimum}.")
+    return min(value, maximum) if maximum else value
+
+
+def parse_ids(request):
+    """Reads ?ids=1,2,3 for bulk fetches."""
+    raw = request.GET.get('ids')
+    if not raw:
+        return None
+    try:
+        ids = [int(i) for i in raw.split(',') if i.strip()]
+    except ValueError:
+        raise BadRequest("'ids' must be a comma-separated list of integers.")
+    if len(ids) > MAX_BULK_IDS:
+        raise BadRequest(f"At most {MAX_BULK_IDS} ids per request.")
+    return ids
+
+
+def serialize_rows(rows, fields):
+    """
+    Turns values_list() tuples straight into dicts; no model instances are built.
+    Image columns are stored as relative paths, so they get MEDIA_URL in front.
+    """
+    image_positions = [i for i, f in enumerate(fields) if f in IMAGE_FIELDS]
+    media_url = settings.MEDIA_URL
+    results = []
+    for row in rows:
+        if image_positions:
+            row = list(row)
+            for i in image_positions:
+                row[i] = f"{media_url}{row[i]}" if row[i] else None
+        results.append(dict(zip(fields, row)))
+    return results
+
+
+def list_response(request, queryset, field_map, aggregates, default_fields):
+    """
+    Shared logic for the list endpoints:
+    sparse fields, bulk ?ids= (up to MAX_BULK_IDS, ?limit doesn't apply),
+    keyset pagination on id (?after=<last id>&limit=N).
+    """
+    try:
+        fields = parse_fields(request, field_map, default_fields)
+        ids = parse_ids(request)
+        limit = parse_int(request, 'limit', DEFAULT_PAGE_SIZE, minimum=1, maximum=MAX_PAGE_SIZE)
+        after = parse_int(request, 'after')
+    except BadRequest as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # 1. Only join the aggregates that were actually requested
+    wanted_aggregates = {f: aggregates[f] for f in fields if f in aggregates}
+    if wanted_aggregates:
+        queryset = queryset.annotate(**wanted_aggregates)
+
+    # 2. Bulk fetch by ids (all of them: parse_ids() already capped them at MAX_BULK_IDS,
+    # and an ids response has no 'next' to fetch the rest with), or the next page after the cursor
+    queryset = queryset.order_by('pk').values_list(*[field_map[f] for f in fields])
+    if ids is not None:
+        rows = list(queryset.filter(pk__in=ids))
+    else:
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        rows = list(queryset[:limit])
+    results = serialize_rows(rows, fields)
+
+    next_cursor = None
+    if ids is None and len(rows) == limit:
+        next_cursor = rows[-1][fields.index('id')]
+
+    return JsonResponse(
+        {'count': len(results), 'next': next_cursor, 'results': results},
+        encoder=DjangoJSONEncoder,
+    )
+
+
+# --- API VIEWS ---
+
+@require_GET
+def product_list(request):
+    """
+    GET /api/products/?fields=id,name,price,rating&ids=1,2,3&category=<slug>&after=<id>&limit=100
+    ?category= includes the products of its subcategories.
+    """
+    queryset = Product.objects.all()
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category_id = Category.objects.filter(slug=category_slug).values_list('pk', flat=True).first()
+        queryset = products_in_category(category_id, queryset)
+    return list_response(request, queryset, PRODUCT_FIELDS, PRODUCT_AGGREGATES, DEFAULT_PRODUCT_FIELDS)
+
+
+@require_GET
+def category_list(request):
+    """GET /api/categories/?fields=id,name,product_count&ids=1,2"""
+    return list_response(request, Category.objects.all(), CATEGORY_FIELDS, CATEGORY_AGGREGATES, DEFAULT_CATEGORY_FIELDS)
+
+
+@require_GET
+def product_change_feed(request):
+    """
+    GET /api/product-changes/?after=<last id seen>&limit=1000
+    Downstream systems poll this with the 'next' cursor to follow price/stock changes.
+    """
+    return list_response(request, ProductChange.objects.all(), PRODUCT_CHANGE_FIELDS, {}, DEFAULT_PRODUCT_CHANGE_FIELDS)
+
+
+@require_GET
+def autocomplete(request):
+    """
+    GET /api/autocomplete/?q=sne&limit=8
+    Search-as-you-type: categories and products with a word starting with q, best first.
+    Answered from the in-memory index in app/autocomplete.py, no queries.
+    """
+    try:
+        limit = parse_int(request, 'limit', AUTOCOMPLETE_LIMIT, minimum=1, maximum=MAX_AUTOCOMPLETE_LIMIT)
+    except BadRequest as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    query = request.GET.get('q', '')
+    products_url = reverse('products')
+    results = []
+    for kind, pk, name in autocomplete_index.suggest(query, limit):
+        if kind == CATEGORY:
+            results.append({'type': 'category', 'id': pk, 'name': name,
+                            'url': f"{products_url}?{urlencode({'category': name})}"})
+        else:
+            results.append({'type': 'product', 'id': pk, 'name': name, 'url': reverse('product_detail', args=[pk])})
+
+    response = JsonResponse({'query': query, 'results': results})
+    # Same answer for everyone: let browsers and proxies reuse it for a minute
+    patch_cache_control(response, public=True, max_age=60)
+    return response
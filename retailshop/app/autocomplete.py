@@ -0,0 +1,327 @@
+# retailshop/app/autocomplete.py
+# In-memory prefix index for search-as-you-type (/api/autocomplete/?q=): product and
+# category names, matched at the start of any word ("sne" finds "Nike Air Sneakers").
+#
+# Everything is kept in flat lists/arrays, no object per name:
+#   - slots: one per indexed name (kind, pk, name, folded name, score)
+#   - entries: array of `slot << 8 | word offset`, sorted by the folded name from that
+#     word on. The names starting with a prefix are one contiguous range (two bisects).
+#   - ranked: slots best first: categories, then in-stock products, by units sold.
+#
+# A small range is ranked directly; a big one (a short prefix like "s") would mean
+# sorting thousands of names, so instead `ranked` is walked from the top until enough
+# names match: the more names share the prefix, the sooner that happens.
+#
+# Like the facet index (app/facets.py) each process keeps its own: built by the warm-up
+# at boot (or on first use), then kept current by signals for this process's saves and
+# by sync(), at most every AUTOCOMPLETE_SYNC_INTERVAL seconds, for other processes'.
+# Syncs run in a background thread and swap in a new snapshot (app/live_index.py).
+# The big index of the last full build is never changed: names changed since then go
+# in a small second index and hide their old entries, and lookups merge the two. A sync
+# only re-indexes those few names; past MAX_PENDING_CHANGES it rebuilds everything.
+# Memory is capped by settings.AUTOCOMPLETE_MAX_PRODUCTS (the best-ranked are kept).
+
+import heapq
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db.models import Max, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .live_index import LiveIndex
+from .models import Category, OrderItem, Product
+
+AUTOCOMPLETE_SYNC_INTERVAL = 5  # seconds
+
+CATEGORY, PRODUCT = 0, 1
+# Scores: any category outranks any product, any in-stock product outranks any sold-out one
+IN_STOCK_SCORE = 1 << 40
+CATEGORY_SCORE = 1 << 41
+
+KEY_CHARS = 32        # entries are ordered on this many characters; longer queries are re-checked
+RANGE_LIMIT = 1500    # ranges up to this size are ranked directly, bigger ones walk `ranked`
+MAX_QUERY_CHARS = 100
+# Past this many names changed since the last full build, sync() rebuilds (the small
+# index of changes is re-indexed by every sync, so it has to stay small)
+MAX_PENDING_CHANGES = 2000
+
+NON_WORD = re.compile(r'[\W_]+')
+LAST_CHAR = chr(0x10FFFF)
+
+
+def fold(text):
+    """Case- and punctuation-insensitive form: "Men's T-Shirt" -> "men s t shirt"."""
+    return NON_WORD.sub(' ', text.casefold()).strip()
+
+
+def word_offsets(folded):
+    """Where each word of a folded name starts."""
+    offsets, position = [0], 0
+    for word in folded.split(' ')[:-1]:
+        position += len(word) + 1
+        offsets.append(position)
+    return offsets
+
+
+def product_score(stock, sold):
+    return (IN_STOCK_SCORE if stock > 0 else 0) + min(sold or 0, IN_STOCK_SCORE - 1)
+
+
+def category_score(product_count):
+    return CATEGORY_SCORE + product_count
+
+
+class PrefixIndex:
+    """Names and their sorted entries, indexed in one go by load() and never changed after."""
+
+    def __init__(self, max_products=None):
+        self.max_products = max_products
+        self.slots = {CATEGORY: {}, PRODUCT: {}}  # kind -> {pk: slot}
+
+    # --- BUILDING ---
+
+    def load(self, categories, products):
+        """Indexes (pk, name, score) rows; products past max_products are left out, lowest score first."""
+        self.capped = len(products) > self.product_limit()
+        if self.capped:
+            products = heapq.nlargest(self.product_limit(), products, key=lambda row: row[2])
+        # The score a left-out product must beat to be indexed when it changes
+        self.lowest_product_score = min((row[2] for row in products), default=0) if self.capped else None
+
+        self.kinds = bytearray()
+        self.pks = array('q')
+        self.names = []
+        self.folded = []
+        self.scores = array('q')
+        self.slots = {CATEGORY: {}, PRODUCT: {}}
+        # Entries go in buckets by first character, sorted one bucket at a time: the sort
+        # keys of a single bucket are in memory at once, not those of all of them
+        buckets = {}
+        for kind, rows in ((CATEGORY, categories), (PRODUCT, products)):
+            for pk, name, score in rows:
+                slot = self.add_slot(kind, pk, name, score)
+                folded = self.folded[slot]
+                for offset in word_offsets(folded):
+                    buckets.setdefault(folded[offset:offset + 1], []).append(slot << 8 | offset)
+
+        self.entries = array('q')
+        for first_char in sorted(buckets):
+            bucket = buckets.pop(first_char)
+            bucket.sort(key=self.entry_key)
+            self.entries.extend(bucket)
+        self.ranked = array('q', sorted(range(len(self.names)), key=self.rank_key))
+
+    def product_limit(self):
+        return self.max_products if self.max_products is not None else settings.AUTOCOMPLETE_MAX_PRODUCTS
+
+    def add_slot(self, kind, pk, name, score):
+        slot = len(self.names)
+        self.kinds.append(kind)
+        self.pks.append(pk)
+        self.names.append(name)
+        self.folded.append(fold(name)[:255])  # word offsets must fit in 8 bits
+        self.scores.append(score)
+        self.slots[kind][pk] = slot
+        return slot
+
+    def entry_key(self, entry):
+        offset = entry & 255
+        return self.folded[entry >> 8][offset:offset + KEY_CHARS]
+
+    def rank_key(self, slot):
+        return (-self.scores[slot], len(self.folded[slot]), self.folded[slot])
+
+    # --- QUERYING ---
+
+    def matching_rows(self, query, limit, hidden=frozenset()):
+        """The best `limit` (rank key, kind, pk, name) for a folded query, best first, leaving out hidden slots."""
+        return [
+            (self.rank_key(slot), self.kinds[slot], self.pks[slot], self.names[slot])
+            for slot in self.matching_slots(query, limit, hidden)
+        ]
+
+    def matching_slots(self, query, limit, hidden):
+        probe = query[:KEY_CHARS]
+        low = bisect_left(self.entries, probe, key=self.entry_key)
+        high = bisect_right(self.entries, probe + LAST_CHAR, key=self.entry_key, lo=low)
+
+        if high - low > RANGE_LIMIT:
+            # 1. Many matches: the best-ranked names that match are near the top of `ranked`
+            found = []
+            word_start = ' ' + query
+            for slot in self.ranked:
+                folded = self.folded[slot]
+                if (folded.startswith(query) or word_start in folded) and slot not in hidden:
+                    found.append(slot)
+                    if len(found) == limit:
+                        break
+            return found
+
+        # 2. Few matches: rank them (a name matching at two words counts once)
+        slots = {entry >> 8 for entry in self.entries[low:high]} - hidden
+        if len(query) > KEY_CHARS:
+            word_start = ' ' + query
+            slots = {slot for slot in slots if self.folded[slot].startswith(query) or word_start in self.folded[slot]}
+        return heapq.nsmallest(limit, slots, key=self.rank_key)
+
+
+class AutocompleteSnapshot:
+    """
+    What lookups read: the PrefixIndex of the last full build (`base`, shared by every
+    snapshot until the next build) and the names changed since, in a small PrefixIndex
+    of their own (`changed`). A changed or deleted name's entries in the base are hidden.
+    """
+
+    def __init__(self, base, changes=None, synced_at=None, categories_synced_at=None):
+        self.base = base
+        self.changes = changes or {}  # {(kind, pk): (name, score), or None once deleted}
+        self.hidden = frozenset(base.slots[kind][pk] for kind, pk in self.changes if pk in base.slots[kind])
+        self.changed = PrefixIndex(max_products=len(self.changes))
+        self.changed.load(*(
+            [(pk, *row) for (kind, pk), row in self.changes.items() if kind == wanted and row is not None]
+            for wanted in (CATEGORY, PRODUCT)
+        ))
+        # Product/Category updated_at the next sync looks past
+        self.synced_at = synced_at
+        self.categories_synced_at = categories_synced_at
+
+    def count(self, kind):
+        """How many names of this kind are indexed."""
+        in_base = self.base.slots[kind]
+        added = sum(1 for (k, pk), row in self.changes.items() if k == kind and row is not None and pk not in in_base)
+        deleted = sum(1 for (k, pk), row in self.changes.items() if k == kind and row is None and pk in in_base)
+        return len(in_base) + added - deleted
+
+    def lookup(self, query, limit=8):
+        """See AutocompleteIndex.suggest()."""
+        query = fold(query[:MAX_QUERY_CHARS])
+        if not query:
+            return []
+        rows = self.base.matching_rows(query, limit, self.hidden)
+        if self.changes:
+            rows = heapq.nsmallest(limit, rows + self.changed.matching_rows(query, limit))
+        return [(kind, pk, name) for _, kind, pk, name in rows]
+
+
+class AutocompleteIndex(LiveIndex):
+    sync_interval = AUTOCOMPLETE_SYNC_INTERVAL
+
+    def __init__(self, max_products=None):
+        super().__init__()
+        self.max_products = max_products
+
+    # --- BUILDING ---
+
+    def build(self):
+        """A new snapshot: names of every category and product, plus units sold per product."""
+        sold = dict(
+            OrderItem.objects.filter(product__isnull=False)
+            .values('product_id').annotate(n=Sum('quantity')).values_list('product_id', 'n')
+        )
+        categories = [
+            (pk, name, category_score(count))
+            for pk, name, count in Category.objects.values_list('pk', 'name', 'product_count')
+        ]
+        products = [
+            (pk, name, product_score(stock, sold.get(pk)))
+            for pk, name, stock in Product.objects.values_list('pk', 'name', 'stock').iterator(chunk_size=5000)
+        ]
+        base = PrefixIndex(self.max_products)
+        base.load(categories, products)
+        return AutocompleteSnapshot(
+            base,
+            synced_at=Product.objects.aggregate(last=Max('updated_at'))['last'] or timezone.now(),
+            categories_synced_at=Category.objects.aggregate(last=Max('updated_at'))['last'] or timezone.now(),
+        )
+
+    # --- INCREMENTAL UPDATES ---
+
+    def read(self, keys, base):
+        """{(kind, pk): (name, score)} for the given keys, None for deleted (or, in a capped index, left-out) ones."""
+        rows = dict.fromkeys(keys)
+        product_pks = [pk for kind, pk in keys if kind == PRODUCT]
+        category_pks = [pk for kind, pk in keys if kind == CATEGORY]
+        if product_pks:
+            sold = dict(
+                OrderItem.objects.filter(product_id__in=product_pks)
+                .values('product_id').annotate(n=Sum('quantity')).values_list('product_id', 'n')
+            )
+            for pk, name, stock in Product.objects.filter(pk__in=product_pks).values_list('pk', 'name', 'stock'):
+                score = product_score(stock, sold.get(pk))
+                # A capped index only takes in a product that would have made the cut
+                if not base.capped or pk in base.slots[PRODUCT] or score > base.lowest_product_score:
+                    rows[(PRODUCT, pk)] = (name, score)
+        if category_pks:
+            for pk, name, count in Category.objects.filter(pk__in=category_pks).values_list('pk', 'name', 'product_count'):
+                rows[(CATEGORY, pk)] = (name, category_score(count))
+        return rows
+
+    def sync(self, check_others):
+        """Publishes an up-to-date snapshot (in the background, see app/live_index.py)."""
+        if self.snapshot is None:
+            self.dirty.clear()
+            self.snapshot = self.build()
+            return
+
+        # 1. Changes made in this process (seen by the signals below)
+        keys, self.dirty = self.dirty, set()
+        snapshot = self.snapshot
+        synced_at, categories_synced_at = snapshot.synced_at, snapshot.categories_synced_at
+
+        # 2. Changes made by other processes: rows whose updated_at moved on
+        if check_others:
+            changed = list(Product.objects.filter(updated_at__gte=synced_at).values_list('pk', 'updated_at'))
+            changed_categories = list(
+                Category.objects.filter(updated_at__gte=categories_synced_at).values_list('pk', 'updated_at')
+            )
+            if changed:
+                synced_at = max(updated_at for _, updated_at in changed)
+            if changed_categories:
+                categories_synced_at = max(updated_at for _, updated_at in changed_categories)
+            keys |= {(PRODUCT, pk) for pk, _ in changed} | {(CATEGORY, pk) for pk, _ in changed_categories}
+
+        if keys:
+            changes = {**snapshot.changes, **self.read(keys, snapshot.base)}
+            if len(changes) > MAX_PENDING_CHANGES:
+                snapshot = self.build()
+            else:
+                snapshot = AutocompleteSnapshot(snapshot.base, changes, synced_at, categories_synced_at)
+
+        # 3. Deletions elsewhere leave no row to find; a count mismatch means a rebuild.
+        # A capped index can't tell, its deleted names go at the next build.
+        if check_others and (Category.objects.count() != snapshot.count(CATEGORY) or (
+            not snapshot.base.capped and Product.objects.count() != snapshot.count(PRODUCT)
+        )):
+            snapshot = self.build()
+        self.snapshot = snapshot
+
+    # --- QUERYING ---
+
+    def suggest(self, query, limit=8):
+        """
+        Up to `limit` names with a word starting with `query`, best first, as
+        [(kind, pk, name)]. Categories come before products.
+        """
+        return self.current().lookup(query, limit)
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+# --- SIGNALS ---
+# Saves/deletes in this process are applied by the sync the next lookup starts
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def mark_product_dirty(sender, instance, **kwargs):
+    autocomplete_index.dirty.add((PRODUCT, instance.pk))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def mark_category_dirty(sender, instance, **kwargs):
+    autocomplete_index.dirty.add((CATEGORY, instance.pk))
@@ -0,0 +1,21 @@
+# retailshop/app/backends.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    Same as Django's ModelBackend, but loads the user's Profile and Cart in the SAME
+    query that AuthenticationMiddleware uses to fetch request.user.
+    This way `request.user.profile` and `request.user.cart` cost no extra queries
+    in the navbar, profile, cart and checkout views.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('profile', 'cart').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,380 @@
+# retailshop/app/benchmark.py
+# Load-testing harness behind `manage.py seed_benchmark` and `manage.py bench_load`.
+#
+#   1. seed()       bulk-inserts a synthetic shop (everything named/slugged "bench-...")
+#   2. SCENARIOS    weighted user journeys: browsing, filtering, search, cart, checkout, M-Pesa
+#   3. drivers      run them in-process (Django test Client, counts queries) or over HTTP
+#                   from several processes against a running server
+#   4. summarize()  req/s, p50/p95/p99 and queries per request for every step
+#   5. compare()    regressions against a stored baseline (benchmarks/baseline.json)
+
+import json
+import math
+import multiprocessing
+import random
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .category_tree import invalidate_category_tree
+from .models import (
+    Cart, CartItem, Category, CategoryClosure, Job, Order, OrderItem, Product, Profile, Review,
+    recount_category_products,
+)
+from .mpesa import callback_url
+
+BENCH_PREFIX = 'bench'
+BENCH_PASSWORD = 'bench-password'
+BATCH_SIZE = 2000
+
+
+# --- SEEDING ---
+
+def seed(categories=20, products=5000, users=200, reviews=5000, carts=100, orders=2000, random_seed=0):
+    """
+    Bulk-inserts a synthetic dataset. Returns {table: rows inserted}.
+    Needs a database that returns primary keys from bulk inserts (PostgreSQL, SQLite, MariaDB).
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    with transaction.atomic():
+        category_rows = Category.objects.bulk_create(
+            Category(name=f"Bench Category {i}", slug=f"{BENCH_PREFIX}-{i}", description="Benchmark category")
+            for i in range(categories)
+        )
+        # bulk_create skips Category.save(): add their closure rows (all roots) here
+        CategoryClosure.objects.bulk_create(
+            CategoryClosure(ancestor=category, descendant=category, depth=0) for category in category_rows
+        )
+        # image is only a path: templates need one for .url, no file is read
+        product_rows = Product.objects.bulk_create(
+            (Product(
+                category=category_rows[i % categories], sku=f"{BENCH_PREFIX}-{i}",
+                name=f"Bench product {i}", description=f"Synthetic product number {i} for load tests. " * 3,
+                price=rng.choice([99, 450, 799, 1500, 4999, 12000, 25000]), stock=rng.choice([0, 3, 10, 50]),
+                image='products/bench.jpg',
+            ) for i in range(products)),
+            batch_size=BATCH_SIZE,
+        )
+        recount_category_products([category.pk for category in category_rows])
+        transaction.on_commit(invalidate_category_tree)
+
+        # One password hash for everyone: hashing is deliberately slow
+        password = make_password(BENCH_PASSWORD)
+        user_rows = User.objects.bulk_create(
+            (User(username=f"{BENCH_PREFIX}-user-{i}", email=f"{BENCH_PREFIX}-{i}@example.com", password=password)
+             for i in range(users)),
+            batch_size=BATCH_SIZE,
+        )
+        Profile.objects.bulk_create((Profile(user=user) for user in user_rows), batch_size=BATCH_SIZE)
+
+        # (product, user) pairs walk the grid, so each pair is used once (unique_together)
+        reviews = min(reviews, products * users)
+        Review.objects.bulk_create(
+            (Review(product=product_rows[i % products], user=user_rows[i // products],
+                    rating=rng.randint(1, 5), text="Benchmark review")
+             for i in range(reviews)),
+            batch_size=BATCH_SIZE,
+        )
+
+        cart_rows = Cart.objects.bulk_create(Cart(user=user) for user in user_rows[:carts])
+        CartItem.objects.bulk_create(
+            (CartItem(cart=cart, product=product, quantity=rng.randint(1, 3))
+             for cart in cart_rows for product in rng.sample(product_rows, 3)),
+            batch_size=BATCH_SIZE,
+        )
+
+        order_rows, item_rows = [], []
+        for _ in range(orders):
+            lines = [(product, rng.randint(1, 3)) for product in rng.sample(product_rows, rng.randint(1, 4))]
+            order = Order(
+                user=rng.choice(user_rows), status=rng.choice(['Paid', 'Processing', 'Complete', 'Pending']),
+                total_amount=sum(product.price * quantity for product, quantity in lines),
+                created_at=now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                payment_method=rng.choice(['M-Pesa', 'Cash on Delivery']), fulfillment_method='Pickup',
+            )
+            order_rows.append(order)
+            item_rows.append(lines)
+        Order.objects.bulk_create(order_rows, batch_size=BATCH_SIZE)
+        OrderItem.objects.bulk_create(
+            (OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+             for order, lines in zip(order_rows, item_rows) for product, quantity in lines),
+            batch_size=BATCH_SIZE,
+        )
+
+    return {
+        'categories': categories, 'products': products, 'users': users, 'reviews': reviews,
+        'carts': carts, 'orders': orders,
+    }
+
+
+def clear_seed():
+    """Deletes everything seed() created, plus the jobs the benchmark's checkouts queued."""
+    with transaction.atomic():
+        bench_users = User.objects.filter(username__startswith=f"{BENCH_PREFIX}-user-")
+        bench_orders = Order.objects.filter(user__in=bench_users)
+        Job.objects.filter(name='payments.stk_push', payload__order_id__in=list(bench_orders.values_list('pk', flat=True))).delete()
+        Job.objects.filter(idempotency_key__startswith=f"mpesa-callback:{BENCH_PREFIX}-").delete()
+        bench_orders.delete()
+        bench_users.delete()
+        Product.objects.filter(category__slug__startswith=f"{BENCH_PREFIX}-").delete()
+        Category.objects.filter(slug__startswith=f"{BENCH_PREFIX}-").delete()
+
+
+# --- SCENARIOS ---
+# A scenario is a generator of Step()s: one user journey. `ctx` holds the seeded ids and rng.
+
+Step = namedtuple('Step', ['name', 'method', 'path', 'data', 'is_json'], defaults=[None, False])
+
+CHECKOUT_FORM = {
+    'first_name': 'Bench', 'last_name': 'User', 'phone_number': '0712345678',
+    'address_line_1': '1 Benchmark Road', 'city': 'Nairobi', 'fulfillment_method': 'Delivery',
+}
+
+
+def browse(ctx):
+    yield Step('home', 'GET', '/')
+    yield Step('products', 'GET', '/products/')
+    yield Step('product_detail', 'GET', f"/product/{ctx.rng.choice(ctx.product_ids)}/")
+
+
+def filter_and_search(ctx):
+    category = urllib.parse.quote(ctx.rng.choice(ctx.category_names))
+    yield Step('products_filtered', 'GET', f"/products/?category={category}&price=500-1000&price=1000-5000&in_stock=1")
+    yield Step('products_search', 'GET', f"/products/?q=Bench+product+{ctx.rng.randint(1, 99)}")
+    yield Step('api_products', 'GET', '/api/products/?limit=100&fields=id,name,price')
+
+
+def shop(ctx):
+    product_id = ctx.rng.choice(ctx.product_ids)
+    yield Step('product_detail', 'GET', f"/product/{product_id}/")
+    yield Step('add_to_cart', 'POST', f"/add/{product_id}/", {'quantity': 1})
+    yield Step('update_cart', 'POST', f"/update/{product_id}/", {'quantity': 2})
+    yield Step('cart', 'GET', '/cart/')
+
+
+def checkout_mpesa(ctx):
+    """Checkout paid with M-Pesa. The STK push is only queued and the callback is a fake."""
+    yield Step('add_to_cart', 'POST', f"/add/{ctx.rng.choice(ctx.product_ids)}/", {'quantity': 1})
+    yield Step('checkout', 'GET', '/checkout/')
+    yield Step('place_order', 'POST', '/order/process/', dict(CHECKOUT_FORM, payment_method='M-Pesa', phone_number='254712345678'))
+    callback = {'Body': {'stkCallback': {
+        'MerchantRequestID': 'bench', 'CheckoutRequestID': f"{BENCH_PREFIX}-{uuid.uuid4().hex}",
+        'ResultCode': 0, 'ResultDesc': 'The service request is processed successfully.',
+    }}}
+    # Signed like a real callback URL (app/mpesa.py), for an order that doesn't exist
+    ref = urllib.parse.urlsplit(callback_url(0)).query
+    yield Step('mpesa_callback', 'POST', f"/mpesa/callback/?{ref}", json.dumps(callback), True)
+    yield Step('order_history', 'GET', '/orders/')
+
+
+# (scenario, weight, needs a logged-in user)
+SCENARIOS = [
+    (browse, 40, False),
+    (filter_and_search, 20, False),
+    (shop, 30, True),
+    (checkout_mpesa, 10, True),
+]
+
+
+class Context:
+    def __init__(self, rng, product_ids, category_names):
+        self.rng = rng
+        self.product_ids = product_ids
+        self.category_names = category_names
+
+
+def load_context(random_seed):
+    product_ids = list(Product.objects.filter(category__slug__startswith=f"{BENCH_PREFIX}-").values_list('pk', flat=True))
+    category_names = list(Category.objects.filter(slug__startswith=f"{BENCH_PREFIX}-").values_list('name', flat=True))
+    usernames = list(User.objects.filter(username__startswith=f"{BENCH_PREFIX}-user-").values_list('username', flat=True))
+    if not product_ids or not usernames:
+        raise LookupError("No benchmark data: run `manage.py seed_benchmark` first.")
+    return Context(random.Random(random_seed), product_ids, category_names), usernames
+
+
+def journeys(ctx):
+    """Endless weighted mix of scenarios: yields (steps, needs_login)."""
+    scenarios = [s for s, _, _ in SCENARIOS]
+    weights = [w for _, w, _ in SCENARIOS]
+    logins = {s: login for s, _, login in SCENARIOS}
+    while True:
+        scenario = ctx.rng.choices(scenarios, weights)[0]
+        yield scenario(ctx), logins[scenario]
+
+
+# --- DRIVERS ---
+# Both return ([(step name, status, milliseconds, queries or None), ...], seconds measured)
+
+def run_in_process(requests, username, random_seed=0, warmup=20):
+    """
+    Drives the app through the test Client in this process; counts queries per request.
+    The first `warmup` journeys fill caches and in-memory indexes and aren't recorded.
+    """
+    ctx, _ = load_context(random_seed)
+    anonymous, customer = Client(), Client()
+    customer.force_login(User.objects.get(username=username))
+
+    # The test Client sends Host: testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        return drive_clients(requests, ctx, anonymous, customer, warmup)
+
+
+def drive_clients(requests, ctx, anonymous, customer, warmup):
+    results = []
+    started = time.perf_counter()
+    for count, (steps, needs_login) in enumerate(journeys(ctx)):
+        if count == warmup:
+            started = time.perf_counter()
+        if len(results) >= requests:
+            break
+        client = customer if needs_login else anonymous
+        for step in steps:
+            reset_queries()  # DEBUG keeps a log of every query; don't let it fill up
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                if step.is_json:
+                    response = client.post(step.path, step.data, content_type='application/json')
+                elif step.method == 'POST':
+                    response = client.post(step.path, step.data)
+                else:
+                    response = client.get(step.path)
+                elapsed = (time.perf_counter() - start) * 1000
+            if count >= warmup:
+                results.append((step.name, response.status_code, elapsed, len(queries)))
+    return results, time.perf_counter() - started
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Measure each request on its own, like the test Client does: don't follow redirects."""
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect())
+
+    def csrf_token(self):
+        return next((c.value for c in self.cookies if c.name == 'csrftoken'), '')
+
+    def request(self, method, path, data=None, is_json=False):
+        headers = {'Referer': self.base_url + '/', 'X-CSRFToken': self.csrf_token()}
+        body = None
+        if method == 'POST':
+            if is_json:
+                body, headers['Content-Type'] = data.encode(), 'application/json'
+            else:
+                body = urllib.parse.urlencode(dict(data or {}, csrfmiddlewaretoken=self.csrf_token())).encode()
+        request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:  # 3xx (not followed), 4xx, 5xx
+            return error.code
+
+    def login(self, username):
+        self.request('GET', '/login/')  # sets the csrftoken cookie
+        return self.request('POST', '/login/', {'username': username, 'password': BENCH_PASSWORD})
+
+
+def http_worker(base_url, duration, username, random_seed):
+    """One load-generator process: a logged-in and an anonymous session, for `duration` seconds."""
+    from django.db import connections
+    connections.close_all()  # forked from the parent: open our own connection
+
+    ctx, _ = load_context(random_seed)
+    anonymous, customer = HttpSession(base_url), HttpSession(base_url)
+    anonymous.request('GET', '/login/')
+    customer.login(username)
+
+    results = []
+    deadline = time.monotonic() + duration
+    for steps, needs_login in journeys(ctx):
+        if time.monotonic() >= deadline:
+            break
+        session = customer if needs_login else anonymous
+        for step in steps:
+            start = time.perf_counter()
+            status = session.request(step.method, step.path, step.data, step.is_json)
+            results.append((step.name, status, (time.perf_counter() - start) * 1000, None))
+    return results
+
+
+def run_http(base_url, processes, duration, random_seed=0):
+    """Runs `processes` load generators in parallel against a live server."""
+    _, usernames = load_context(random_seed)
+    connection.close()
+    args = [(base_url, duration, usernames[i % len(usernames)], random_seed + i) for i in range(processes)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes) as pool:
+        per_process = pool.starmap(http_worker, args)
+    return [row for rows in per_process for row in rows], time.perf_counter() - start
+
+
+# --- REPORTING ---
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(results, elapsed):
+    """{'total': {...}, 'steps': {name: {...}}} with req/s, percentiles and queries per request."""
+    def stats(rows):
+        latencies = sorted(ms for _, _, ms, _ in rows)
+        queries = [q for _, _, _, q in rows if q is not None]
+        return {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _, _ in rows if status >= 400),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'queries': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    by_step = {}
+    for row in results:
+        by_step.setdefault(row[0], []).append(row)
+    total = stats(results)
+    total['rps'] = round(len(results) / elapsed, 1) if elapsed else 0.0
+    return {'total': total, 'steps': {name: stats(rows) for name, rows in sorted(by_step.items())}}
+
+
+def compare(summary, baseline, tolerance):
+    """
+    Regressions against a baseline summary: p95 more than `tolerance` slower (and at least
+    5ms, so tiny numbers don't flap), any extra query per request, or new 4xx/5xx errors.
+    """
+    regressions = []
+    for name, current in summary['steps'].items():
+        before = baseline['steps'].get(name)
+        if before is None:
+            continue
+        if current['p95_ms'] > before['p95_ms'] * (1 + tolerance) and current['p95_ms'] - before['p95_ms'] > 5:
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] is not None and before.get('queries') is not None and current['queries'] > before['queries'] + 0.5:
+            regressions.append(f"{name}: queries/request {before['queries']} -> {current['queries']}")
+        if current['errors'] > before.get('errors', 0):
+            regressions.append(f"{name}: {current['errors']} server errors")
+    return regressions
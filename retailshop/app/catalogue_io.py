@@ -0,0 +1,100 @@
+# retailshop/app/catalogue_io.py
+# Streaming helpers shared by the import_catalogue / export_catalogue commands.
+# Every step is a generator, so memory use stays flat no matter how big the file is.
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+
+# Column order for CSV files (JSON Lines objects use the same keys)
+CATALOGUE_COLUMNS = ['sku', 'name', 'category', 'price', 'stock', 'description', 'image']
+
+
+class CatalogueRowError(ValueError):
+    pass
+
+
+class ErrorLog:
+    """Counts skipped rows but only keeps the first few messages (memory stays flat)."""
+    def __init__(self, keep=50):
+        self.keep = keep
+        self.count = 0
+        self.messages = []
+
+    def append(self, error):
+        self.count += 1
+        if len(self.messages) < self.keep:
+            self.messages.append(error)
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+# --- READING ---
+
+def read_rows(fileobj, fmt):
+    """Yields one dict per CSV line / JSON line."""
+    if fmt == 'csv':
+        yield from csv.DictReader(fileobj)
+    else:
+        for line in fileobj:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def clean_rows(rows, errors):
+    """
+    Validates and normalises raw rows. Bad rows are added to `errors` (an ErrorLog)
+    as (line number, message) and skipped, so one typo doesn't stop a 1M-row import.
+    """
+    for number, row in enumerate(rows, start=1):
+        try:
+            sku = (row.get('sku') or '').strip()
+            name = (row.get('name') or '').strip()
+            category = (row.get('category') or '').strip()
+            if not sku or not name or not category:
+                raise CatalogueRowError("sku, name and category are required")
+            try:
+                price = Decimal(str(row.get('price')))
+                stock = int(row.get('stock') or 0)
+            except (InvalidOperation, ValueError, TypeError):
+                raise CatalogueRowError("price/stock must be numbers")
+
+            yield {
+                'sku': sku,
+                'name': name,
+                'category': category,
+                'price': price,
+                'stock': stock,
+                'description': row.get('description') or '',
+                'image': (row.get('image') or '').strip(),
+            }
+        except CatalogueRowError as e:
+            errors.append((number, str(e)))
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- WRITING ---
+
+def write_rows(rows, fileobj, fmt):
+    """Writes dict rows as CSV or JSON Lines, one at a time."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(fileobj, fieldnames=CATALOGUE_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+    else:
+        for row in rows:
+            fileobj.write(json.dumps(row, default=str))
+            fileobj.write('\n')
@@ -0,0 +1,148 @@
+# retailshop/app/category_tree.py
+# The whole category tree as one cached structure, for the pages that show it
+# (home banners, the categories page, the products sidebar).
+#
+# Built from ONE query (every category with its parent and product_count) and kept
+# in the cache until a category is saved/deleted or a product count changes (see the
+# signals and Product.save() in models.py). With Redis every process sees the
+# invalidation; with the per-process LocMem cache the others catch up within the timeout.
+# Until then they serve their old tree, so pages built from it put the tree's own version
+# (a hash of its rows) in their ETag, not just the database's (see app/http_cache.py).
+#
+# SQL that needs a subtree (e.g. the API's ?category= filter) uses the closure table
+# instead: products_in_category() below.
+
+import hashlib
+
+from django.core.cache import cache
+
+from .models import Category, CategoryClosure, Product
+
+CATEGORY_TREE_CACHE_KEY = 'category-tree'
+CATEGORY_TREE_CACHE_TIMEOUT = 60 * 5
+
+
+class CategoryNode:
+    """One category of the cached tree (plain attributes, so templates read it like a Category)."""
+    __slots__ = (
+        'pk', 'name', 'slug', 'description', 'banner_url', 'parent_id',
+        'depth', 'product_count', 'total_count', 'children',
+    )
+
+    def __init__(self, pk, name, slug, description, banner_url, parent_id, product_count):
+        self.pk = pk
+        self.name = name
+        self.slug = slug
+        self.description = description
+        self.banner_url = banner_url
+        self.parent_id = parent_id
+        self.product_count = product_count  # directly in this category
+        self.total_count = product_count    # including subcategories, filled in by the tree
+        self.depth = 0
+        self.children = []
+
+    @property
+    def id(self):
+        return self.pk
+
+    def descendants(self):
+        """Everything under this node, depth first (display order)."""
+        result = []
+        stack = list(reversed(self.children))
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(reversed(node.children))
+        return result
+
+    def __repr__(self):
+        return f"<CategoryNode {self.pk}: {self.name}>"
+
+
+class CategoryTree:
+    def __init__(self, rows):
+        """rows: (pk, name, slug, description, banner_image, parent_id, product_count), ordered by name."""
+        storage = Category._meta.get_field('banner_image').storage
+        digest = hashlib.md5()
+        self.by_pk = {}
+        for row in rows:
+            digest.update(repr(row).encode())
+            pk, name, slug, description, banner_image, parent_id, product_count = row
+            banner_url = storage.url(banner_image) if banner_image else None
+            self.by_pk[pk] = CategoryNode(pk, name, slug, description, banner_url, parent_id, product_count)
+        self.by_name = {node.name: node for node in self.by_pk.values()}
+        self.version = digest.hexdigest()[:16]  # changes with any row
+
+        # 1. Link children to parents (rows are sorted by name, so siblings are too)
+        self.roots = []
+        for node in self.by_pk.values():
+            parent = self.by_pk.get(node.parent_id)
+            (parent.children if parent else self.roots).append(node)
+
+        # 2. Depth-first order, depths, then subtree totals bottom-up
+        self.nodes = []
+        for root in self.roots:
+            self.nodes.append(root)
+            self.nodes.extend(root.descendants())
+        for node in self.nodes:
+            if node.parent_id in self.by_pk:
+                node.depth = self.by_pk[node.parent_id].depth + 1
+        for node in reversed(self.nodes):
+            if node.parent_id in self.by_pk:
+                self.by_pk[node.parent_id].total_count += node.total_count
+
+    def subtree_ids(self, pk):
+        """The pk and every category under it; empty for an unknown pk."""
+        node = self.by_pk.get(pk)
+        if node is None:
+            return set()
+        return {pk} | {descendant.pk for descendant in node.descendants()}
+
+    def subtree_totals(self, counts):
+        """{pk: n} per category -> {pk: n summed over its subtree} (e.g. facet counts)."""
+        totals = {node.pk: counts.get(node.pk, 0) for node in self.nodes}
+        for node in reversed(self.nodes):
+            if node.parent_id in totals:
+                totals[node.parent_id] += totals[node.pk]
+        return totals
+
+
+def build_category_tree():
+    rows = Category.objects.order_by('name').values_list(
+        'pk', 'name', 'slug', 'description', 'banner_image', 'parent_id', 'product_count'
+    )
+    return CategoryTree(rows)
+
+
+def get_category_tree():
+    """The cached tree; built (one query) on a miss."""
+    tree = cache.get(CATEGORY_TREE_CACHE_KEY)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(CATEGORY_TREE_CACHE_KEY, tree, CATEGORY_TREE_CACHE_TIMEOUT)
+    return tree
+
+
+def category_tree(request):
+    """
+    The tree this request works with: a page takes its ETag and its categories from
+    the same one, even if the cached tree is replaced in between.
+    """
+    if not hasattr(request, 'category_tree'):
+        request.category_tree = get_category_tree()
+    return request.category_tree
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_CACHE_KEY)
+
+
+def products_in_category(category_id, queryset=None):
+    """
+    Products of the category and all its subcategories, at any depth: a single
+    semi-join on the closure table's (ancestor, descendant) index.
+    """
+    queryset = Product.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        category_id__in=CategoryClosure.objects.filter(ancestor_id=category_id).values('descendant_id')
+    )
@@ -0,0 +1,218 @@
+# retailshop/app/compression.py
+# Response compression: brotli when the client accepts it and the `brotli` package is
+# installed, else gzip. Pages, JSON and CSV exports go out a few times smaller, which is
+# what mobile clients on slow networks feel most.
+#
+#   - Streaming responses (the CSV export) are compressed chunk by chunk as they are
+#     produced, never buffered whole. The compressor is flushed every STREAM_FLUSH_BYTES
+#     of input, not after every chunk: the CSV yields one row per chunk, and a flush per
+#     row made it over 50% bigger and 2.5x as slow to compress (manage.py bench_compression).
+#   - Only text-like content types are compressed (see COMPRESSIBLE_TYPES): images, fonts,
+#     archives are compressed already, and an event stream (text/event-stream, the live
+#     order status) must reach the browser event by event.
+#   - BREACH: a page carrying a CSRF token (it called get_token()) always gets gzip, with
+#     a random-length file name in the gzip header, so the compressed size no longer tells
+#     an attacker how well a guess matched. Django also masks the token differently on
+#     every response. Brotli has no header to pad, so those pages don't get it.
+#
+# Replaces django.middleware.gzip.GZipMiddleware (which only does gzip); goes high in
+# MIDDLEWARE, under SecurityMiddleware, so it compresses what every other middleware produced.
+
+import re
+import secrets
+import string
+import struct
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli  # same API, for PyPy
+    except ImportError:
+        brotli = None
+
+MIN_LENGTH = 200          # shorter bodies aren't worth it (the headers alone are bigger)
+MAX_RANDOM_BYTES = 100    # gzip header padding on CSRF pages, as Django's GZipMiddleware
+GZIP_LEVEL = 6            # defaults; the live ones are settings.COMPRESSION_*
+BROTLI_QUALITY = 5        # 11 is brotli's default and far too slow for live responses
+STREAM_FLUSH_BYTES = 16 * 1024  # streamed input between flushes (each flush costs ratio)
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/(html|plain|css|csv|javascript|xml)|application/([\w.+-]+\+)?(json|javascript|xml)|image/svg\+xml)\b'
+)
+ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+# --- ENCODERS ---
+
+class GzipEncoder:
+    """gzip, written by hand around raw deflate so the header's file name can be padded."""
+    name = 'gzip'
+
+    def __init__(self, level=GZIP_LEVEL, padding=0):
+        self.deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.crc = 0
+        self.size = 0
+        self.header = gzip_header(padding)
+
+    def compress(self, data, flush=False):
+        self.crc = zlib.crc32(data, self.crc)
+        self.size += len(data)
+        out = self.header + self.deflate.compress(data)
+        self.header = b''
+        if flush:
+            out += self.deflate.flush(zlib.Z_SYNC_FLUSH)
+        return out
+
+    def finish(self):
+        return self.header + self.deflate.flush() + struct.pack('<II', self.crc, self.size & 0xFFFFFFFF)
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality=BROTLI_QUALITY):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        out = self.compressor.process(data)
+        if flush:
+            out += self.compressor.flush()
+        return out
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def gzip_header(padding):
+    """RFC 1952 header, mtime 0; with padding, an FNAME field of that many random letters."""
+    if not padding:
+        return b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+    name = ''.join(secrets.choice(string.ascii_letters) for _ in range(padding)).encode()
+    return b'\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xff' + name + b'\x00'
+
+
+def random_padding():
+    return secrets.randbelow(MAX_RANDOM_BYTES) + 1
+
+
+# --- NEGOTIATION ---
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header ("gzip, br;q=0.9, *;q=0")."""
+    accepted = {}
+    for part in header.lower().split(','):
+        match = ACCEPT_ENCODING.fullmatch(part)
+        if not match:
+            continue
+        try:
+            accepted[match[1]] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+    return accepted
+
+
+def choose_encoding(header, allow_brotli=True):
+    """'br', 'gzip' or None (identity): the client's preferred one we can do, brotli on a tie."""
+    accepted = accepted_encodings(header)
+    wildcard = accepted.get('*', 0)
+    candidates = ['br', 'gzip'] if allow_brotli and brotli is not None else ['gzip']
+    best, best_q = None, 0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def make_encoder(coding, padding=0):
+    if coding == 'br':
+        return BrotliEncoder(settings.COMPRESSION_BROTLI_QUALITY)
+    return GzipEncoder(settings.COMPRESSION_GZIP_LEVEL, padding)
+
+
+# --- STREAMING ---
+
+class StreamCompressor:
+    """Feeds chunks to an encoder, flushing once STREAM_FLUSH_BYTES have gone in since the last flush."""
+
+    def __init__(self, encoder, flush_bytes=STREAM_FLUSH_BYTES):
+        self.encoder = encoder
+        self.flush_bytes = flush_bytes
+        self.pending = 0
+
+    def feed(self, chunk):
+        self.pending += len(chunk)
+        flush = self.pending >= self.flush_bytes
+        if flush:
+            self.pending = 0
+        return self.encoder.compress(chunk, flush=flush)
+
+
+def compress_stream(chunks, encoder, flush_bytes=STREAM_FLUSH_BYTES):
+    stream = StreamCompressor(encoder, flush_bytes)
+    for chunk in chunks:
+        data = stream.feed(chunk)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def compress_async_stream(chunks, encoder, flush_bytes=STREAM_FLUSH_BYTES):
+    stream = StreamCompressor(encoder, flush_bytes)
+    async for chunk in chunks:
+        data = stream.feed(chunk)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+# --- MIDDLEWARE ---
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Compresses responses with brotli or gzip, whichever the client prefers (see the top of the file)."""
+
+    def process_response(self, request, response):
+        # 1. Not worth it, not compressible, or compressed already
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+        if response.has_header('Content-Encoding') or response.status_code == 206:
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        # 2. Negotiate. A page with a CSRF token (get_token() was called, which leaves this
+        # key in META) gets padded gzip only: the BREACH mitigation
+        carries_csrf_token = 'CSRF_COOKIE_NEEDS_UPDATE' in request.META
+        coding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), allow_brotli=not carries_csrf_token)
+        if coding is None:
+            return response
+        encoder = make_encoder(coding, padding=random_padding() if carries_csrf_token else 0)
+
+        # 3. Compress: streams chunk by chunk, anything else in one go (kept only if smaller)
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_async_stream(response.streaming_content, encoder)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoder)
+            del response.headers['Content-Length']
+        else:
+            compressed = encoder.compress(response.content) + encoder.finish()
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        # 4. The body differs from the identity one now: a strong ETag becomes weak (RFC 9110 8.8.1)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = coding
+        return response
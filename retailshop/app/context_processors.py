@@ -0,0 +1,16 @@
+# retailshop/app/context_processors.py
+
+from django.utils.functional import SimpleLazyObject
+
+from .models import get_cart_summary
+
+
+def cart_summary(request):
+    """
+    Makes `cart_summary` ({'item_count', 'total'}) available to every template (e.g. the navbar).
+    It's lazy, so pages that never use it don't pay for the cache lookup.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {'cart_summary': SimpleLazyObject(lambda: get_cart_summary(user))}
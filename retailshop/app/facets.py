@@ -0,0 +1,389 @@
+# retailshop/app/facets.py
+# In-memory facet index for the products page (category, price range, in stock, rating).
+#
+# Every product gets a bit position; every facet value is a bitmap (a plain Python int)
+# with the bits of the products that have it. Filtering is AND-ing bitmaps and a facet
+# count is `(bitmap & filters).bit_count()`, so no COUNT queries run per request.
+#
+# Each process keeps its own index: built on first use, then kept current by sync(),
+# which re-reads only the products whose updated_at moved on and the products whose
+# reviews were written or edited since. It runs at most every FACET_SYNC_INTERVAL
+# seconds, and straight away after a save/delete in this process (signals below).
+# Deletions leave nothing to find: a product or review count that doesn't add up
+# means a full rebuild.
+# Syncs run in a background thread and swap in a new snapshot; searches never wait for
+# them (app/live_index.py).
+#
+# A snapshot carries the high-water marks and counts it was synced to (its `version`),
+# the same in every process that has seen the same data. The products page builds its
+# ETag from the snapshot it renders (facet_snapshot()), never from the database, so a
+# page from a snapshot that is behind can't be confirmed by a 304 once it catches up.
+
+import copy
+
+from django.db.models import Avg, Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .category_tree import category_tree
+from .live_index import LiveIndex
+from .models import Product, Review
+
+FACET_SYNC_INTERVAL = 5  # seconds
+FACETS = ('category', 'price', 'in_stock', 'rating')
+
+# (key, label, min price, max price) - max is exclusive, None = no upper bound
+PRICE_BUCKETS = [
+    ('0-500', 'Under Ksh 500', 0, 500),
+    ('500-1000', 'Ksh 500 - 1,000', 500, 1000),
+    ('1000-5000', 'Ksh 1,000 - 5,000', 1000, 5000),
+    ('5000-20000', 'Ksh 5,000 - 20,000', 5000, 20000),
+    ('20000-', 'Over Ksh 20,000', 20000, None),
+]
+# "n stars & up": a product is in every threshold its average rating reaches
+RATING_THRESHOLDS = [4, 3, 2, 1]
+
+
+def price_bucket(price):
+    for key, label, low, high in PRICE_BUCKETS:
+        if price >= low and (high is None or price < high):
+            return key
+    return None
+
+
+def bitmap_from_positions(positions, size):
+    """Builds a bitmap in one go (OR-ing bit by bit into a big int would be quadratic)."""
+    buffer = bytearray((size + 7) // 8)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+class MatchingIds:
+    """
+    The product ids of a bitmap, in id order, decoded lazily.
+    Has len() and slicing, so a Paginator can page it without decoding everything.
+    """
+    def __init__(self, bitmap, ids):
+        self.bitmap = bitmap
+        self.ids = ids
+        self.count = bitmap.bit_count()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start, stop, _ = item.indices(self.count)
+        bits = bin(self.bitmap)[:1:-1]  # bit 0 first
+        result = []
+        position, seen = bits.find('1'), 0
+        while position != -1 and seen < stop:
+            if seen >= start:
+                result.append(self.ids[position])
+            seen += 1
+            position = bits.find('1', position + 1)
+        return result
+
+
+class FacetSnapshot:
+    """One version of the index. Once published it is never changed, only replaced (app/live_index.py)."""
+
+    def __init__(self, ids, bitmaps, marks):
+        # Positions follow id order, so decoding a bitmap gives ids already sorted
+        self.ids = ids
+        self.positions = {pk: position for position, pk in enumerate(ids)}
+        self.all = bitmap_from_positions(range(len(ids)), len(ids))
+        self.bitmaps = bitmaps
+        self.marks = marks  # see sync_marks()
+
+    @property
+    def version(self):
+        """Identifies what this snapshot holds (the products page ETag)."""
+        marks = self.marks
+        return '-'.join(str(part) for part in (
+            stamp(marks['products_at']), marks['product_count'], stamp(marks['reviews_at']), marks['review_count'],
+        ))
+
+    def copy(self):
+        """A copy to change (bitmaps are ints, so copying the dicts holding them is enough)."""
+        clone = copy.copy(self)
+        clone.ids, clone.positions = list(self.ids), dict(self.positions)
+        clone.bitmaps = {facet: dict(by_value) for facet, by_value in self.bitmaps.items()}
+        return clone
+
+    # --- INCREMENTAL UPDATES (on a copy) ---
+
+    def set_product(self, pk, category_id, price, stock, rating):
+        if pk not in self.positions:
+            # New products go at the end, which keeps positions in id order
+            self.positions[pk] = len(self.ids)
+            self.ids.append(pk)
+            self.all |= 1 << self.positions[pk]
+        self.clear_bits(pk)
+
+        bit = 1 << self.positions[pk]
+        for facet, values in facet_values(category_id, price, stock, rating).items():
+            for value in values:
+                self.bitmaps[facet][value] = self.bitmaps[facet].get(value, 0) | bit
+
+    def remove_product(self, pk):
+        # The position stays allocated (unused) until the next full build
+        if pk in self.positions:
+            self.clear_bits(pk)
+            self.all &= ~(1 << self.positions[pk])
+
+    def clear_bits(self, pk):
+        # There are only a few dozen bitmaps, clearing the bit in all of them is cheap
+        mask = ~(1 << self.positions[pk])
+        for by_value in self.bitmaps.values():
+            for value in by_value:
+                by_value[value] &= mask
+
+    # --- QUERYING ---
+
+    def search(self, selected, restrict_to=None):
+        """See FacetIndex.search()."""
+        base = self.all
+        if restrict_to is not None:
+            base &= bitmap_from_positions(
+                (self.positions[pk] for pk in restrict_to if pk in self.positions), len(self.ids)
+            )
+
+        facet_masks = {}
+        for facet, values in selected.items():
+            if values:
+                mask = 0
+                for value in values:
+                    mask |= self.bitmaps[facet].get(value, 0)
+                facet_masks[facet] = mask
+
+        matching = base
+        for mask in facet_masks.values():
+            matching &= mask
+
+        counts = {}
+        for facet in FACETS:
+            others = base
+            for other, mask in facet_masks.items():
+                if other != facet:
+                    others &= mask
+            counts[facet] = {
+                value: (bitmap & others).bit_count() for value, bitmap in self.bitmaps[facet].items()
+            }
+        return MatchingIds(matching, self.ids), counts
+
+
+def stamp(moment):
+    return moment.timestamp() if moment else 0
+
+
+def sync_marks():
+    """
+    Where the products and reviews stand: the latest updated_at of each, their counts and
+    the highest review id. Two aggregate queries on indexed columns.
+    """
+    products = Product.objects.aggregate(at=Max('updated_at'), count=Count('pk'))
+    reviews = Review.objects.aggregate(at=Max('updated_at'), last_id=Max('pk'), count=Count('pk'))
+    return {
+        'products_at': products['at'], 'product_count': products['count'],
+        'reviews_at': reviews['at'], 'last_review_id': reviews['last_id'] or 0, 'review_count': reviews['count'],
+    }
+
+
+def changed_between(queryset, since, until):
+    """The rows whose updated_at is in [since, until] (since=None: from the start)."""
+    if until is None:
+        return queryset.none()
+    queryset = queryset.filter(updated_at__lte=until)
+    return queryset.filter(updated_at__gte=since) if since else queryset
+
+
+def facet_values(category_id, price, stock, rating):
+    """The facet values one product has, e.g. {'category': {3}, 'price': {'500-1000'}, ...}"""
+    return {
+        'category': {category_id} if category_id else set(),
+        'price': {price_bucket(price)} - {None},
+        'in_stock': {True} if stock > 0 else set(),
+        'rating': {n for n in RATING_THRESHOLDS if rating is not None and rating >= n},
+    }
+
+
+class FacetIndex(LiveIndex):
+    sync_interval = FACET_SYNC_INTERVAL
+
+    # --- BUILDING ---
+
+    def build(self):
+        """A new snapshot: 4 queries (the two sync_marks(), products and average ratings)."""
+        # Marks first: whatever changes while the rows are read is read again by the next sync
+        marks = sync_marks()
+        ratings = dict(
+            Review.objects.values('product_id').annotate(avg=Avg('rating')).values_list('product_id', 'avg')
+        )
+        rows = list(Product.objects.order_by('pk').values_list('pk', 'category_id', 'price', 'stock'))
+
+        members = {facet: {} for facet in FACETS}
+        for position, (pk, category_id, price, stock) in enumerate(rows):
+            for facet, values in facet_values(category_id, price, stock, ratings.get(pk)).items():
+                for value in values:
+                    members[facet].setdefault(value, []).append(position)
+
+        size = len(rows)
+        return FacetSnapshot(
+            ids=[row[0] for row in rows],
+            bitmaps={
+                facet: {value: bitmap_from_positions(positions, size) for value, positions in by_value.items()}
+                for facet, by_value in members.items()
+            },
+            marks=marks,
+        )
+
+    def refresh(self, snapshot, pks):
+        """Re-reads the given products from the DB into the snapshot (a missing one was deleted)."""
+        ratings = dict(
+            Review.objects.filter(product_id__in=pks)
+            .values('product_id').annotate(avg=Avg('rating')).values_list('product_id', 'avg')
+        )
+        found = set()
+        for pk, category_id, price, stock in Product.objects.filter(pk__in=pks).values_list('pk', 'category_id', 'price', 'stock'):
+            snapshot.set_product(pk, category_id, price, stock, ratings.get(pk))
+            found.add(pk)
+        for pk in set(pks) - found:
+            snapshot.remove_product(pk)
+
+    def sync(self, check_others):
+        """
+        Publishes an up-to-date snapshot (in the background, see app/live_index.py).
+        Every sync looks for other processes' changes too (check_others isn't needed: the
+        marks are two cheap queries), so the snapshot's marks, and the products page ETag,
+        always move with its content.
+        """
+        if self.snapshot is None:
+            self.dirty.clear()
+            self.snapshot = self.build()
+            return
+        # Saved or deleted in this process (the deleted ones can't be found by updated_at)
+        pks, self.dirty = self.dirty, set()
+
+        # 1. Nothing saved or deleted since the last sync leaves the marks where they were
+        old = self.snapshot.marks
+        marks = sync_marks()
+        if marks == old:
+            return
+
+        # 2. Products saved, and reviews written or edited, up to the new marks (later
+        # ones are the next sync's)
+        changed = set(
+            changed_between(Product.objects, old['products_at'], marks['products_at']).values_list('pk', flat=True)
+        )
+        reviews = list(
+            changed_between(Review.objects, old['reviews_at'], marks['reviews_at']).values_list('pk', 'product_id')
+        )
+        changed |= pks | {product_id for _, product_id in reviews}
+        new_reviews = sum(1 for pk, _ in reviews if old['last_review_id'] < pk <= marks['last_review_id'])
+
+        # 3. A deleted review leaves nothing to find: fewer reviews than that means a rebuild
+        if marks['review_count'] != old['review_count'] + new_reviews:
+            self.snapshot = self.build()
+            return
+
+        snapshot = self.snapshot.copy()
+        snapshot.marks = marks
+        self.refresh(snapshot, changed)
+
+        # 4. So does a product deleted by another process
+        if snapshot.all.bit_count() != marks['product_count']:
+            snapshot = self.build()
+        self.snapshot = snapshot
+
+    # --- QUERYING ---
+
+    def search(self, selected, restrict_to=None):
+        """
+        selected: {facet: set of values}; values are OR-ed within a facet, facets are AND-ed.
+        restrict_to: optional product ids (e.g. a text search) everything is limited to.
+        Returns (MatchingIds, counts) where counts[facet][value] is how many products
+        that value would show given the OTHER facets' filters.
+        """
+        return self.current().search(selected, restrict_to)
+
+
+facet_index = FacetIndex()
+
+
+# --- SIGNALS ---
+# Saves/deletes in this process make the next search start a sync
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def mark_product_dirty(sender, instance, **kwargs):
+    facet_index.dirty.add(instance.pk)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def mark_reviewed_product_dirty(sender, instance, **kwargs):
+    facet_index.dirty.add(instance.product_id)
+
+
+# --- PAGE HELPERS ---
+
+def facet_snapshot(request):
+    """
+    The snapshot this request works with. The products page takes its ETag and its
+    facets from the same one, even if a sync publishes a newer one in between.
+    """
+    if not hasattr(request, 'facet_snapshot'):
+        request.facet_snapshot = facet_index.current()
+    return request.facet_snapshot
+
+
+def parse_facet_filters(request):
+    """Reads ?category=<name>&price=<bucket>&price=...&in_stock=1&rating=<n> into {facet: values}."""
+    selected = {facet: set() for facet in FACETS}
+
+    category_name = request.GET.get('category')
+    if category_name:
+        # A category means its whole subtree: the bitmaps of all of them are OR-ed
+        tree = category_tree(request)
+        node = tree.by_name.get(category_name)
+        # An unknown category matches nothing (-1 has no bitmap)
+        selected['category'] = tree.subtree_ids(node.pk) if node else {-1}
+
+    valid_buckets = {key for key, *_ in PRICE_BUCKETS}
+    selected['price'] = {key for key in request.GET.getlist('price') if key in valid_buckets}
+
+    if request.GET.get('in_stock') == '1':
+        selected['in_stock'].add(True)
+
+    rating = request.GET.get('rating')
+    if rating and rating.isdigit() and int(rating) in RATING_THRESHOLDS:
+        selected['rating'].add(int(rating))
+    return selected
+
+
+def facet_options(tree, selected, counts):
+    """
+    Label/count/selected rows for the sidebar, in display order. Categories come from
+    the category tree (indented by depth) and count the products of their whole subtree.
+    """
+    category_counts = tree.subtree_totals(counts['category'])
+    return {
+        'category': [
+            # The selected one is the top of the selected subtree
+            {'value': node.name, 'label': node.name, 'depth': node.depth, 'count': category_counts[node.pk],
+             'selected': node.pk in selected['category'] and node.parent_id not in selected['category']}
+            for node in tree.nodes
+        ],
+        'price': [
+            {'value': key, 'label': label, 'count': counts['price'].get(key, 0), 'selected': key in selected['price']}
+            for key, label, *_ in PRICE_BUCKETS
+        ],
+        'in_stock': {'count': counts['in_stock'].get(True, 0), 'selected': bool(selected['in_stock'])},
+        'rating': [
+            {'value': n, 'label': f"{n}★ & up", 'count': counts['rating'].get(n, 0), 'selected': n in selected['rating']}
+            for n in RATING_THRESHOLDS
+        ],
+    }
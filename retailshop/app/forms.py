@@ -36,8 +36,8 @@ class ProfileUpdateForm(forms.ModelForm):
 class CategoryForm(forms.ModelForm):
     class Meta:
         model = Category
-        # Including 'description' as requested
-        fields = ['name', 'slug', 'description']
+        # Including 'description' as requested; Category.clean() refuses a parent inside its own subtree
+        fields = ['name', 'slug', 'parent', 'description']
 
 # 5. 🟢 CRITICAL: CHECKOUT FORM (The missing piece)
 class CheckoutForm(forms.Form):
@@ -0,0 +1,110 @@
+# retailshop/app/http_cache.py
+
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .category_tree import category_tree
+from .facets import facet_snapshot
+from .models import Category, Product, Review
+from .object_cache import cached_product
+
+
+# --- VERSION STAMPS ---
+
+def catalogue_version(request, *args, **kwargs):
+    """
+    Returns (last_modified, etag) for the whole catalogue (products + categories).
+    Both MAX() lookups use the updated_at indexes. The category count is part of the
+    ETag so deleting a category changes it too (deleted products bump their category).
+    """
+    product_last = Product.objects.aggregate(last=Max('updated_at'))['last']
+    category_stats = Category.objects.aggregate(last=Max('updated_at'), count=Count('id'))
+
+    stamps = [stamp for stamp in (product_last, category_stats['last']) if stamp]
+    last_modified = max(stamps) if stamps else None
+    etag = f"cat-{last_modified.timestamp() if last_modified else 0}-{category_stats['count']}"
+    return last_modified, etag
+
+
+def catalogue_page_version(request, *args, **kwargs):
+    """
+    Catalogue version + the version of the category tree the page is built from. The
+    tree is cached per process (app/category_tree.py): one that is behind would otherwise
+    be served under the new ETag and then confirmed by 304s. No Last-Modified: the
+    tree has no date to give, only the ETag can tell.
+    """
+    _, etag = catalogue_version(request)
+    return None, f"{etag}-t{category_tree(request).version}"
+
+
+def products_version(request, *args, **kwargs):
+    """
+    Catalogue page version + the version of the facet snapshot the page is built from
+    (the rating counts, and which products match), for the same reason.
+    """
+    _, etag = catalogue_page_version(request)
+    return None, f"{etag}-f{facet_snapshot(request).version}"
+
+
+def product_detail_version(request, pk):
+    """
+    Catalogue version + the product and category the page shows, as read from the object
+    cache (app/object_cache.py), not the database: with LocMem each process can keep an
+    old row for OBJECT_CACHE_TIMEOUT, which 304s would otherwise keep confirming.
+    Plus the product's reviews (the page lists them, edits included). No Last-Modified,
+    for the same reason.
+    """
+    _, etag = catalogue_version(request)
+    product = cached_product(request, pk)
+    review_stats = Review.objects.filter(product_id=pk).aggregate(last=Max('updated_at'), count=Count('id'))
+
+    review_last = review_stats['last'].timestamp() if review_stats['last'] else 0
+    etag = (
+        f"{etag}-p{pk}-{product.updated_at.timestamp()}-c{product.category.updated_at.timestamp()}"
+        f"-r{review_last}-{review_stats['count']}"
+    )
+    return None, etag
+
+
+# --- DECORATOR ---
+
+def conditional_catalogue_page(version_func=catalogue_page_version):
+    """
+    Adds ETag/Last-Modified to a catalogue page for anonymous visitors, and answers
+    If-None-Match/If-Modified-Since with a 304 BEFORE the view runs its queries.
+
+    Logged-in users (navbar shows their name/cart) and requests with pending flash
+    messages always get a full, `private` response. Every response varies on Cookie,
+    because both the login state and the CSRF token in the forms come from cookies.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if request.user.is_authenticated or len(get_messages(request)):
+                response = view_func(request, *args, **kwargs)
+                patch_cache_control(response, private=True, max_age=0)
+            else:
+                # condition() asks for the ETag and Last-Modified separately; compute once
+                version = []
+
+                def get_version(request, *args, **kwargs):
+                    if not version:
+                        version.append(version_func(request, *args, **kwargs))
+                    return version[0]
+
+                conditional_view = condition(
+                    etag_func=lambda *a, **kw: get_version(*a, **kw)[1],
+                    last_modified_func=lambda *a, **kw: get_version(*a, **kw)[0],
+                )(view_func)
+                response = conditional_view(request, *args, **kwargs)
+                # Cached copies must be revalidated each time (cheap: usually a 304)
+                patch_cache_control(response, max_age=0, must_revalidate=True)
+
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,50 @@
+# retailshop/app/jinja_env.py
+# Jinja2 environment for the storefront templates in app/jinja2/ (see STOREFRONT_JINJA2
+# in settings.py). Gives them the same helpers the DTL versions use: url(), static(),
+# querystring() and Django's own filters, so both engines render the same HTML.
+
+from types import SimpleNamespace
+
+from django.templatetags.static import static
+from django.template import defaultfilters
+from django.template.defaulttags import querystring as querystring_tag
+from django.urls import reverse
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, pass_context
+
+
+def url(name, *args, **kwargs):
+    """{{ url('product_detail', product.id) }} - like {% url %}."""
+    return reverse(name, args=args or None, kwargs=kwargs or None)
+
+
+@pass_context
+def querystring(context, **kwargs):
+    """{{ querystring(page=2, category=None) }} - like {% querystring %}, based on request.GET."""
+    return querystring_tag(SimpleNamespace(request=context['request']), **kwargs)
+
+
+def date(value, arg=None):
+    # DTL converts datetimes to the current time zone before |date, do the same
+    return defaultfilters.date(template_localtime(value), arg)
+
+
+def linebreaks(value):
+    return defaultfilters.linebreaks_filter(value, autoescape=True)
+
+
+def environment(**options):
+    env = Environment(**options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'querystring': querystring,
+    })
+    env.filters.update({
+        'date': date,
+        'floatformat': defaultfilters.floatformat,
+        'linebreaks': linebreaks,
+        'pluralize': defaultfilters.pluralize,
+        'truncatechars': defaultfilters.truncatechars,
+    })
+    return env
@@ -0,0 +1,228 @@
+# retailshop/app/jobs.py
+# A small in-project job queue: the Job table is the queue, `manage.py run_workers` runs it.
+#
+#   from app.jobs import enqueue
+#   enqueue('payments.stk_push', {'order_id': 5, ...}, idempotency_key='stk-push:order-5')
+#
+# Tasks are plain functions taking the payload dict, registered with @task in app/tasks.py.
+
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 60 * 60
+# Workers refresh the heartbeat of the jobs they are running this often, however long
+# the job takes (an archive run, a recommendations rebuild); a RUNNING job whose
+# heartbeat is older than STALE_JOB_TIMEOUT belonged to a dead worker and is handed out again
+HEARTBEAT_INTERVAL = 30
+STALE_JOB_TIMEOUT = timedelta(minutes=2)
+# Finished jobs are deleted after this long (failed ones are kept longer, to be looked into)
+DONE_JOB_RETENTION = timedelta(days=7)
+FAILED_JOB_RETENTION = timedelta(days=30)
+PRUNE_INTERVAL = 60 * 60
+PRUNE_BATCH_SIZE = 1000
+
+
+# --- TASK REGISTRY ---
+
+TaskSpec = namedtuple('TaskSpec', ['func', 'on_failure'])
+TASKS = {}
+
+
+def task(name, on_failure=None):
+    """
+    Registers a function as a job handler.
+    `on_failure(payload, exc)` is called once, when the job has used up all its attempts.
+    """
+    def decorator(func):
+        TASKS[name] = TaskSpec(func, on_failure)
+        return func
+    return decorator
+
+
+# --- ENQUEUE ---
+
+def enqueue(name, payload=None, idempotency_key=None, delay=0, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Adds a job to the queue and returns it. Call it inside the same transaction as the
+    data the job needs, so workers never see a job before that data is committed.
+    """
+    fields = {
+        'name': name,
+        'payload': payload or {},
+        'run_at': timezone.now() + timedelta(seconds=delay),
+        'max_attempts': max_attempts,
+    }
+    if idempotency_key:
+        job, _ = Job.objects.get_or_create(idempotency_key=idempotency_key, defaults=fields)
+        return job
+    return Job.objects.create(**fields)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with +/-10% jitter: 5s, 10s, 20s, ... capped at an hour."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return delay * random.uniform(0.9, 1.1)
+
+
+# --- CLAIM & RUN ---
+
+def claim_jobs(worker_id, limit):
+    """
+    Claims up to `limit` due jobs for this worker with ONE conditional UPDATE
+    (... WHERE status='queued'), so two workers can never take the same job,
+    on any database, without SELECT ... FOR UPDATE.
+    """
+    if limit <= 0:
+        return []
+
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+        .order_by('run_at')
+        .values_list('pk', flat=True)[:limit]
+    )
+    if not candidates:
+        return []
+
+    # A unique token tells us afterwards which of the candidates we actually won
+    claim_token = f"{worker_id}/{uuid.uuid4().hex[:12]}"
+    Job.objects.filter(pk__in=candidates, status=Job.QUEUED).update(
+        status=Job.RUNNING, locked_by=claim_token, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+    )
+    return list(Job.objects.filter(locked_by=claim_token, status=Job.RUNNING).order_by('run_at'))
+
+
+def run_job(job):
+    """Runs one claimed job and records the outcome (done / retry later / failed)."""
+    spec = TASKS.get(job.name)
+    now = timezone.now()
+
+    if spec is None:
+        job.status = Job.FAILED
+        job.last_error = f"No task registered under '{job.name}'"
+        job.finished_at = now
+        job.save(update_fields=['status', 'last_error', 'finished_at'])
+        return
+
+    try:
+        spec.func(job.payload)
+    except Exception as exc:
+        job.last_error = traceback.format_exc()[-4000:]
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+            logger.error("Job %s failed permanently: %s", job, exc)
+            if spec.on_failure:
+                spec.on_failure(job.payload, exc)
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(seconds=backoff_delay(job.attempts))
+            logger.warning("Job %s failed (attempt %s/%s), retrying: %s", job, job.attempts, job.max_attempts, exc)
+        job.save(update_fields=['status', 'last_error', 'finished_at', 'run_at'])
+        return
+
+    job.status = Job.DONE
+    job.finished_at = timezone.now()
+    job.last_error = ''
+    job.save(update_fields=['status', 'finished_at', 'last_error'])
+
+
+def send_heartbeat(job_ids):
+    """Marks these running jobs as still alive (one UPDATE for all of them)."""
+    if job_ids:
+        Job.objects.filter(pk__in=job_ids, status=Job.RUNNING).update(heartbeat_at=timezone.now())
+
+
+def requeue_stale_jobs():
+    """Puts back jobs left RUNNING by a worker that crashed or was killed (its heartbeat stopped)."""
+    cutoff = timezone.now() - STALE_JOB_TIMEOUT
+    return Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff).update(status=Job.QUEUED, locked_by='')
+
+
+def prune_finished_jobs():
+    """
+    Deletes jobs finished longer ago than their retention, PRUNE_BATCH_SIZE rows per
+    DELETE (short locks). Every price/stock change queues a job, so without this the
+    table only grows. Returns how many were deleted.
+    """
+    now = timezone.now()
+    finished = Job.objects.filter(
+        Q(status=Job.DONE, finished_at__lt=now - DONE_JOB_RETENTION)
+        | Q(status=Job.FAILED, finished_at__lt=now - FAILED_JOB_RETENTION)
+    )
+    deleted = 0
+    while job_ids := list(finished.values_list('pk', flat=True)[:PRUNE_BATCH_SIZE]):
+        deleted += Job.objects.filter(pk__in=job_ids).delete()[0]
+    return deleted
+
+
+# --- WORKER ---
+
+class Worker:
+    """
+    Polls the queue and runs jobs on a thread pool (one DB connection per thread).
+    Only claims as many jobs as it has free threads, so nothing sits claimed-but-idle.
+    """
+    def __init__(self, threads=4, poll_interval=1.0, worker_id=None):
+        self.threads = threads
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.stop_event = threading.Event()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self, once=False):
+        """Runs until stop() is called. With once=True, returns when the queue is empty."""
+        inflight = {}  # future -> job id
+        last_stale_check, last_prune, last_heartbeat = 0, 0, time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='job') as pool:
+            while not self.stop_event.is_set():
+                inflight = {future: job_id for future, job_id in inflight.items() if not future.done()}
+
+                if time.monotonic() - last_heartbeat > HEARTBEAT_INTERVAL:
+                    send_heartbeat(list(inflight.values()))
+                    last_heartbeat = time.monotonic()
+                if time.monotonic() - last_stale_check > 60:
+                    requeue_stale_jobs()
+                    last_stale_check = time.monotonic()
+                if time.monotonic() - last_prune > PRUNE_INTERVAL:
+                    prune_finished_jobs()
+                    last_prune = time.monotonic()
+
+                jobs = claim_jobs(self.worker_id, self.threads - len(inflight))
+                for job in jobs:
+                    inflight[pool.submit(self.execute, job)] = job.pk
+
+                if not jobs:
+                    if once and not inflight:
+                        break
+                    # Sleep briefly when busy (a thread will free up soon), fully when idle
+                    self.stop_event.wait(0.01 if inflight else self.poll_interval)
+
+    def execute(self, job):
+        try:
+            run_job(job)
+        except Exception:
+            logger.exception("Worker crashed while recording job %s", job)
+        finally:
+            close_old_connections()
@@ -0,0 +1,72 @@
+# retailshop/app/live_index.py
+# What the per-process in-memory indexes (app/facets.py, app/autocomplete.py) share:
+# keeping one up to date without making requests wait for it.
+#
+# Requests read `index.snapshot` with no lock. A sync never changes the published
+# snapshot: it builds a new one (a full build, or a copy with the changes applied)
+# and assigns it to `snapshot`, a single attribute store, so a request sees either
+# the old one or the new one. Syncs run in a background thread, one at a time; only
+# the very first build (nothing to serve yet) makes requests wait.
+
+import logging
+import threading
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class LiveIndex:
+    """Subclasses implement sync(check_others), which must end by publishing self.snapshot."""
+    sync_interval = 5  # seconds between looks at other processes' changes
+    # False runs the sync in the request that found it due (used by the tests: a
+    # background thread's DB connection can't see the test's transaction)
+    sync_in_background = True
+
+    def __init__(self):
+        self.lock = threading.Lock()  # held while a sync runs
+        self.snapshot = None
+        self.dirty = set()  # changed in this process, see the subclasses' signals
+        self.checked_at = 0
+
+    def current(self):
+        """The snapshot to read. Starts a sync when one is due, but doesn't wait for it."""
+        if self.snapshot is None:
+            # 1. Nothing to serve yet: the first requests wait for one build
+            with self.lock:
+                if self.snapshot is None:
+                    self.run_sync()
+        elif self.sync_due() and self.lock.acquire(blocking=False):
+            # 2. Due, and no sync running: this request goes on with the current snapshot
+            if self.sync_in_background:
+                threading.Thread(target=self.background_sync, daemon=True).start()
+            else:
+                try:
+                    self.run_sync()
+                finally:
+                    self.lock.release()
+        return self.snapshot
+
+    def sync_due(self):
+        return bool(self.dirty) or time.monotonic() - self.checked_at >= self.sync_interval
+
+    def run_sync(self):
+        """Calls sync(); other processes' changes are only looked for every sync_interval seconds."""
+        check_others = time.monotonic() - self.checked_at >= self.sync_interval
+        if check_others:
+            self.checked_at = time.monotonic()
+        self.sync(check_others)
+
+    def background_sync(self):
+        try:
+            self.run_sync()
+        except Exception:
+            # The old snapshot stays published; the next due request tries again
+            logger.exception("%s sync failed", type(self).__name__)
+        finally:
+            connections.close_all()  # this thread's own connections
+            self.lock.release()
+
+    def sync(self, check_others):
+        raise NotImplementedError
@@ -0,0 +1,56 @@
+# retailshop/app/management/commands/archive_orders.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+
+from app.models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem
+from app.order_archive import ARCHIVE_CHUNK_SIZE, archivable_orders, archive_cutoff, archive_orders
+
+
+class Command(BaseCommand):
+    help = "Moves old Paid/Complete/Payment Failed and cash on delivery orders to the archive tables, a month at a time (run nightly)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=None,
+            help=f"Archive orders older than this (default settings.ORDER_ARCHIVE_AFTER_DAYS = {settings.ORDER_ARCHIVE_AFTER_DAYS}).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=ARCHIVE_CHUNK_SIZE, help="Orders moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only show how many orders each month would move.")
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+
+        if options['dry_run']:
+            months = (
+                archivable_orders(archive_cutoff(days))
+                .annotate(month=TruncMonth('created_at')).values('month')
+                .annotate(orders=Count('pk')).order_by('month')
+            )
+            for row in months:
+                self.stdout.write(f"{row['month']:%Y-%m}: {row['orders']} orders would be moved")
+            self.table_sizes()
+            return
+
+        start = time.perf_counter()
+
+        def progress(month, moved):
+            self.stdout.write(f"{month:%Y-%m}: {moved} orders moved", ending='\r')
+
+        moved = archive_orders(days, chunk_size=options['chunk_size'], progress=progress)
+        for month, count in moved.items():
+            self.stdout.write(f"{month:%Y-%m}: {count} orders moved")
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {sum(moved.values())} orders in {time.perf_counter() - start:.1f}s"
+        ))
+        self.table_sizes()
+
+    def table_sizes(self):
+        self.stdout.write(
+            f"Hot: {Order.objects.count()} orders, {OrderItem.objects.count()} items. "
+            f"Archive: {ArchivedOrder.objects.count()} orders, {ArchivedOrderItem.objects.count()} items."
+        )
@@ -0,0 +1,80 @@
+# retailshop/app/management/commands/bench_api.py
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.test import RequestFactory
+
+from app import api
+from app.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks a full catalogue export through /api/products/ (keyset pages of --page-size) "
+        "against serializing full Product model instances."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help="Temporarily add N synthetic products (rolled back afterwards).")
+        parser.add_argument('--page-size', type=int, default=api.MAX_PAGE_SIZE)
+        parser.add_argument('--fields', default='', help="Sparse fieldset to request, e.g. id,name,price")
+
+    def handle(self, *args, **options):
+        # Everything runs inside a transaction that's rolled back, so --seed leaves no rows behind
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+
+            rows, api_seconds, api_bytes = self.export_via_api(options)
+            model_rows, model_seconds = self.export_via_models()
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"API export:   {rows} rows in {api_seconds:.2f}s "
+                          f"({rows / max(api_seconds, 1e-9):,.0f} rows/s, {api_bytes / 1e6:.1f} MB JSON)")
+        self.stdout.write(f"Model export: {model_rows} rows in {model_seconds:.2f}s "
+                          f"({model_rows / max(model_seconds, 1e-9):,.0f} rows/s)")
+
+    def seed(self, count):
+        category, _ = Category.objects.get_or_create(slug='bench-api', defaults={'name': 'Bench API'})
+        Product.objects.bulk_create(
+            (Product(category=category, name=f"Bench product {i}", price=i % 5000 + 1, stock=i % 50,
+                     description="Synthetic benchmark product " * 4)
+             for i in range(count)),
+            batch_size=2000,
+        )
+
+    def export_via_api(self, options):
+        """Walks every page with ?after=<cursor>, like a partner feed would."""
+        factory = RequestFactory()
+        params = {'limit': options['page_size']}
+        if options['fields']:
+            params['fields'] = options['fields']
+
+        rows = total_bytes = 0
+        start = time.perf_counter()
+        while True:
+            response = api.product_list(factory.get('/api/products/', params))
+            total_bytes += len(response.content)
+            page = json.loads(response.content)
+            rows += page['count']
+            if page['next'] is None:
+                break
+            params['after'] = page['next']
+        return rows, time.perf_counter() - start, total_bytes
+
+    def export_via_models(self):
+        """The old way: full model instances, then picking attributes off each one."""
+        start = time.perf_counter()
+        rows = 0
+        for product in Product.objects.select_related('category').order_by('pk').iterator(chunk_size=2000):
+            json.dumps({
+                'id': product.pk, 'name': product.name, 'price': product.price, 'stock': product.stock,
+                'image': product.image.url if product.image else None, 'category': product.category.slug,
+            }, cls=DjangoJSONEncoder)
+            rows += 1
+        return rows, time.perf_counter() - start
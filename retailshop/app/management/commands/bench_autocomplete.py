@@ -0,0 +1,187 @@
+# retailshop/app/management/commands/bench_autocomplete.py
+# Latency of search-as-you-type (app/autocomplete.py) on N synthetic product names
+# (default 1M, no database): build time and memory, then the /api/autocomplete/ view
+# itself (suggest() and the JSON response) over a mix of typed prefixes, with syncs
+# running in the background as in production, and the cost of incremental updates.
+# Fails when the endpoint's p99 is over --budget-ms.
+
+import random
+import resource
+import statistics
+import sys
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from app import api
+from app.autocomplete import (
+    CATEGORY, MAX_PENDING_CHANGES, PRODUCT, AutocompleteIndex, AutocompleteSnapshot, PrefixIndex, category_score,
+    product_score,
+)
+
+BRANDS = [
+    'Nike', 'Adidas', 'Samsung', 'Tecno', 'Infinix', 'Ramtons', 'Von', 'Hotpoint', 'Bata', 'Puma',
+    'Sony', 'LG', 'Oraimo', 'Nivea', 'Colgate', 'Royco', 'Kimbo', 'Brookside', 'Dettol', 'Philips',
+]
+ADJECTIVES = [
+    'classic', 'slim', 'pro', 'max', 'mini', 'ultra', 'smart', 'wireless', 'leather', 'cotton',
+    'stainless', 'portable', 'digital', 'organic', 'premium', 'sport', 'kids', 'family', 'heavy duty', 'eco',
+]
+NOUNS = [
+    'sneakers', 'running shoes', 'sandals', 'smartphone', 'earbuds', 'blender', 'kettle', 'microwave',
+    'fridge', 'television', 'backpack', 'jacket', 't-shirt', 'jeans', 'toothpaste', 'body lotion',
+    'cooking fat', 'milk', 'rice', 'flour', 'sofa', 'mattress', 'lamp', 'charger', 'power bank',
+]
+CATEGORIES = [
+    'Fashion', 'Shoes', 'Sneakers', 'Electronics', 'Phones', 'Audio', 'Kitchen', 'Appliances',
+    'Groceries', 'Beauty', 'Home', 'Furniture', 'Kids', 'Sports', 'Health',
+]
+
+
+def synthetic_products(count, rng):
+    """(pk, name, score): brand + adjective + noun + model number; sales follow a long tail."""
+    rows = []
+    for pk in range(1, count + 1):
+        name = f"{rng.choice(BRANDS)} {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice('ABCDEFGHJKLMNPRSTX')}{rng.randrange(10, 9999)}"
+        sold = int(rng.paretovariate(1.2)) - 1
+        rows.append((pk, name, product_score(rng.choice([0, 5, 20, 50]), sold)))
+    return rows
+
+
+def typed_queries(products, count, rng):
+    """What people type: 1 to 8 characters of some word of some name, sometimes two words, sometimes nothing matching."""
+    queries = []
+    for _ in range(count):
+        words = rng.choice(products)[1].split()
+        kind = rng.random()
+        if kind < 0.1:
+            queries.append(rng.choice(words)[:1])
+        elif kind < 0.85:
+            queries.append(rng.choice(words)[:rng.randint(2, 8)])
+        elif kind < 0.95:
+            start = rng.randrange(len(words) - 1)
+            queries.append(f"{words[start]} {words[start + 1][:rng.randint(1, 4)]}")
+        else:
+            queries.append(f"zq{rng.randrange(1000)}")
+    return queries
+
+
+def changed_products(first_pk, count):
+    return {(PRODUCT, pk): (f"Benchmark changed product {pk}", product_score(5, pk % 100)) for pk in range(first_pk, first_pk + count)}
+
+
+class SyntheticSyncs(AutocompleteIndex):
+    """
+    The live index, with a sync that needs no database: `batch` more changed products
+    each time, published as a new snapshot like a real sync of that size.
+    """
+    def __init__(self, snapshot, batch):
+        super().__init__(max_products=snapshot.base.max_products)
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+        self.batch = batch
+        self.next_pk = 20_000_000
+        self.sync_ms = []
+
+    def sync(self, check_others):
+        start = time.perf_counter()
+        changes = {**self.snapshot.changes, **changed_products(self.next_pk, self.batch)}
+        self.next_pk += self.batch
+        self.snapshot = AutocompleteSnapshot(self.snapshot.base, changes)
+        self.sync_ms.append((time.perf_counter() - start) * 1000)
+
+
+def index_size(index):
+    """Bytes held by the index (arrays, the name strings, the pk -> slot dicts)."""
+    size = sum(sys.getsizeof(part) for part in (
+        index.kinds, index.pks, index.scores, index.entries, index.ranked, index.names, index.folded,
+    ))
+    size += sum(sys.getsizeof(text) for text in index.names if text is not None)
+    size += sum(sys.getsizeof(text) for text in index.folded if text is not None)
+    for slots in index.slots.values():
+        size += sys.getsizeof(slots) + sum(sys.getsizeof(pk) for pk in slots)
+    return size
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Measures /api/autocomplete/ latency (p50/p99/max), with background syncs, and memory on N synthetic product names."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--limit', type=int, default=8, help="Suggestions per lookup.")
+        parser.add_argument('--budget-ms', type=float, default=5.0, help="Fail if the endpoint's p99 is over this.")
+        parser.add_argument('--sync-interval', type=float, default=1.0, help="Seconds between background syncs while timing.")
+        parser.add_argument('--sync-batch', type=int, default=50, help="Products each background sync inserts.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        products = synthetic_products(options['products'], rng)
+        categories = [(pk, name, category_score(rng.randrange(1000))) for pk, name in enumerate(CATEGORIES, 1)]
+        queries = typed_queries(products, options['queries'], rng)
+
+        # 1. Build
+        index = PrefixIndex(max_products=len(products))
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.perf_counter()
+        index.load(categories, products)
+        build_s = time.perf_counter() - start
+        rss_growth_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+        del products
+        size = index_size(index)
+        self.stdout.write(
+            f"{options['products']:,} products, {len(index.entries):,} word entries: "
+            f"built in {build_s:.1f}s, peak RSS +{rss_growth_mb:.0f} MB while building, "
+            f"index {size / 2**20:.0f} MB ({size / len(index.names):.0f} bytes per name)"
+        )
+
+        # 2. Requests to the view (a warm-up pass first, then timed). A sync starts every
+        # --sync-interval seconds in a background thread, as it would in a web process
+        live = SyntheticSyncs(AutocompleteSnapshot(index), options['sync_batch'])
+        live.sync_interval = options['sync_interval']
+        factory = RequestFactory()
+        requests = [factory.get('/api/autocomplete/', {'q': query, 'limit': options['limit']}) for query in queries]
+        timings, empty = [], 0
+        with mock.patch.object(api, 'autocomplete_index', live):
+            for request in requests[:1000]:
+                api.autocomplete(request)
+            for request in requests:
+                start = time.perf_counter()
+                response = api.autocomplete(request)
+                timings.append((time.perf_counter() - start) * 1000)
+                empty += response.content.endswith(b'"results": []}')
+        with live.lock:  # let a sync still running finish
+            pass
+        timings.sort()
+        p99 = percentile(timings, 0.99)
+        self.stdout.write(
+            f"{len(queries):,} requests ({empty:,} with no match): p50 {percentile(timings, 0.5):.3f} ms, "
+            f"p90 {percentile(timings, 0.9):.3f} ms, p99 {p99:.3f} ms, max {timings[-1]:.3f} ms"
+        )
+        if live.sync_ms:
+            self.stdout.write(
+                f"{len(live.sync_ms)} background syncs meanwhile ({options['sync_batch']} more changed names each, "
+                f"{len(live.snapshot.changes)} at the end): {statistics.median(live.sync_ms):.0f} ms median"
+            )
+
+        # 3. What a sync costs, with few and with the most changes it keeps before a rebuild
+        # (it re-indexes every name changed since the last build, see app/autocomplete.py)
+        sync_ms = {}
+        for pending in (options['sync_batch'], MAX_PENDING_CHANGES):
+            changes = changed_products(30_000_000, pending)
+            changes[(CATEGORY, 1)] = ("Fashion & Style", category_score(10))
+            start = time.perf_counter()
+            AutocompleteSnapshot(index, changes)
+            sync_ms[pending] = (time.perf_counter() - start) * 1000
+        self.stdout.write("Syncs: " + ", ".join(f"{n} changed names {ms:.0f} ms" for n, ms in sync_ms.items()))
+
+        if p99 > options['budget_ms']:
+            raise CommandError(f"Endpoint p99 {p99:.3f} ms is over the {options['budget_ms']} ms budget.")
+        self.stdout.write(self.style.SUCCESS(f"p99 within the {options['budget_ms']} ms budget."))
@@ -0,0 +1,131 @@
+# retailshop/app/management/commands/bench_compression.py
+# What the compression middleware (app/compression.py) saves and costs, on this
+# catalogue's real responses: the storefront pages, API pages of several sizes and the
+# streamed sales CSV. For each response and each encoder (gzip levels, brotli qualities
+# when the `brotli` package is installed): compressed size, bytes saved, CPU time per
+# response and throughput. The CSV is also compressed as it is streamed, flushing after
+# every chunk and every STREAM_FLUSH_BYTES, against compressing the whole body at once.
+
+import statistics
+import time
+import zlib
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from app import compression
+from app.compression import MIN_LENGTH, STREAM_FLUSH_BYTES, BrotliEncoder, GzipEncoder, compress_stream
+from app.models import Product
+
+BENCH_USERNAME = 'bench-compression-staff'
+
+
+def encoders():
+    """(label, factory) for every encoder setting compared."""
+    configs = [(f"gzip -{level}", lambda level=level: GzipEncoder(level)) for level in (1, 6, 9)]
+    if compression.brotli is not None:
+        configs += [(f"br q{quality}", lambda quality=quality: BrotliEncoder(quality)) for quality in (4, 5, 7, 11)]
+    return configs
+
+
+def cpu_ms(work, rounds):
+    """Median CPU milliseconds of `work()` (process time: what the worker actually spends)."""
+    timings = []
+    for _ in range(rounds):
+        start = time.process_time()
+        work()
+        timings.append((time.process_time() - start) * 1000)
+    return statistics.median(timings)
+
+
+def compress_whole(factory, body):
+    encoder = factory()
+    return encoder.compress(body) + encoder.finish()
+
+
+def compress_chunks(factory, chunks, flush_bytes):
+    return b''.join(compress_stream(chunks, factory(), flush_bytes))
+
+
+class Command(BaseCommand):
+    help = "Reports bytes saved and CPU time per response size for gzip and brotli on real responses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help="Timed compressions per response and encoder.")
+
+    def handle(self, *args, **options):
+        product_pk = Product.objects.order_by('pk').values_list('pk', flat=True).first()
+        if product_pk is None:
+            raise CommandError("No products in the database.")
+
+        # 1. The responses, uncompressed (no Accept-Encoding)
+        staff, _ = User.objects.get_or_create(username=BENCH_USERNAME, defaults={'is_staff': True})
+        client = Client(HTTP_HOST='localhost', raise_request_exception=False)
+        client.force_login(staff)
+        today = timezone.localdate()
+        try:
+            responses = [
+                ('api autocomplete', client.get(reverse('api_autocomplete'), {'q': 'a'})),
+                ('product_detail', client.get(reverse('product_detail', args=[product_pk]))),
+                ('api products x10', client.get(reverse('api_products'), {'limit': 10})),
+                ('home', client.get(reverse('home'))),
+                ('products', client.get(reverse('products'))),
+                ('api products x100', client.get(reverse('api_products'), {'limit': 100})),
+                ('api products x1000', client.get(reverse('api_products'), {'limit': 1000})),
+                ('sales CSV (30 days)', client.get(reverse('sales_export'), {
+                    'start': (today - timedelta(days=29)).isoformat(), 'end': today.isoformat(),
+                })),
+            ]
+        finally:
+            staff.delete()
+
+        bodies = []
+        for label, response in responses:
+            if response.status_code != 200:
+                raise CommandError(f"{label}: HTTP {response.status_code}")
+            chunks = list(response.streaming_content) if response.streaming else [response.content]
+            bodies.append((label, chunks))
+        bodies.sort(key=lambda item: sum(map(len, item[1])))
+
+        # 2. Each response with each encoder (whole body), smallest response first
+        self.stdout.write(
+            f"{'response':<21}{'size':>10}  {'encoder':<9}{'compressed':>11}{'saved':>8}{'CPU ms':>9}{'MB/s':>8}"
+        )
+        for label, chunks in bodies:
+            body = b''.join(chunks)
+            if len(body) < MIN_LENGTH:
+                self.stdout.write(f"{label:<21}{len(body):>9}B  not compressed (under {MIN_LENGTH} bytes)")
+                continue
+            for name, factory in encoders():
+                compressed = compress_whole(factory, body)
+                if name.startswith('gzip') and zlib.decompress(compressed, 31) != body:
+                    raise CommandError(f"{label}: {name} output doesn't decompress to the body.")
+                milliseconds = cpu_ms(lambda: compress_whole(factory, body), options['rounds'])
+                self.stdout.write(
+                    f"{label:<21}{len(body) / 1024:>8.1f}KB  {name:<9}{len(compressed) / 1024:>9.1f}KB"
+                    f"{100 * (1 - len(compressed) / len(body)):>7.0f}%{milliseconds:>9.3f}"
+                    f"{len(body) / 2**20 / (milliseconds / 1000) if milliseconds else float('inf'):>8.0f}"
+                )
+
+        # 3. Streaming the CSV: in one go, a flush per chunk, and a flush per STREAM_FLUSH_BYTES (the middleware)
+        label, chunks = next(item for item in bodies if item[0].startswith('sales CSV'))
+        body = b''.join(chunks)
+        rounds = max(1, options['rounds'] // 4)
+        self.stdout.write(f"\n{label}: {len(chunks):,} chunks, {len(body) / 1024:.1f} KB")
+        for name, factory in encoders():
+            results = [('whole', len(compress_whole(factory, body)), cpu_ms(lambda: compress_whole(factory, body), rounds))]
+            for flush_label, flush_bytes in (('flush/chunk', 0), (f"flush/{STREAM_FLUSH_BYTES // 1024}KB", STREAM_FLUSH_BYTES)):
+                streamed = compress_chunks(factory, chunks, flush_bytes)
+                if name.startswith('gzip') and zlib.decompress(streamed, 31) != body:
+                    raise CommandError(f"{label}: streamed {name} output doesn't decompress to the body.")
+                milliseconds = cpu_ms(lambda: compress_chunks(factory, chunks, flush_bytes), rounds)
+                results.append((flush_label, len(streamed), milliseconds))
+            self.stdout.write(f"  {name:<9}" + " | ".join(
+                f"{result_label} {size / 1024:.1f}KB {milliseconds:.2f} ms" for result_label, size, milliseconds in results
+            ))
+        if compression.brotli is None:
+            self.stdout.write("(brotli isn't installed: gzip only)")
@@ -0,0 +1,131 @@
+# retailshop/app/management/commands/bench_importtime.py
+# Guards web worker cold start: boots the project in fresh interpreters with
+# `python -X importtime`, like a new gunicorn/uvicorn worker does, and fails when boot
+# gets slower than the stored baseline or a heavy module is imported at boot.
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'importtime.json'
+
+# Only background jobs and staff reports need these; a web worker must not load them at boot
+BOOT_FORBIDDEN_MODULES = [
+    'django_daraja.mpesa.core',  # the M-Pesa SDK (pulls in requests, cryptography, ...)
+    'requests',
+    'numpy',
+    'scipy',
+]
+
+# What a worker does before its first request: load the WSGI app and the URLconf.
+# The URLconf is timed here: Django imports it with importlib.import_module(), which
+# -X importtime doesn't report (only the imports inside it).
+BOOT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+urls_start = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+end = time.perf_counter()
+print(json.dumps({'seconds': end - start, 'urlconf_seconds': end - urls_start, 'modules': sorted(sys.modules)}))
+"""
+
+
+def parse_importtime(stderr):
+    """{module: (self us, cumulative us)} from `-X importtime` output."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def boot_once(pycache_dir):
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = settings.SETTINGS_MODULE
+    # Real workers start from compiled bytecode, so time that and not the compiler
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPYCACHEPREFIX'] = pycache_dir
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise CommandError(f"Boot failed:\n{result.stderr[-2000:]}")
+    boot = json.loads(result.stdout.strip().splitlines()[-1])
+    return boot, parse_importtime(result.stderr)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures worker cold start (WSGI app + URLconf) with -X importtime over several fresh "
+        "interpreters, lists the slowest app imports, and fails on heavy modules at boot or a "
+        "slowdown against the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=7)
+        parser.add_argument('--top', type=int, default=15, help="How many of the slowest imports to list.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON to compare with.")
+        parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed boot slowdown (0.25 = 25%%).")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as pycache_dir:
+            boot_once(pycache_dir)  # compiles the bytecode, not recorded
+            runs = [boot_once(pycache_dir) for _ in range(options['runs'])]
+
+        boot_ms = statistics.median(boot['seconds'] for boot, _ in runs) * 1000
+        # Per module, the median over the runs
+        names = set.intersection(*(set(timings) for _, timings in runs))
+        cumulative_ms = {
+            name: statistics.median(timings[name][1] for _, timings in runs) / 1000 for name in names
+        }
+        summary = {
+            'boot_ms': round(boot_ms, 1),
+            'urlconf_ms': round(statistics.median(boot['urlconf_seconds'] for boot, _ in runs) * 1000, 1),
+            'modules': len(runs[0][0]['modules']),
+        }
+
+        self.stdout.write(
+            f"Boot (WSGI app + URLconf): {summary['boot_ms']} ms median of {options['runs']}, "
+            f"of which URLconf and views {summary['urlconf_ms']} ms; {summary['modules']} modules loaded"
+        )
+        self.stdout.write(f"{'module':<45}{'cumulative ms':>15}")
+        slowest = sorted((name for name in names if name.startswith('app')), key=cumulative_ms.get, reverse=True)
+        for name in slowest[:options['top']]:
+            self.stdout.write(f"{name:<45}{cumulative_ms[name]:>15.2f}")
+
+        # 1. Heavy modules at boot fail regardless of timing
+        loaded = set(runs[0][0]['modules'])
+        forbidden = [name for name in BOOT_FORBIDDEN_MODULES if name in loaded]
+        if forbidden:
+            raise CommandError(f"Imported at worker boot: {', '.join(forbidden)} (import them where they're used).")
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(summary, indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path} (use --save-baseline to create one).")
+            return
+
+        # 2. Slower boot than the baseline (and by at least 20ms, so small numbers don't flap)
+        baseline = json.loads(baseline_path.read_text())
+        limit = baseline['boot_ms'] * (1 + options['tolerance'])
+        if boot_ms > limit and boot_ms - baseline['boot_ms'] > 20:
+            raise CommandError(f"Boot regression: {baseline['boot_ms']} ms -> {summary['boot_ms']} ms")
+        self.stdout.write(self.style.SUCCESS(f"No regression against the baseline ({baseline['boot_ms']} ms)."))
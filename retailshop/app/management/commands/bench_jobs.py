@@ -0,0 +1,59 @@
+# retailshop/app/management/commands/bench_jobs.py
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from app.jobs import Worker, task
+from app.models import Job
+
+
+@task('bench.noop')
+def noop(payload):
+    """Does nothing, so the benchmark measures the queue itself."""
+    time.sleep(payload.get('sleep', 0))
+
+
+class Command(BaseCommand):
+    help = "Measures job throughput (jobs/s) and queue latency (created -> started) of the job system."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds each job sleeps (simulated I/O).")
+
+    def handle(self, *args, **options):
+        Job.objects.filter(name='bench.noop').delete()
+        Job.objects.bulk_create(
+            [Job(name='bench.noop', payload={'sleep': options['sleep']}) for _ in range(options['jobs'])],
+            batch_size=1000,
+        )
+
+        start = time.perf_counter()
+        Worker(threads=options['threads'], poll_interval=0.05).run(once=True)
+        elapsed = time.perf_counter() - start
+
+        jobs = Job.objects.filter(name='bench.noop')
+        done = jobs.filter(status=Job.DONE).count()
+        latencies = sorted(
+            (started - created).total_seconds() * 1000
+            for created, started in jobs.filter(status=Job.DONE).values_list('created_at', 'started_at')
+        )
+        run_times = [
+            d.total_seconds() * 1000
+            for d in jobs.filter(status=Job.DONE).annotate(run=F('finished_at') - F('started_at')).values_list('run', flat=True)
+        ]
+        jobs.delete()
+
+        if not latencies:
+            self.stdout.write(self.style.ERROR("No jobs completed."))
+            return
+
+        pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+        self.stdout.write(f"{done}/{options['jobs']} jobs done in {elapsed:.2f}s with {options['threads']} threads "
+                          f"-> {done / elapsed:,.0f} jobs/s")
+        self.stdout.write(f"Queue latency (ms): p50 {pct(0.5):.0f}  p95 {pct(0.95):.0f}  max {latencies[-1]:.0f}"
+                          f"  (all jobs were queued up front)")
+        self.stdout.write(f"Run time per job (ms): mean {statistics.mean(run_times):.2f}")
@@ -0,0 +1,77 @@
+# retailshop/app/management/commands/bench_load.py
+
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app.benchmark import compare, load_context, run_http, run_in_process, summarize
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives a weighted mix of shop journeys (browse, filter/search, cart, M-Pesa checkout) "
+        "and reports req/s, p50/p95/p99 latency and queries per request. Run seed_benchmark first. "
+        "M-Pesa pushes are only queued: don't run job workers against the benchmark database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="In-process mode: requests to record.")
+        parser.add_argument('--warmup', type=int, default=20, help="In-process mode: journeys run before recording.")
+        parser.add_argument('--http', metavar='BASE_URL', help="Load-test a running server instead, e.g. http://127.0.0.1:8000")
+        parser.add_argument('--processes', type=int, default=4, help="HTTP mode: load generator processes.")
+        parser.add_argument('--duration', type=float, default=30, help="HTTP mode: seconds to run.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed for the traffic mix.")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON to compare with.")
+        parser.add_argument('--save-baseline', action='store_true', help="Write this run as the new baseline.")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed p95 slowdown (0.25 = 25%%).")
+
+    def handle(self, *args, **options):
+        try:
+            _, usernames = load_context(options['seed'])
+        except LookupError as e:
+            raise CommandError(str(e))
+
+        if options['http']:
+            results, elapsed = run_http(options['http'], options['processes'], options['duration'], options['seed'])
+        else:
+            results, elapsed = run_in_process(options['requests'], usernames[0], options['seed'], options['warmup'])
+        summary = summarize(results, elapsed)
+        summary['mode'] = 'http' if options['http'] else 'in-process'
+        self.report(summary)
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(summary, indent=2) + "\n")
+            self.stdout.write(self.style.SUCCESS(f"Baseline saved to {baseline_path}"))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path} (use --save-baseline to create one).")
+            return
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('mode') != summary['mode']:
+            self.stdout.write(f"Baseline is a {baseline.get('mode')} run, not compared.")
+            return
+
+        regressions = compare(summary, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def report(self, summary):
+        total = summary['total']
+        self.stdout.write(
+            f"{total['requests']} requests, {total['rps']} req/s, {total['errors']} errors (4xx/5xx) "
+            f"({summary['mode']})"
+        )
+        self.stdout.write(f"{'step':<20}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}")
+        for name, row in summary['steps'].items():
+            queries = '-' if row['queries'] is None else row['queries']
+            self.stdout.write(
+                f"{name:<20}{row['requests']:>7}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{queries:>9}"
+            )
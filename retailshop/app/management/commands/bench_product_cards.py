@@ -0,0 +1,103 @@
+# retailshop/app/management/commands/bench_product_cards.py
+# Listing rows as full Product instances vs only() vs ProductCard (app/product_cards.py):
+# time per 1,000 rows and memory (kept + peak, tracemalloc) per 1,000 rows and per page.
+#
+# Runs on its own products with long descriptions, created inside a transaction that
+# is rolled back at the end, so it doesn't depend on (or change) the catalogue.
+
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils.text import Truncator
+
+from app.models import Category, Product
+from app.product_cards import product_cards
+from app.views.catalogue import PRODUCT_CARD_DESCRIPTION_CHARS, PRODUCTS_PER_PAGE
+
+
+def as_instances(queryset):
+    """The old path: full instances, plus what the template then did with them."""
+    products = list(queryset)
+    for product in products:
+        if product.image:
+            product.image.url
+        Truncator(product.description).chars(PRODUCT_CARD_DESCRIPTION_CHARS)
+    return products
+
+
+def as_only_instances(queryset):
+    return as_instances(queryset.only('pk', 'name', 'price', 'image', 'description'))
+
+
+def as_cards(queryset):
+    return product_cards(queryset, PRODUCT_CARD_DESCRIPTION_CHARS)
+
+
+PATHS = [
+    ('Product instances', as_instances),
+    ('only() instances', as_only_instances),
+    ('ProductCard rows', as_cards),
+]
+
+
+def measure(build, queryset, rounds):
+    """(median ms, KB still held by the result, peak KB while building)."""
+    # queryset.all() each time: a fresh queryset, not the cached rows of the last run
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        build(queryset.all())
+        timings.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(queryset.all())
+    kept, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return statistics.median(timings), (kept - before) / 1024, (peak - before) / 1024
+
+
+class Command(BaseCommand):
+    help = "Compares the listing row types: ms and memory per 1,000 rows and per products page."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--description-length', type=int, default=2000, help="Characters of description per product.")
+        parser.add_argument('--rounds', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            category = Category.objects.create(name="bench-product-cards", slug="bench-product-cards")
+            text = ("Long product description with specifications and care instructions. " * 100)
+            text = text[:options['description_length']]
+            Product.objects.bulk_create([
+                Product(
+                    category=category, name=f"Card bench product {i}", price=100 + i,
+                    description=text, image=f"products/card-bench-{i}.jpg" if i % 2 else '',
+                )
+                for i in range(rows)
+            ])
+            listing = Product.objects.filter(category=category).order_by('pk')
+
+            self.stdout.write(
+                f"{rows} rows, {options['description_length']}-character descriptions; "
+                f"a products page is {PRODUCTS_PER_PAGE} rows"
+            )
+            self.stdout.write(
+                f"{'path':<20}{'ms/1000 rows':>14}{'KB kept/1000':>14}{'KB peak/1000':>14}"
+                f"{'KB kept/page':>14}{'KB peak/page':>14}"
+            )
+            for name, build in PATHS:
+                ms, kept, peak = measure(build, listing, options['rounds'])
+                _, page_kept, page_peak = measure(build, listing[:PRODUCTS_PER_PAGE], 1)
+                per_thousand = 1000 / rows
+                self.stdout.write(
+                    f"{name:<20}{ms * per_thousand:>14.1f}{kept * per_thousand:>14.0f}{peak * per_thousand:>14.0f}"
+                    f"{page_kept:>14.1f}{page_peak:>14.1f}"
+                )
+            transaction.set_rollback(True)
@@ -0,0 +1,55 @@
+# retailshop/app/management/commands/bench_profiler.py
+
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from app.profiling import URL_NAMES_KEY, profile_key
+
+PROFILER = 'app.profiling.SamplingProfilerMiddleware'
+
+
+class Command(BaseCommand):
+    help = "Measures the per-request overhead of the sampling profiler middleware (off, idle, sampling)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per round.")
+        parser.add_argument('--rounds', type=int, default=7, help="Rounds per mode (interleaved, median reported).")
+        parser.add_argument('--path', default='/api/categories/?limit=1', help="A cheap URL, so overhead shows.")
+
+    def handle(self, *args, **options):
+        without = [m for m in settings.MIDDLEWARE if m != PROFILER]
+        modes = [
+            ("not installed", {'MIDDLEWARE': without}),
+            ("installed, disabled", {'MIDDLEWARE': without + [PROFILER], 'PROFILING_ENABLED': False}),
+            ("enabled, idle (rate 0)", {'MIDDLEWARE': without + [PROFILER], 'PROFILING_ENABLED': True, 'PROFILING_SAMPLE_RATE': 0}),
+            ("enabled, 1 in 100", {'MIDDLEWARE': without + [PROFILER], 'PROFILING_ENABLED': True, 'PROFILING_SAMPLE_RATE': 100}),
+            ("enabled, every request", {'MIDDLEWARE': without + [PROFILER], 'PROFILING_ENABLED': True, 'PROFILING_SAMPLE_RATE': 1}),
+        ]
+        timings = {name: [] for name, _ in modes}
+
+        # Interleave the modes round by round, so drift (caches, CPU clock) hits them all alike.
+        # Round 0 only warms up and isn't recorded.
+        for round_number in range(options['rounds'] + 1):
+            for name, overrides in modes:
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'], **overrides):
+                    client = Client()  # a new Client loads the middleware list again
+                    client.get(options['path'])
+                    start = time.perf_counter()
+                    for _ in range(options['requests']):
+                        client.get(options['path'])
+                    if round_number:
+                        timings[name].append((time.perf_counter() - start) / options['requests'] * 1e6)
+
+        baseline = statistics.median(timings[modes[0][0]])
+        self.stdout.write(f"{'mode':<26}{'us/request':>12}{'overhead':>12}")
+        for name, _ in modes:
+            median = statistics.median(timings[name])
+            self.stdout.write(f"{name:<26}{median:>12.1f}{median - baseline:>+11.1f}us")
+
+        # Don't leave the benchmark's profiles behind
+        cache.delete_many([profile_key(name) for name in cache.get(URL_NAMES_KEY) or ()] + [URL_NAMES_KEY])
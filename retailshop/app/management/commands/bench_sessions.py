@@ -0,0 +1,113 @@
+# retailshop/app/management/commands/bench_sessions.py
+
+import random
+import statistics
+import time
+from datetime import timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures session load/save overhead per request for each session engine, "
+        "with N concurrent sessions already stored (default 10,000)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=10000, help="Number of live sessions to seed.")
+        parser.add_argument('--requests', type=int, default=5000, help="Simulated requests per engine.")
+        parser.add_argument('--write-ratio', type=float, default=0.1, help="Share of requests that modify the session.")
+        parser.add_argument(
+            '--engine', action='append', choices=sorted(settings.SESSION_ENGINES),
+            help="Engine(s) to benchmark (default: all).",
+        )
+
+    def handle(self, *args, **options):
+        engines = options['engine'] or sorted(settings.SESSION_ENGINES)
+        self.stdout.write(
+            f"{options['sessions']} sessions, {options['requests']} requests, "
+            f"{options['write_ratio']:.0%} writes\n"
+        )
+        self.stdout.write(f"{'engine':<16}{'mean (us)':>12}{'p50 (us)':>12}{'p95 (us)':>12}{'p99 (us)':>12}")
+
+        for name in engines:
+            timings = self.bench_engine(settings.SESSION_ENGINES[name], options)
+            timings.sort()
+            pct = lambda p: timings[min(len(timings) - 1, int(len(timings) * p))] * 1e6
+            self.stdout.write(
+                f"{name:<16}{statistics.mean(timings) * 1e6:>12.1f}{pct(0.50):>12.1f}{pct(0.95):>12.1f}{pct(0.99):>12.1f}"
+            )
+
+    def bench_engine(self, engine, options):
+        """Seeds the sessions, then times a load (+ sometimes a save) per simulated request."""
+        SessionStore = import_module(engine).SessionStore
+        keys = self.seed(SessionStore, options['sessions'])
+
+        timings = []
+        try:
+            # Steady state: every session has been read once (fills the cache for cached_db)
+            for key in keys:
+                SessionStore(session_key=key).load()
+
+            for _ in range(options['requests']):
+                key = random.choice(keys)
+                start = time.perf_counter()
+
+                # What SessionMiddleware + AuthenticationMiddleware do on each request
+                session = SessionStore(session_key=key)
+                session.get('_auth_user_id')
+                if random.random() < options['write_ratio']:
+                    session['last_seen'] = time.time()
+                    session.save()
+
+                timings.append(time.perf_counter() - start)
+        finally:
+            self.cleanup(SessionStore, keys)
+        return timings
+
+    def seed(self, SessionStore, count):
+        data = {'_auth_user_id': '1', 'cart_hint': 'x' * 64}
+
+        if self.uses_db(SessionStore):
+            # db and cached_db: bulk insert the rows (the cache starts cold, as after a restart)
+            expire_date = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+            encoded = SessionStore().encode(data)
+            rows = [
+                Session(session_key=get_random_string(32), session_data=encoded, expire_date=expire_date)
+                for _ in range(count)
+            ]
+            Session.objects.bulk_create(rows, batch_size=1000)
+            return [row.session_key for row in rows]
+
+        keys = []
+        for _ in range(count):
+            session = SessionStore()
+            session.update(data)
+            session.save()
+            keys.append(session.session_key)
+        return keys
+
+    def cleanup(self, SessionStore, keys):
+        if not self.uses_db(SessionStore):
+            for key in keys:
+                SessionStore(session_key=key).delete()
+            return
+
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            Session.objects.filter(session_key__in=chunk).delete()
+            # cached_db also keeps a copy of each session in the cache
+            if hasattr(SessionStore, 'cache_key_prefix'):
+                caches[settings.SESSION_CACHE_ALIAS].delete_many(
+                    [SessionStore.cache_key_prefix + key for key in chunk]
+                )
+
+    def uses_db(self, SessionStore):
+        return issubclass(SessionStore, import_module(settings.SESSION_ENGINES['db']).SessionStore)
@@ -0,0 +1,138 @@
+# retailshop/app/management/commands/bench_sse.py
+# How many live order-status streams (app/order_events.py) one ASGI worker holds, and
+# how fast a status change reaches them. Drives the project's ASGI application
+# in-process (no server or sockets): N streams are opened for N Pending orders, left
+# idle, then every order is marked Paid at once and the arrival of each event is timed.
+# The orders and the user are created for the run and deleted afterwards.
+
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from app.models import Order
+from app.order_events import order_status_hub
+
+BENCH_USERNAME = 'bench-sse-user'
+
+
+class Stream:
+    """One open SSE connection: feeds the ASGI app a GET, records the events it sends back."""
+
+    def __init__(self, order_id, path, cookie):
+        self.order_id = order_id
+        self.path = path
+        self.cookie = cookie
+        self.closed = asyncio.Event()
+        self.opened = asyncio.Event()
+        self.paid = asyncio.Event()
+        self.paid_at = None
+        self.request_sent = False
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await self.closed.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(self, message):
+        if message['type'] != 'http.response.body':
+            return
+        body = message.get('body', b'')
+        if b'event: status' in body:
+            self.opened.set()
+            if b'"Paid"' in body:
+                self.paid_at = time.perf_counter()
+                self.paid.set()
+
+    def scope(self):
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': self.path, 'raw_path': self.path.encode(), 'query_string': b'',
+            'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+            'headers': [(b'host', b'localhost'), (b'cookie', self.cookie), (b'accept', b'text/event-stream')],
+        }
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Opens N order-status SSE streams on the ASGI app, then measures idle cost and delivery latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=2000)
+        parser.add_argument('--idle-seconds', type=float, default=5.0, help="How long the streams sit idle before the update.")
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=BENCH_USERNAME)
+        orders = Order.objects.bulk_create(
+            Order(user=user, total_amount=100, status='Pending', payment_method='M-Pesa')
+            for _ in range(options['connections'])
+        )
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        cookie = '; '.join(f"{key}={morsel.value}" for key, morsel in client.cookies.items()).encode()
+        try:
+            asyncio.run(self.run(orders, cookie, options))
+        finally:
+            Order.objects.filter(user=user).delete()
+            user.delete()
+
+    async def run(self, orders, cookie, options):
+        application = get_asgi_application()
+        streams = [Stream(order.pk, reverse('order_status_stream', args=[order.pk]), cookie) for order in orders]
+
+        # 1. Open the streams: the first tenth under tracemalloc (memory per open stream),
+        # the rest untraced (tracemalloc slows everything down) for the opening rate
+        async def open_streams(batch):
+            tasks = [asyncio.create_task(application(stream.scope(), stream.receive, stream.send)) for stream in batch]
+            await asyncio.wait_for(asyncio.gather(*(stream.opened.wait() for stream in batch)), timeout=300)
+            return tasks
+
+        traced, untraced = streams[:max(1, len(streams) // 10)], streams[max(1, len(streams) // 10):]
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        tasks = await open_streams(traced)
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        start = time.perf_counter()
+        tasks += await open_streams(untraced)
+        open_s = time.perf_counter() - start
+        self.stdout.write(
+            f"{len(streams)} streams open ({len(untraced) / open_s:.0f} opened/s), {held / len(traced) / 1024:.1f} KB each, "
+            f"{len(order_status_hub.subscribers)} orders watched by the hub"
+        )
+
+        # 2. Idle: CPU used by the whole process while nothing changes (the poller's one query per interval)
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        await asyncio.sleep(options['idle_seconds'])
+        idle_cpu = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+        self.stdout.write(f"Idle: {idle_cpu * 100:.1f}% of one CPU with {len(streams)} streams open")
+
+        # 3. Every order paid at once (like a burst of callbacks), then wait for every event
+        order_ids = [stream.order_id for stream in streams]
+        updated_at = time.perf_counter()
+        await sync_to_async(Order.objects.filter(pk__in=order_ids).update)(status='Paid', payment_status='Paid')
+        await asyncio.wait_for(asyncio.gather(*(stream.paid.wait() for stream in streams)), timeout=120)
+        latencies = sorted((stream.paid_at - updated_at) * 1000 for stream in streams)
+        self.stdout.write(
+            f"Delivery after the UPDATE: p50 {percentile(latencies, 0.5):.0f} ms, p99 {percentile(latencies, 0.99):.0f} ms, "
+            f"max {latencies[-1]:.0f} ms, mean {statistics.mean(latencies):.0f} ms "
+            f"(poll interval {order_status_hub.interval * 1000:.0f} ms)"
+        )
+
+        # 4. Paid is final: the streams end by themselves
+        for stream in streams:
+            stream.closed.set()
+        await asyncio.gather(*tasks)
+        self.stdout.write(self.style.SUCCESS(f"All streams closed; hub watching {len(order_status_hub.subscribers)} orders."))
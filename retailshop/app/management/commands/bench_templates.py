@@ -0,0 +1,106 @@
+# retailshop/app/management/commands/bench_templates.py
+# Render time of the storefront pages on DTL vs the Jinja2 ports (app/jinja2/), with
+# N product cards per page. Only the template render is timed: the contexts are
+# built once from the database (querysets evaluated), so no queries run while timing.
+
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import Paginator
+from django.template import engines
+from django.template.utils import InvalidTemplateEngineError
+from django.test import RequestFactory
+
+from app.facets import facet_index, facet_options
+from app.category_tree import build_category_tree
+from app.models import Product
+from app.product_cards import product_cards
+from app.views.catalogue import HOME_DESCRIPTION_CHARS, PRODUCT_CARD_DESCRIPTION_CHARS
+
+
+def storefront_engines():
+    """(DTL engine, Jinja2 engine); the Jinja2 one is built from settings if it isn't enabled."""
+    try:
+        jinja = engines['jinja2']
+    except InvalidTemplateEngineError:
+        try:
+            from django.template.backends.jinja2 import Jinja2
+        except ImportError:
+            raise CommandError("The jinja2 package isn't installed.")
+        params = {key: value for key, value in settings.STOREFRONT_JINJA2_ENGINE.items() if key != 'BACKEND'}
+        jinja = Jinja2({**params, 'NAME': 'jinja2'})
+    return engines['django'], jinja
+
+
+def build_contexts(cards):
+    """{template name: context} for the three storefront pages, each with `cards` product cards."""
+    products = list(Product.objects.select_related('category').order_by('pk')[:cards])
+    if not products:
+        raise CommandError("No products in the database.")
+    tree = build_category_tree()
+
+    matching_ids, counts = facet_index.search({})
+    selected = {facet: set() for facet in counts}
+    page = Paginator(products, len(products)).page(1)
+    listing = Product.objects.order_by('pk')[:cards]
+
+    product = products[0]
+    reviews = product.reviews.select_related('user').order_by('-created_at')
+    reviews._fetch_all()  # evaluated: .count() and the loop need no query
+    return {
+        'app/home.html': {'categories': tree.roots, 'random_products': product_cards(listing, HOME_DESCRIPTION_CHARS)},
+        'app/products.html': {
+            'title': "All Products", 'products': product_cards(listing, PRODUCT_CARD_DESCRIPTION_CHARS), 'page': page, 'result_count': len(matching_ids),
+            'categories': tree.nodes, 'facets': facet_options(tree, selected, counts), 'selected_category': None,
+        },
+        'app/product_detail.html': {
+            'product': product, 'reviews': reviews, 'average_rating': 4.2, 'related_products': products,
+        },
+    }
+
+
+def normalize(html):
+    """Engine-neutral HTML: CSRF tokens (random per render), whitespace and escaping style."""
+    html = re.sub(r'name="csrfmiddlewaretoken" value="[^"]+"', 'name="csrfmiddlewaretoken"', html)
+    html = html.replace('&#x27;', '&#39;')
+    return re.sub(r'\s+', ' ', html).replace('> <', '><').strip()
+
+
+class Command(BaseCommand):
+    help = "Compares DTL and Jinja2 render time of home, products and product_detail with N product cards."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=500, help="Product cards per page.")
+        parser.add_argument('--rounds', type=int, default=20, help="Renders per page and engine.")
+
+    def handle(self, *args, **options):
+        dtl, jinja = storefront_engines()
+        contexts = build_contexts(options['cards'])
+
+        request = RequestFactory().get('/products/', HTTP_HOST='localhost')
+        request.user = AnonymousUser()
+
+        self.stdout.write(f"{'page':<28}{'DTL ms':>10}{'Jinja2 ms':>12}{'speed-up':>10}  output")
+        for name, context in contexts.items():
+            templates = {'dtl': dtl.get_template(name), 'jinja2': jinja.get_template(name)}
+
+            # Both engines must produce the same page, or the comparison means nothing
+            outputs = {key: normalize(template.render(context, request)) for key, template in templates.items()}
+            same = "same" if outputs['dtl'] == outputs['jinja2'] else "DIFFERS"
+
+            timings = {key: [] for key in templates}
+            for _ in range(options['rounds']):
+                for key, template in templates.items():  # interleaved, so drift hits both alike
+                    start = time.perf_counter()
+                    template.render(context, request)
+                    timings[key].append((time.perf_counter() - start) * 1000)
+
+            dtl_ms = statistics.median(timings['dtl'])
+            jinja_ms = statistics.median(timings['jinja2'])
+            self.stdout.write(
+                f"{name:<28}{dtl_ms:>10.2f}{jinja_ms:>12.2f}{dtl_ms / jinja_ms:>9.1f}x  {same}"
+            )
@@ -0,0 +1,24 @@
+# retailshop/app/management/commands/build_recommendations.py
+
+import resource
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.recommendations import TOP_K, build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the 'customers also bought' table from orders and carts (run nightly, e.g. from cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K, help=f"Neighbours kept per product (default {TOP_K}).")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        products = build_recommendations(top_k=options['top_k'])
+        elapsed = time.perf_counter() - start
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stdout.write(self.style.SUCCESS(
+            f"Recommendations rebuilt for {products} products in {elapsed:.1f}s (peak RSS {peak_mb:.0f} MB)"
+        ))
@@ -0,0 +1,48 @@
+# retailshop/app/management/commands/clear_expired_sessions.py
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes expired rows from the django_session table in small chunks, "
+        "so the table is never locked by one huge DELETE (unlike `clearsessions`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Sessions deleted per DELETE statement.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between chunks.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        # Only the 'db' and 'cached_db' engines store sessions in the database
+        if settings.SESSION_ENGINE not in (settings.SESSION_ENGINES['db'], settings.SESSION_ENGINES['cached_db']):
+            self.stdout.write(f"SESSION_ENGINE is {settings.SESSION_ENGINE}; there is no session table to clean.")
+            return
+
+        now = timezone.now()
+        total = 0
+        while True:
+            # 1. Pick the next chunk of expired keys (uses the expire_date index)
+            keys = list(
+                Session.objects.filter(expire_date__lt=now)
+                .values_list('session_key', flat=True)[:chunk_size]
+            )
+            if not keys:
+                break
+
+            # 2. Delete just that chunk
+            deleted, _ = Session.objects.filter(session_key__in=keys).delete()
+            total += deleted
+            self.stdout.write(f"Deleted {deleted} expired sessions ({total} so far)")
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done. {total} expired sessions deleted."))
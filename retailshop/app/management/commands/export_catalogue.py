@@ -0,0 +1,34 @@
+# retailshop/app/management/commands/export_catalogue.py
+
+import sys
+
+from django.core.management.base import BaseCommand
+
+from app.catalogue_io import CATALOGUE_COLUMNS, detect_format, write_rows
+from app.models import Product
+
+
+class Command(BaseCommand):
+    help = "Streams every product to a CSV or JSON Lines file (or stdout) in the import_catalogue format."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, '-' for stdout (default).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension (csv for stdout).")
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Rows fetched from the DB per round trip.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = detect_format(path, options['format'])
+
+        # values_list() + iterator(): plain tuples, fetched in chunks, never the whole table
+        lookups = ['sku', 'name', 'category__slug', 'price', 'stock', 'description', 'image']
+        queryset = Product.objects.order_by('pk').values_list(*lookups).iterator(chunk_size=options['chunk_size'])
+        rows = (dict(zip(CATALOGUE_COLUMNS, row)) for row in queryset)
+
+        if path == '-':
+            write_rows(rows, sys.stdout, fmt)
+            return
+
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            write_rows(rows, f, fmt)
+        self.stdout.write(self.style.SUCCESS(f"Catalogue exported to {path}"))
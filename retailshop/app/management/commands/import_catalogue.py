@@ -0,0 +1,171 @@
+# retailshop/app/management/commands/import_catalogue.py
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from app.catalogue_io import ErrorLog, batched, clean_rows, detect_format, read_rows
+from app.category_tree import invalidate_category_tree
+from app.models import (
+    Category, Product, ProductChange, enqueue_product_change_processing, recount_category_products,
+)
+from app.object_cache import product_cache
+
+
+# Fields overwritten when a row's sku already exists
+UPDATE_FIELDS = ['name', 'category', 'price', 'stock', 'description', 'updated_at']
+
+
+class Command(BaseCommand):
+    help = (
+        "Streams products from a CSV or JSON Lines file and upserts them by sku in batches. "
+        "Columns: sku, name, category (slug), price, stock, description, image."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or .jsonl file to import.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--images-dir', help="Directory holding the files named in the 'image' column.")
+        parser.add_argument('--workers', type=int, default=8, help="Threads used to copy images.")
+        parser.add_argument('--create-categories', action='store_true',
+                            help="Create unknown category slugs instead of skipping their rows.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist.")
+
+        # 1. One query for the slug -> id map; rows are then resolved in memory
+        self.category_ids = dict(Category.objects.values_list('slug', 'id'))
+        self.create_categories = options['create_categories']
+
+        errors = ErrorLog()
+        imported = 0
+        start = time.perf_counter()
+
+        with open(path, newline='', encoding='utf-8') as f, \
+                ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            rows = clean_rows(read_rows(f, detect_format(path, options['format'])), errors)
+
+            # 2. Upsert one batch at a time (only one batch is ever held in memory)
+            for batch in batched(rows, options['batch_size']):
+                products, images = self.build_products(batch, errors)
+                if not products:
+                    continue
+
+                skus = [p.sku for p in products]
+                with transaction.atomic():
+                    # The price/stock these rows had (locked until the batch commits)
+                    before = {
+                        sku: {'price': price, 'stock': stock}
+                        for sku, price, stock in Product.objects.select_for_update()
+                        .filter(sku__in=skus).values_list('sku', 'price', 'stock')
+                    }
+                    Product.objects.bulk_create(
+                        products,
+                        update_conflicts=True,
+                        unique_fields=['sku'],
+                        update_fields=UPDATE_FIELDS,
+                    )
+                    # The upsert skips Product.save() and its signals: log the price/stock changes
+                    # and drop the updated rows from the object cache here instead
+                    ids = dict(Product.objects.filter(sku__in=skus).values_list('sku', 'pk'))
+                    self.log_changes(products, before, ids)
+                    product_cache.invalidate_on_commit(ids.values())
+
+                # 3. Copy this batch's images in the background thread pool
+                if images and options['images_dir']:
+                    self.attach_images(images, options['images_dir'], pool, errors)
+
+                imported += len(products)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{imported} products imported ({imported / elapsed:,.0f}/s)")
+
+        # 4. bulk_create skips Product.save(), so the category counts are redone in one UPDATE
+        if imported:
+            recount_category_products()
+            invalidate_category_tree()
+
+        for number, message in errors.messages:
+            self.stderr.write(f"Row {number}: {message}")
+        if errors.count > len(errors.messages):
+            self.stderr.write(f"... and {errors.count - len(errors.messages)} more errors")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {imported} products imported, {errors.count} problems (skipped rows / missing images), "
+            f"{time.perf_counter() - start:.1f}s."
+        ))
+
+    def build_products(self, batch, errors):
+        # Keyed by sku: a sku appearing twice in one INSERT ... ON CONFLICT is an error, the last row wins
+        products, images = {}, {}
+        for row in batch:
+            category_id = self.resolve_category(row['category'])
+            if category_id is None:
+                errors.append((row['sku'], f"unknown category '{row['category']}'"))
+                continue
+
+            products[row['sku']] = Product(
+                sku=row['sku'], name=row['name'], category_id=category_id,
+                price=row['price'], stock=row['stock'], description=row['description'],
+            )
+            if row['image']:
+                images[row['sku']] = row['image']
+        return list(products.values()), images
+
+    def log_changes(self, products, before, ids):
+        """The ProductChange rows Product.save() would have written, and the job that consumes them."""
+        changes = []
+        for product in products:
+            old = before.get(product.sku)  # None: a new product
+            for name in Product.TRACKED_FIELDS:
+                if old is None or old[name] != getattr(product, name):
+                    changes.append(ProductChange(
+                        product_id=ids[product.sku],
+                        field=name,
+                        old_value=old[name] if old else None,
+                        new_value=getattr(product, name),
+                    ))
+        if changes:
+            ProductChange.objects.bulk_create(changes)
+            transaction.on_commit(enqueue_product_change_processing)
+
+    def resolve_category(self, slug):
+        category_id = self.category_ids.get(slug)
+        if category_id is None and self.create_categories:
+            category, _ = Category.objects.get_or_create(
+                slug=slug, defaults={'name': slug.replace('-', ' ').title()}
+            )
+            category_id = self.category_ids[slug] = category.id
+        return category_id
+
+    def attach_images(self, images, images_dir, pool, errors):
+        """Copies image files into MEDIA_ROOT/products/ in parallel, then sets them with one bulk_update."""
+        def copy(item):
+            sku, filename = item
+            source = os.path.join(images_dir, os.path.basename(filename))
+            if not os.path.exists(source):
+                return sku, None
+            with open(source, 'rb') as f:
+                return sku, default_storage.save(f"products/{slugify(sku)}-{os.path.basename(filename)}", File(f))
+
+        saved = {}
+        for sku, name in pool.map(copy, images.items()):
+            if name is None:
+                errors.append((sku, f"image '{images[sku]}' not found in {images_dir}"))
+            else:
+                saved[sku] = name
+
+        if saved:
+            products = list(Product.objects.filter(sku__in=saved).only('id', 'sku'))
+            for product in products:
+                product.image = saved[product.sku]
+            Product.objects.bulk_update(products, ['image'])
+            product_cache.invalidate(product.pk for product in products)
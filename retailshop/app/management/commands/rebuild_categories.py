@@ -0,0 +1,21 @@
+# retailshop/app/management/commands/rebuild_categories.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.category_tree import invalidate_category_tree
+from app.models import rebuild_category_closure, recount_category_products
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the category closure table from the parent links and recounts the products "
+        "per category (after raw SQL or bulk changes that skipped Category/Product.save())."
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            links = rebuild_category_closure()
+            categories = recount_category_products()
+        invalidate_category_tree()
+        self.stdout.write(self.style.SUCCESS(f"{links} closure rows written, {categories} categories recounted."))
@@ -0,0 +1,68 @@
+# retailshop/app/management/commands/run_workers.py
+
+import multiprocessing
+import signal
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+def worker_process(threads, poll_interval, once):
+    """Entry point of each worker process."""
+    import django
+    django.setup()  # no-op when forked, needed when the 'spawn' start method is used
+
+    from app import tasks  # noqa: F401 (registers the task handlers)
+    from app.jobs import Worker
+
+    worker = Worker(threads=threads, poll_interval=poll_interval)
+    # Finish the jobs in hand, then exit, on Ctrl+C / SIGTERM
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    signal.signal(signal.SIGINT, lambda *args: worker.stop())
+    worker.run(once=once)
+
+
+class Command(BaseCommand):
+    help = "Runs background jobs from the Job table with a pool of processes x threads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes (default 1).")
+        parser.add_argument('--threads', type=int, default=4, help="Threads per process (default 4).")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds between polls when idle.")
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty (cron / tests).")
+
+    def handle(self, *args, **options):
+        # Jobs change orders and prices, then expire what the web processes cached about
+        # them (My Orders, cart totals) through the cache: it has to be one they share
+        if isinstance(caches['default'], LocMemCache):
+            raise CommandError(
+                "run_workers needs a cache shared with the web processes: set REDIS_URL "
+                "(or CACHE_DIR, on a single machine). With the per-process memory cache, "
+                "what the jobs change would never expire the pages the web processes cached."
+            )
+
+        args = (options['threads'], options['poll_interval'], options['once'])
+        self.stdout.write(
+            f"Starting {options['processes']} worker process(es) x {options['threads']} thread(s)"
+        )
+
+        if options['processes'] == 1:
+            worker_process(*args)
+            return
+
+        # Children must not share the parent's DB connection
+        connections.close_all()
+        processes = [multiprocessing.Process(target=worker_process, args=args) for _ in range(options['processes'])]
+        for process in processes:
+            process.start()
+
+        def stop_all(*_):
+            for process in processes:
+                process.terminate()  # SIGTERM: each child finishes its current jobs
+        signal.signal(signal.SIGTERM, stop_all)
+        signal.signal(signal.SIGINT, stop_all)
+
+        for process in processes:
+            process.join()
@@ -0,0 +1,35 @@
+# retailshop/app/management/commands/seed_benchmark.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.benchmark import clear_seed, seed
+
+
+class Command(BaseCommand):
+    help = "Bulk-inserts a synthetic shop for `manage.py bench_load` (everything is named 'bench-...')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--reviews', type=int, default=5000)
+        parser.add_argument('--carts', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (same seed, same data).")
+        parser.add_argument('--clear', action='store_true', help="Only delete previously seeded data.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        clear_seed()
+        if options['clear']:
+            self.stdout.write(self.style.SUCCESS("Benchmark data deleted."))
+            return
+
+        counts = seed(
+            categories=options['categories'], products=options['products'], users=options['users'],
+            reviews=options['reviews'], carts=options['carts'], orders=options['orders'], random_seed=options['seed'],
+        )
+        summary = ", ".join(f"{count} {table}" for table, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary} in {time.perf_counter() - start:.1f}s"))
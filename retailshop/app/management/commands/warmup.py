@@ -0,0 +1,34 @@
+# retailshop/app/management/commands/warmup.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.warmup import STEPS, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Primes a new deploy before it takes traffic: compiles templates, populates the URL "
+        "resolvers, opens DB connections and runs the hot pages once, with per-step timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--step', action='append', choices=[name for name, _ in STEPS],
+            help="Only run this step (repeatable). Default: all of them.",
+        )
+        parser.add_argument('--strict', action='store_true', help="Exit with an error if any step reported errors.")
+
+    def handle(self, *args, **options):
+        report = warm_up(options['step'])
+
+        total = 0
+        for name, ms, summary, errors in report:
+            total += ms
+            self.stdout.write(f"{name:<12}{ms:>9.1f} ms  {summary}")
+            for error in errors:
+                self.stdout.write(self.style.WARNING(f"{'':<12}  ! {error}"))
+        self.stdout.write(f"{'total':<12}{total:>9.1f} ms")
+
+        error_count = sum(len(errors) for *_, errors in report)
+        if error_count and options['strict']:
+            raise CommandError(f"Warm-up finished with {error_count} error(s).")
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 04:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(max_length=20)),
+                ('old_value', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('new_value', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='app.product')),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0 on 2026-10-19 05:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_closure_and_counts(apps, schema_editor):
+    """Existing categories are all roots: one (self, self, 0) row each, plus their product counts."""
+    Category = apps.get_model('app', 'Category')
+    CategoryClosure = apps.get_model('app', 'CategoryClosure')
+    Product = apps.get_model('app', 'Product')
+
+    CategoryClosure.objects.bulk_create(
+        (CategoryClosure(ancestor_id=pk, descendant_id=pk, depth=0) for pk in Category.objects.values_list('pk', flat=True)),
+        batch_size=2000,
+    )
+    counts = (
+        Product.objects.filter(category_id=OuterRef('pk'))
+        .order_by().values('category_id').annotate(n=Count('pk')).values('n')
+    )
+    Category.objects.update(product_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_order_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='app.category'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveSmallIntegerField()),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='app.category')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='app.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='category_closure_desc_idx')],
+                'constraints': [models.UniqueConstraint(fields=('ancestor', 'descendant'), name='category_closure_pair_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_closure_and_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-19 06:20
+
+import uuid
+
+import app.models
+from django.db import migrations, models
+from django.db.models import Q
+
+BATCH_SIZE = 2000
+
+
+def backfill_skus(apps, schema_editor):
+    """Gives every product without a sku a generated one (same format as app.models.new_sku)."""
+    Product = apps.get_model('app', 'Product')
+    while ids := list(Product.objects.filter(Q(sku__isnull=True) | Q(sku='')).values_list('pk', flat=True)[:BATCH_SIZE]):
+        products = [Product(pk=pk, sku=f"SKU-{uuid.uuid4().hex[:12].upper()}") for pk in ids]
+        Product.objects.bulk_update(products, ['sku'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_order_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, default=app.models.new_sku, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(backfill_skus, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-10-19 06:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_heartbeats(apps, schema_editor):
+    """Jobs running during the upgrade: their last sign of life is when they started."""
+    Job = apps.get_model('app', 'Job')
+    Job.objects.filter(heartbeat_at__isnull=True, started_at__isnull=False).update(heartbeat_at=F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_backfill_product_sku'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-19 09:10
+
+from django.db import migrations, models
+
+
+def flag_archived_orders(apps, schema_editor):
+    """Users whose orders were archived before the flag existed."""
+    Profile = apps.get_model('app', 'Profile')
+    ArchivedOrder = apps.get_model('app', 'ArchivedOrder')
+    user_ids = set(ArchivedOrder.objects.filter(user__isnull=False).values_list('user_id', flat=True).distinct())
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id, has_archived_orders=True) for user_id in user_ids],
+        update_conflicts=True, unique_fields=['user'], update_fields=['has_archived_orders'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='has_archived_orders',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(flag_archived_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 11:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_at_creation(apps, schema_editor):
+    """Existing reviews were last changed, as far as anyone knows, when they were written."""
+    Review = apps.get_model('app', 'Review')
+    Review.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_profile_has_archived_orders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(start_at_creation, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,23 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver
 from django.urls import reverse
 # F is imported here, but not used in models.py itself (it's for views)
 # It's better practice to import it in views.py, but keeping it here is harmless.
 from django.db.models import F 
+from django.db.models import Count, OuterRef, Subquery, Sum, DecimalField
+from django.db.models.functions import Coalesce, Greatest, Upper
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.cache import cache
 from django.utils import timezone
 
+# Per-row caches of Product/Category by pk (their save/delete signals are in there too)
+from .object_cache import category_cache, product_cache
+
 
 # --- CORE E-COMMERCE MODELS ---
 
@@ -21,6 +31,20 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     slug = models.SlugField(max_length=100, unique=True)
     description = models.TextField(blank=True) 
+
+    # Nesting (e.g. Fashion > Shoes > Sneakers). Every ancestor/descendant pair is also
+    # in CategoryClosure, kept in step by save(), so a whole subtree is one indexed join.
+    parent = models.ForeignKey(
+        'self',
+        related_name='children',
+        null=True,
+        blank=True,
+        # Move or delete the subcategories first
+        on_delete=models.PROTECT,
+    )
+    # Products directly in this category (not its subcategories); kept up to date by
+    # Product.save() and the product delete signal, see recount_category_products()
+    product_count = models.PositiveIntegerField(default=0, editable=False)
     
     #  Banner Image for the Home Page
     banner_image = models.ImageField(
@@ -29,6 +53,9 @@ class Category(models.Model):
         blank=True,
         help_text="Optional banner image for the homepage category section."
     )
+
+    # Drives the catalogue ETag/Last-Modified headers (see app/http_cache.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         verbose_name_plural = 'Categories'
@@ -38,7 +65,130 @@ class Category(models.Model):
 
     def get_absolute_url(self):
         pass 
-    
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_parent_id = instance.__dict__.get('parent_id')
+        return instance
+
+    def clean(self):
+        super().clean()
+        if self.parent_id is not None and self.pk is not None and self.parent_id in self.subtree_ids():
+            raise ValidationError({'parent': "A category can't be moved under itself or one of its subcategories."})
+
+    def subtree_ids(self):
+        """Ids of this category and everything under it (one query on the closure table)."""
+        return set(CategoryClosure.objects.filter(ancestor_id=self.pk).values_list('descendant_id', flat=True))
+
+    def save(self, *args, **kwargs):
+        """Saves the category and, in the SAME transaction, updates its closure rows."""
+        is_new = self._state.adding
+        moved = not is_new and self.parent_id != getattr(self, '_loaded_parent_id', self.parent_id)
+
+        with transaction.atomic():
+            if moved and self.parent_id is not None and self.parent_id in self.subtree_ids():
+                raise ValidationError("A category can't be moved under itself or one of its subcategories.")
+            super().save(*args, **kwargs)
+            if is_new:
+                CategoryClosure.link(self.pk, self.parent_id)
+            elif moved:
+                CategoryClosure.move(self.pk, self.parent_id)
+
+        self._loaded_parent_id = self.parent_id
+
+
+class CategoryClosure(models.Model):
+    """
+    Closure table of the category tree: one row per (ancestor, descendant) pair,
+    including each category with itself at depth 0. "Products under Fashion" is
+    then `category_id IN (SELECT descendant_id ... WHERE ancestor_id = <Fashion>)`,
+    whatever the depth, instead of one query per level.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links')
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links')
+    depth = models.PositiveSmallIntegerField()  # 0 = itself, 1 = child, 2 = grandchild...
+
+    class Meta:
+        constraints = [
+            # Also the index of the subtree lookup (ancestor_id = X -> descendant_ids)
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='category_closure_pair_uniq'),
+        ]
+        indexes = [
+            # The ancestors lookup (breadcrumbs, moves)
+            models.Index(fields=['descendant', 'depth'], name='category_closure_desc_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.ancestor_id} > #{self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def link(cls, category_id, parent_id):
+        """Rows for a new (childless) category: itself, plus each ancestor of its parent."""
+        rows = [cls(ancestor_id=category_id, descendant_id=category_id, depth=0)]
+        if parent_id is not None:
+            rows += [
+                cls(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth + 1)
+                for ancestor_id, depth in cls.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+            ]
+        cls.objects.bulk_create(rows)
+
+    @classmethod
+    def move(cls, category_id, parent_id):
+        """Re-links the subtree of category_id under parent_id (None = make it a root)."""
+        subtree = list(cls.objects.filter(ancestor_id=category_id).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+
+        # 1. Cut the subtree loose from its old ancestors (links inside it stay)
+        cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+
+        # 2. Every new ancestor x every subtree member
+        if parent_id is not None:
+            ancestors = cls.objects.filter(descendant_id=parent_id).values_list('ancestor_id', 'depth')
+            cls.objects.bulk_create([
+                cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + depth + 1)
+                for ancestor_id, ancestor_depth in ancestors
+                for descendant_id, depth in subtree
+            ])
+
+
+def rebuild_category_closure():
+    """
+    Rewrites the whole closure table from the parent pointers. For categories created
+    without save() (bulk_create) or a repair; returns the number of rows written.
+    """
+    parents = dict(Category.objects.values_list('pk', 'parent_id'))
+    rows = []
+    for category_id in parents:
+        ancestor_id, depth = category_id, 0
+        while ancestor_id is not None and depth <= len(parents):  # the bound stops a corrupt cycle
+            rows.append(CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth))
+            ancestor_id, depth = parents[ancestor_id], depth + 1
+    with transaction.atomic():
+        CategoryClosure.objects.all().delete()
+        CategoryClosure.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def recount_category_products(category_ids=None):
+    """
+    Recomputes Category.product_count with one UPDATE (for bulk imports, which skip
+    Product.save() and the signals). category_ids=None recounts every category.
+    """
+    counts = (
+        Product.objects.filter(category_id=OuterRef('pk'))
+        .order_by().values('category_id').annotate(n=Count('pk')).values('n')
+    )
+    categories = Category.objects.all() if category_ids is None else Category.objects.filter(pk__in=category_ids)
+    # An UPDATE skips the signals: drop the cached rows (few categories, so all of them)
+    category_cache.invalidate_on_commit(categories.values_list('pk', flat=True))
+    return categories.update(product_count=Coalesce(Subquery(counts), 0))
+
+
+def new_sku():
+    """A random sku for products created without one (so every product can be exported and re-imported)."""
+    return f"SKU-{uuid.uuid4().hex[:12].upper()}"
+
 # 2. Product Model
 class Product(models.Model):
     category = models.ForeignKey(
@@ -48,15 +198,112 @@ class Product(models.Model):
     )
     
     name = models.CharField(max_length=200)
+    # Stock-keeping unit: stable external key used by import_catalogue/export_catalogue.
+    # Left empty, it is generated (new_sku), so every product has one
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True, default=new_sku)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True) 
 
     image = models.ImageField(upload_to='products/', null=True, blank=True)
     stock = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Serves case-insensitive prefix search (name__istartswith) in the admin
+            models.Index(Upper('name'), name='product_name_upper_idx'),
+        ]
     
+    # Changes to these fields are written to the ProductChange outbox (see save())
+    TRACKED_FIELDS = ('price', 'stock')
+
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded, so save() can tell what actually changed
+        instance._loaded_values = {
+            name: getattr(instance, name) for name in cls.TRACKED_FIELDS if name in instance.__dict__
+        }
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        """Saves the product and, in the SAME transaction, logs any price/stock change."""
+        loaded = getattr(self, '_loaded_values', {})
+        is_new = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        tracked = [f for f in self.TRACKED_FIELDS if update_fields is None or f in update_fields]
+        if not self.sku and (update_fields is None or 'sku' in update_fields):
+            # Cleared in the admin form: a new one, or the row couldn't be exported/re-imported
+            self.sku = new_sku()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            changes = [
+                ProductChange(
+                    product_id=self.pk,
+                    field=name,
+                    old_value=None if is_new else loaded.get(name),
+                    new_value=getattr(self, name),
+                )
+                for name in tracked
+                # Skip fields we never loaded (deferred) or that didn't change
+                if is_new or (name in loaded and loaded[name] != getattr(self, name))
+            ]
+            if changes:
+                ProductChange.objects.bulk_create(changes)
+                transaction.on_commit(enqueue_product_change_processing)
+
+            # Category.product_count: +1 for a new product, or -1/+1 when it moves category
+            old_category_id = None if is_new else getattr(self, '_loaded_category_id', self.category_id)
+            if old_category_id != self.category_id:
+                if old_category_id is not None:
+                    Category.objects.filter(pk=old_category_id).update(product_count=Greatest(F('product_count') - 1, 0))
+                Category.objects.filter(pk=self.category_id).update(product_count=F('product_count') + 1)
+                transaction.on_commit(invalidate_category_tree)
+                category_cache.invalidate_on_commit([old_category_id, self.category_id])
+
+        self._loaded_values = {name: getattr(self, name) for name in self.TRACKED_FIELDS}
+        self._loaded_category_id = self.category_id
+
+
+class ProductChange(models.Model):
+    """
+    Append-only outbox of product price/stock changes, written in the same transaction
+    as the Product save. Consumed by app.product_changes (cache invalidation) and
+    published at /api/product-changes/ for downstream systems.
+    """
+    product = models.ForeignKey('Product', on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    field = models.CharField(max_length=20)
+    old_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    new_value = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    changed_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.field} of product #{self.product_id}: {self.old_value} -> {self.new_value}"
+
+
+def invalidate_category_tree():
+    from .category_tree import invalidate_category_tree
+    invalidate_category_tree()
+
+
+def bump_sales_month_version(created_at):
+    from .analytics import bump_sales_month_version
+    bump_sales_month_version(created_at)
+
+
+def enqueue_product_change_processing():
+    """Queues the consumer, unless a run is already waiting (it handles every pending change)."""
+    from .jobs import enqueue
+    if not Job.objects.filter(name='catalogue.process_product_changes', status=Job.QUEUED).exists():
+        enqueue('catalogue.process_product_changes')
+
 # 3. Review Model
 class Review(models.Model):
     product = models.ForeignKey(
@@ -74,6 +321,8 @@ class Review(models.Model):
     
     text = models.TextField(max_length=500, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Edits move it: the facet index (app/facets.py) and the product page ETag look for them with it
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         verbose_name = 'Review'
@@ -91,6 +340,9 @@ class Profile(models.Model):
     image = models.ImageField(default='default.jpg', upload_to='profile_pics')
     phone_number = models.CharField(max_length=15, blank=True, null=True) 
     address = models.TextField(max_length=255, blank=True, null=True)
+    # Set by app/order_archive.py when one of the user's orders is archived; lets "My Orders"
+    # show the link to the older orders without querying the archive on every page
+    has_archived_orders = models.BooleanField(default=False)
     def __str__(self):
         return f"{self.user.username} Profile"
 
@@ -101,6 +353,30 @@ class Cart(models.Model):
 
     def __str__(self):
         return f"Cart for {self.user.username}"
+
+    def get_summary(self):
+        """Returns {'item_count', 'total'} for this cart in a single aggregate query."""
+        summary = self.items.aggregate(
+            item_count=Sum('quantity'),
+            total=Sum(F('quantity') * F('product__price'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+        return {
+            'item_count': summary['item_count'] or 0,
+            'total': summary['total'] or 0,
+        }
+
+    def get_total_price(self):
+        return self.get_summary()['total']
+
+    def items_with_products(self):
+        """The cart's items with their products, which come from the object cache (one get_many)."""
+        items = list(self.items.all())
+        products = product_cache.get_many(item.product_id for item in items)
+        # A product deleted since the query took its cart items with it (CASCADE)
+        items = [item for item in items if item.product_id in products]
+        for item in items:
+            item.product = products[item.product_id]
+        return items
     
 class CartItem(models.Model):
     cart = models.ForeignKey('Cart', on_delete=models.CASCADE, related_name='items') 
@@ -118,36 +394,247 @@ class CartItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
 
-# --- SIGNALS ---
+# --- PROFILE HELPERS ---
 
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    """Creates a Profile object automatically when a User object is created."""
-    if created:
-        Profile.objects.create(user=instance)
+# NOTE: There are deliberately no post_save signals on User here. Django saves the
+# User on every login (to bump last_login), so a signal that re-saved the Profile
+# cost an extra SELECT + UPDATE on every single login. Profiles are now created
+# on registration, and lazily for any older/admin-created user that lacks one.
 
-@receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    """Saves the Profile object whenever the User object is saved."""
+def get_user_profile(user):
+    """Returns the Profile for a user, creating it on first access if it's missing."""
     try:
-        instance.profile.save()
+        return user.profile
     except Profile.DoesNotExist:
-        # If the profile doesn't exist for some reason, create it
-        Profile.objects.create(user=instance)
-        
+        profile, _ = Profile.objects.get_or_create(user=user)
+        # Cache it on the user so later accesses in this request don't hit the DB
+        user.profile = profile
+        return profile
+
+
+# --- CART SUMMARY CACHE ---
+
+# Short TTL: the summary is also invalidated explicitly whenever a CartItem changes
+CART_SUMMARY_CACHE_TIMEOUT = 60
+EMPTY_CART_SUMMARY = {'item_count': 0, 'total': 0}
+
+def cart_summary_cache_key(cart_id):
+    return f"cart-summary:{cart_id}"
+
+def get_cart_summary(user):
+    """
+    Returns the cart item count and total for the navbar/cart pages.
+    The Cart itself comes with request.user (see ProfileModelBackend), and the
+    totals are served from the cache, so most requests run no cart queries at all.
+    """
+    try:
+        cart = user.cart
+    except Cart.DoesNotExist:
+        return EMPTY_CART_SUMMARY
+
+    key = cart_summary_cache_key(cart.pk)
+    summary = cache.get(key)
+    if summary is None:
+        summary = cart.get_summary()
+        cache.set(key, summary, CART_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+# --- ORDER HISTORY CACHE ---
+
+# Each user's cached "My Orders" pages share a version number; bumping it orphans them all
+ORDER_HISTORY_CACHE_TIMEOUT = 60 * 15
+
+def order_history_version(user_id):
+    return cache.get_or_set(f"order-history-version:{user_id}", 1, None)
+
+def bump_order_history_version(user_id):
+    key = f"order-history-version:{user_id}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Not cached yet (or evicted): any new value works, old pages used a different one
+        cache.set(key, int(timezone.now().timestamp()), None)
+
+
+# --- SIGNALS ---
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_summary(sender, instance, **kwargs):
+    """Drops the cached cart summary whenever an item is added, changed or removed."""
+    cache.delete(cart_summary_cache_key(instance.cart_id))
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree_on_change(sender, instance, **kwargs):
+    """The cached category tree (app/category_tree.py) is rebuilt on its next use."""
+    transaction.on_commit(invalidate_category_tree)
+
+@receiver(post_delete, sender=Product)
+def touch_category_on_product_delete(sender, instance, **kwargs):
+    """
+    A deleted product leaves no updated_at behind, so bump its category's instead.
+    That moves the catalogue version forward and expires cached catalogue pages.
+    The same UPDATE takes the product off the category's product_count (never below 0,
+    should bulk-created products have left it behind).
+    """
+    Category.objects.filter(pk=instance.category_id).update(
+        updated_at=timezone.now(), product_count=Greatest(F('product_count') - 1, 0)
+    )
+    transaction.on_commit(invalidate_category_tree)
+    category_cache.invalidate_on_commit([instance.category_id])
         
 # --- ORDER MODELS ---
 
-class Order(models.Model):
+class OrderFields(models.Model):
+    """The columns an order keeps for good: shared by Order and ArchivedOrder."""
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     # Total amount, status, etc.
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=50, default='Pending') 
     created_at = models.DateTimeField(default=timezone.now)
-    # ... add other fields like shipping address, payment method
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    # Payment & fulfillment (filled in by process_order)
+    payment_method = models.CharField(max_length=30, blank=True)
+    payment_status = models.CharField(max_length=30, blank=True)
+    fulfillment_method = models.CharField(max_length=30, blank=True)
+
+    # Shipping details (left empty for Pickup orders)
+    first_name = models.CharField(max_length=100, blank=True)
+    phone_number = models.CharField(max_length=15, blank=True)
+    address_line_1 = models.CharField(max_length=255, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"Order #{self.pk}"
+
+class Order(OrderFields):
+    # Set when the STK push is accepted; the M-Pesa callback is matched back to the order with it
+    checkout_request_id = models.CharField(max_length=100, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # "My Orders" lists a user's orders newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # Sales reports read date ranges (app/analytics.py)
+            models.Index(fields=['created_at'], name='order_created_idx'),
+        ]
+
+class OrderItemFields(models.Model):
     product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True)
     quantity = models.PositiveIntegerField(default=1)
-    price = models.DecimalField(max_digits=10, decimal_places=2)
\ No newline at end of file
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        abstract = True
+
+    def subtotal(self):
+        return self.quantity * self.price
+
+class OrderItem(OrderItemFields):
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+
+
+# --- ORDER ARCHIVE ---
+# Finished (and cash on delivery) orders older than ORDER_ARCHIVE_AFTER_DAYS are moved here by app/order_archive.py,
+# with the same ids, so Order/OrderItem only hold the recent and the still open ones.
+# Reports, the CSV export and the customer's order pages read both.
+
+class ArchivedOrder(OrderFields):
+    id = models.BigIntegerField(primary_key=True)  # the Order's id, kept
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='archived_order_user_idx'),
+            models.Index(fields=['created_at'], name='archived_order_created_idx'),
+        ]
+
+class ArchivedOrderItem(OrderItemFields):
+    id = models.BigIntegerField(primary_key=True)  # the OrderItem's id, kept
+    order = models.ForeignKey(ArchivedOrder, related_name='items', on_delete=models.CASCADE)
+
+
+# --- RECOMMENDATIONS ---
+
+class ProductRecommendation(models.Model):
+    """
+    Top-K "customers also bought" neighbours of a product, ranked 1..K.
+    Rewritten in full by `manage.py build_recommendations` (see app/recommendations.py).
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='recommendation_product_rank_uniq'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for product #{self.product_id}: #{self.recommended_id} ({self.score:.3f})"
+
+
+# --- BACKGROUND JOBS ---
+
+class Job(models.Model):
+    """
+    One unit of background work (see app/jobs.py), run by `manage.py run_workers`.
+    The table itself is the queue: workers claim QUEUED rows whose run_at has passed.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)  # registered task name, e.g. 'payments.stk_push'
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    # Enqueueing twice with the same key returns the existing job instead of adding another
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # pushed back on each retry
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the job runs; a RUNNING job whose heartbeat stopped
+    # belonged to a worker that died, and is handed out again (app.jobs.requeue_stale_jobs)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # The claim query: status='queued' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# --- ORDER SIGNALS ---
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_history(sender, instance, **kwargs):
+    """New orders and status changes expire the user's cached order history (after commit, so no stale refill)."""
+    if instance.user_id:
+        transaction.on_commit(lambda: bump_order_history_version(instance.user_id))
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_sales_month(sender, instance, **kwargs):
+    """Late payments and status changes in a past month expire its cached sales figures (app/analytics.py)."""
+    transaction.on_commit(lambda: bump_sales_month_version(instance.created_at))
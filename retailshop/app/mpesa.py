@@ -0,0 +1,30 @@
+# retailshop/app/mpesa.py
+# Authenticating M-Pesa STK callbacks.
+#
+# The callback view is public (Safaricom can't log in or send a CSRF token), so anyone
+# could POST a made-up result for a CheckoutRequestID and get an order marked Paid or
+# Failed before the real callback arrives. Each STK push therefore gives Safaricom its
+# own callback URL, ending in ?ref=<order id, signed with SECRET_KEY>. Only Safaricom
+# (and this server) ever sees that URL; a callback without a valid ref is refused, and
+# the job then checks the ref's order is the one paid for.
+
+from django.conf import settings
+from django.core import signing
+from django.utils.http import urlencode
+
+CALLBACK_SALT = 'app.mpesa.callback'
+
+
+def callback_url(order_id):
+    """settings.MPESA_CALLBACK_URL with this order's signed ref."""
+    ref = signing.Signer(salt=CALLBACK_SALT).sign(str(order_id))
+    separator = '&' if '?' in settings.MPESA_CALLBACK_URL else '?'
+    return f"{settings.MPESA_CALLBACK_URL}{separator}{urlencode({'ref': ref})}"
+
+
+def callback_order_id(ref):
+    """The order id a callback URL was issued for, or None if the ref is missing or forged."""
+    try:
+        return int(signing.Signer(salt=CALLBACK_SALT).unsign(ref or ''))
+    except (signing.BadSignature, ValueError):
+        return None
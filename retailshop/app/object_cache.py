@@ -0,0 +1,231 @@
+# retailshop/app/object_cache.py
+# Read-through cache of single Product and Category rows by primary key, for the views
+# that load "this one product" (product_detail, add_to_cart, initiate_mpesa,
+# cash_checkout_view) and the cart pages, which load a handful of them by id.
+#
+#   product = product_cache.get_or_404(pk)        # one cache read, no query on a hit
+#   products = product_cache.get_many(pks)        # {pk: Product}, ONE cache read + ONE query for the misses
+#
+# How it stays correct:
+#   - Saves and deletes (signals below, after commit) replace the entry with a short-lived
+#     TOMBSTONE. Fills use cache.add(), which won't overwrite it, so a request that read the
+#     row just BEFORE the change can't put the old version back. After INVALIDATION_GRACE
+#     seconds the key is free again and the next miss fills it with the new row.
+#   - UPDATEs that skip save() (product counts, bulk imports) call invalidate() themselves.
+#   - Entries also expire after settings.OBJECT_CACHE_TIMEOUT: a safety net with Redis,
+#     and how long other processes can serve an old row with the per-process LocMem cache
+#     (the product page builds its ETag from the copy it shows: cached_product() below).
+#
+# Stampedes: concurrent misses for the same pk in one process are coalesced, one thread
+# queries and the others wait for its result. Across processes a cold key costs at most
+# one query per process.
+#
+# Hit rate: each process counts hits/misses and adds them to shared counters in the
+# cache every STATS_FLUSH_INTERVAL seconds; staff read them at /dashboard/object-cache/
+# (views/analytics.object_cache_stats).
+
+import copy
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+from django.utils.functional import cached_property
+
+MISSING_TIMEOUT = 30        # "no such row" is remembered briefly (bots probing ids)
+INVALIDATION_GRACE = 5      # seconds a changed row can't be re-cached (see TOMBSTONE)
+COALESCE_WAIT = 2           # seconds a waiting thread gives the one querying before querying itself
+STATS_FLUSH_INTERVAL = 10   # seconds between adds to the shared hit/miss counters
+STATS_COUNTERS = ('hits', 'misses', 'coalesced')
+
+# Markers stored instead of a row (plain strings: they pickle to a few bytes)
+MISSING = 'object-cache:missing'
+TOMBSTONE = 'object-cache:tombstone'
+
+
+class Flight:
+    """One in-progress load of a pk; threads that miss the same pk wait on it."""
+    __slots__ = ('done', 'result')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class ObjectCache:
+    def __init__(self, model_label, timeout=None):
+        self.model_label = model_label
+        self.prefix = f"obj:{model_label.lower()}"
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.flights = {}  # pk -> Flight
+        self.counts = dict.fromkeys(STATS_COUNTERS, 0)
+        self.flushed_at = time.monotonic()
+
+    @cached_property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def key(self, pk):
+        return f"{self.prefix}:{pk}"
+
+    # --- READING ---
+
+    def get(self, pk):
+        """The row with this pk (None if there is none)."""
+        return self.get_many([pk]).get(int(pk))
+
+    def get_or_404(self, pk):
+        obj = self.get(pk)
+        if obj is None:
+            raise Http404(f"No {self.model._meta.object_name} matches the given query.")
+        return obj
+
+    def get_many(self, pks):
+        """{pk: row} for the pks that exist: one cache read for all, one query for all the misses."""
+        pks = list(dict.fromkeys(int(pk) for pk in pks))
+        if not pks:
+            return {}
+
+        # 1. Cache first
+        cached = cache.get_many([self.key(pk) for pk in pks])
+        found, missing = {}, []
+        for pk in pks:
+            value = cached.get(self.key(pk))
+            if value is None or value == TOMBSTONE:
+                missing.append(pk)
+            elif value != MISSING:
+                found[pk] = value
+        self.count(hits=len(pks) - len(missing), misses=len(missing))
+
+        # 2. The misses from the database (or from another thread already loading them)
+        if missing:
+            found.update(self.load(missing))
+        return found
+
+    def load(self, pks):
+        # 1. Claim the pks nobody in this process is loading; wait for the others
+        with self.lock:
+            waiting = {pk: self.flights[pk] for pk in pks if pk in self.flights}
+            mine = [pk for pk in pks if pk not in waiting]
+            for pk in mine:
+                self.flights[pk] = Flight()
+
+        # 2. One query for ours, and fill the cache (add(): never over a tombstone or a newer fill)
+        rows = {}
+        try:
+            if mine:
+                rows = {obj.pk: obj for obj in self.model._default_manager.filter(pk__in=mine)}
+                for pk in mine:
+                    obj = rows.get(pk)
+                    if obj is None:
+                        cache.add(self.key(pk), MISSING, MISSING_TIMEOUT)
+                    else:
+                        cache.add(self.key(pk), obj, self.timeout or settings.OBJECT_CACHE_TIMEOUT)
+                    self.flights[pk].result = obj
+        finally:
+            with self.lock:
+                for pk in mine:
+                    self.flights.pop(pk).done.set()
+
+        # 3. The ones another thread was loading: each waiter gets its own copy of the row
+        late = []
+        for pk, flight in waiting.items():
+            if not flight.done.wait(COALESCE_WAIT):
+                late.append(pk)
+                continue
+            if flight.result is not None:
+                rows[pk] = copy.copy(flight.result)
+        self.count(coalesced=len(waiting) - len(late))
+        if late:
+            rows.update({obj.pk: obj for obj in self.model._default_manager.filter(pk__in=late)})
+        return rows
+
+    # --- INVALIDATION ---
+
+    def invalidate(self, pks):
+        """Drops these pks; for INVALIDATION_GRACE seconds they are read from the database and not re-cached."""
+        cache.set_many({self.key(pk): TOMBSTONE for pk in set(pks) if pk is not None}, INVALIDATION_GRACE)
+
+    def invalidate_on_commit(self, pks):
+        """invalidate(), once the current transaction commits (right away outside one)."""
+        pks = list(pks)
+        transaction.on_commit(lambda: self.invalidate(pks))
+
+    # --- HIT RATE ---
+
+    def count(self, **counts):
+        with self.lock:
+            for name, value in counts.items():
+                self.counts[name] += value
+            if time.monotonic() - self.flushed_at < STATS_FLUSH_INTERVAL:
+                return
+            self.flushed_at = time.monotonic()
+            pending, self.counts = self.counts, dict.fromkeys(STATS_COUNTERS, 0)
+        self.flush(pending)
+
+    def flush(self, pending):
+        """Adds this process's counts to the shared ones (incr is atomic in Redis)."""
+        for name, value in pending.items():
+            if not value:
+                continue
+            key = f"{self.prefix}:stats:{name}"
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                # Not there yet (or evicted): start it (add(): another process may just have)
+                cache.add(key, 0, None)
+                cache.incr(key, value)
+
+    def stats(self):
+        """Shared counters plus this process's unflushed ones, with the hit rate."""
+        with self.lock:
+            pending, self.counts = self.counts, dict.fromkeys(STATS_COUNTERS, 0)
+        self.flush(pending)
+        shared = cache.get_many([f"{self.prefix}:stats:{name}" for name in STATS_COUNTERS])
+        stats = {name: shared.get(f"{self.prefix}:stats:{name}", 0) for name in STATS_COUNTERS}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+    def reset_stats(self):
+        cache.delete_many([f"{self.prefix}:stats:{name}" for name in STATS_COUNTERS])
+
+
+product_cache = ObjectCache('app.Product')
+category_cache = ObjectCache('app.Category')
+OBJECT_CACHES = {'product': product_cache, 'category': category_cache}
+
+
+def cached_product(request, pk):
+    """
+    The product (its category attached) this request works with, from the caches. The
+    detail page takes its ETag and its content from the same copies, so a row that is
+    behind in this process is never served under the ETag of the new one.
+    """
+    if not hasattr(request, 'cached_product'):
+        product = product_cache.get_or_404(pk)
+        product.category = category_cache.get(product.category_id) or product.category
+        request.cached_product = product
+    return request.cached_product
+
+
+# --- SIGNALS ---
+# Lazy senders ('app.Product'): this module is imported by models.py, before the models exist
+
+def invalidate_cached_product(sender, instance, **kwargs):
+    product_cache.invalidate_on_commit([instance.pk])
+
+
+def invalidate_cached_category(sender, instance, **kwargs):
+    category_cache.invalidate_on_commit([instance.pk])
+
+
+for signal in (post_save, post_delete):
+    signal.connect(invalidate_cached_product, sender='app.Product', dispatch_uid=f'object-cache-product-{signal is post_save}')
+    signal.connect(invalidate_cached_category, sender='app.Category', dispatch_uid=f'object-cache-category-{signal is post_save}')
+
@@ -0,0 +1,123 @@
+# retailshop/app/order_archive.py
+# Keeps the Order/OrderItem tables small: finished orders (ARCHIVE_STATUSES) and cash on
+# delivery orders older than settings.ORDER_ARCHIVE_AFTER_DAYS are moved, with their ids,
+# to ArchivedOrder and ArchivedOrderItem. Run nightly (`manage.py archive_orders` or the
+# 'orders.archive' job), the hot tables hold about ORDER_ARCHIVE_AFTER_DAYS of orders plus the ones still open.
+#
+# Orders are moved one calendar month at a time (oldest first), ARCHIVE_CHUNK_SIZE orders
+# per transaction: copy to the archive, then delete from the hot tables, in the same
+# transaction, so an order is always in exactly one of the two. A stopped run loses
+# nothing and the next one carries on.
+#
+# Nothing is summarised away: the sales reports and the CSV export (app/analytics.py)
+# read both tables, so their totals don't change; the customer's order pages fall back
+# to the archive (views/checkout.py), which Profile.has_archived_orders tells them exists.
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import DateTimeField, Q, Value
+from django.utils import timezone
+
+from .models import ArchivedOrder, ArchivedOrderItem, Order, OrderItem, Profile
+
+# Statuses nothing changes any more (Pending and M-Pesa Processing orders stay, however old)
+ARCHIVE_STATUSES = ('Paid', 'Complete', 'Payment Failed')
+# Cash on delivery orders stay 'Processing': the money changes hands at the door and nothing
+# records it. Once they are ORDER_ARCHIVE_AFTER_DAYS old they are settled, so they go too
+COD_PAYMENT_METHOD = 'Cash on Delivery'
+ARCHIVE_CHUNK_SIZE = 1000
+
+# Columns copied as they are (attnames: user_id, product_id, order_id - no joins)
+ORDER_COLUMNS = [field.attname for field in ArchivedOrder._meta.concrete_fields if field.name != 'archived_at']
+ITEM_COLUMNS = [field.attname for field in ArchivedOrderItem._meta.concrete_fields]
+
+
+def insert_from(model, queryset, columns):
+    """
+    INSERT INTO model's table (columns) SELECT <the queryset>: the rows are copied inside
+    the database. bulk_create() builds every row as an instance and its SQL in Python,
+    which took about two thirds of the archiving time.
+    """
+    quote = connections[queryset.db].ops.quote_name
+    target = ', '.join(quote(model._meta.get_field(column).column) for column in columns)
+    sql, params = queryset.values_list(*columns).query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {quote(model._meta.db_table)} ({target}) {sql}", params)
+
+
+def archive_cutoff(days=None):
+    if days is None:
+        days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(cutoff):
+    return Order.objects.filter(
+        Q(status__in=ARCHIVE_STATUSES) | Q(status='Processing', payment_method=COD_PAYMENT_METHOD),
+        created_at__lt=cutoff,
+    )
+
+
+def month_bounds(month):
+    """Aware [first day 00:00, first day of next month 00:00) for a date on the 1st."""
+    tz = timezone.get_current_timezone()
+    next_month = (month + timedelta(days=32)).replace(day=1)
+    return (
+        timezone.make_aware(datetime.combine(month, time.min), tz),
+        timezone.make_aware(datetime.combine(next_month, time.min), tz),
+    )
+
+
+def archive_chunk(queryset, chunk_size=ARCHIVE_CHUNK_SIZE):
+    """Moves up to chunk_size orders of the queryset (and their items) in one transaction. Returns how many."""
+    with transaction.atomic():
+        # 1. Lock the chunk (a late status update waits for us, then finds no row)
+        order_ids = list(queryset.select_for_update().order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not order_ids:
+            return 0
+
+        # 2. Copy, ids included (INSERT ... SELECT: the rows never come through Python)
+        orders = Order.objects.filter(pk__in=order_ids).annotate(
+            archived_at=Value(timezone.now(), output_field=DateTimeField()),
+        ).order_by()
+        insert_from(ArchivedOrder, orders, [*ORDER_COLUMNS, 'archived_at'])
+        insert_from(ArchivedOrderItem, OrderItem.objects.filter(order_id__in=order_ids).order_by(), ITEM_COLUMNS)
+        # Their owners now have archived orders (a Profile is created for any user without one)
+        user_ids = set(Order.objects.filter(pk__in=order_ids, user__isnull=False).values_list('user_id', flat=True))
+        Profile.objects.bulk_create(
+            [Profile(user_id=user_id, has_archived_orders=True) for user_id in user_ids],
+            update_conflicts=True, unique_fields=['user'], update_fields=['has_archived_orders'],
+        )
+
+        # 3. Delete from the hot tables (the items go with their order). The Order post_delete
+        # signal expires each customer's cached "My Orders" pages once this commits
+        Order.objects.filter(pk__in=order_ids).delete()
+    return len(order_ids)
+
+
+def archive_orders(days=None, chunk_size=ARCHIVE_CHUNK_SIZE, progress=None):
+    """
+    Moves every archivable order, month by month, oldest first. Returns {month: orders moved}.
+    progress(month, moved so far in that month) is called after each chunk.
+    """
+    cutoff = archive_cutoff(days)
+    first = archivable_orders(cutoff).order_by('created_at').values_list('created_at', flat=True).first()
+    if first is None:
+        return {}
+
+    moved = {}
+    month = timezone.localtime(first).date().replace(day=1)
+    while True:
+        low, high = month_bounds(month)
+        if low >= cutoff:
+            break
+        in_month = archivable_orders(cutoff).filter(created_at__gte=low, created_at__lt=high)
+        while count := archive_chunk(in_month, chunk_size):
+            moved[month] = moved.get(month, 0) + count
+            if progress:
+                progress(month, moved[month])
+        month = (month + timedelta(days=32)).replace(day=1)
+    return moved
+
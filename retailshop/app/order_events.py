@@ -0,0 +1,134 @@
+# retailshop/app/order_events.py
+# Live order status for the order confirmation page: a Server-Sent Events stream per
+# order (views/payments.order_status_stream), fed by one local pub/sub hub per process.
+#
+# Order status changes happen in the job workers (payments.reconcile_callback marks
+# an M-Pesa order Paid or Payment Failed), so the web process can't be told directly.
+# Instead, each web process runs ONE poller on its event loop that reads the status of
+# every order someone is watching in a single query every ORDER_EVENTS_POLL_INTERVAL
+# seconds, and fans changes out to the streams' queues. A thousand open streams cost
+# a thousand small asyncio queues and still one query per interval; an idle stream
+# holds no thread and no database connection.
+#
+# Live streams need ASGI (uvicorn/daphne): under WSGI each open stream would hold a
+# worker thread (and Django buffers an async stream there anyway). Under WSGI the view
+# sends order_status_poll() instead: the status once, and a `retry:` after which the
+# browser's EventSource reconnects by itself - the same page, polling.
+
+import asyncio
+import json
+import logging
+
+from .models import Order
+
+logger = logging.getLogger(__name__)
+
+ORDER_EVENTS_POLL_INTERVAL = 0.5   # seconds between status reads (the delivery delay)
+ORDER_EVENTS_KEEPALIVE = 15        # seconds of silence before a keep-alive comment
+ORDER_EVENTS_MAX_SECONDS = 10 * 60  # a stream ends after this; EventSource reconnects if still needed
+ORDER_EVENTS_POLL_RETRY_MS = 3000   # WSGI: how long the browser waits before asking again
+
+# Only Pending changes by itself (the M-Pesa callback); anything else is final
+PENDING_STATUS = 'Pending'
+
+
+class OrderStatusHub:
+    """Per-process fan-out: order id -> the queues of the streams watching it."""
+
+    def __init__(self, interval=ORDER_EVENTS_POLL_INTERVAL):
+        self.interval = interval
+        self.subscribers = {}  # order id -> set of asyncio.Queue
+        self.last_seen = {}    # order id -> (status, payment_status)
+        self.poller = None
+
+    def subscribe(self, order_id, current):
+        """A queue receiving (status, payment_status) whenever the order's status changes."""
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(order_id, set()).add(queue)
+        self.last_seen.setdefault(order_id, current)
+        # One poller per process, started by the first subscriber (on the running loop)
+        if self.poller is None or self.poller.done():
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return queue
+
+    def unsubscribe(self, order_id, queue):
+        queues = self.subscribers.get(order_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[order_id]
+            self.last_seen.pop(order_id, None)
+
+    def publish(self, order_id, status):
+        for queue in self.subscribers.get(order_id, ()):
+            queue.put_nowait(status)
+
+    async def poll(self):
+        """Reads every watched order's status in one query per interval; stops when nobody watches."""
+        while self.subscribers:
+            await asyncio.sleep(self.interval)
+            order_ids = list(self.subscribers)
+            if not order_ids:
+                break
+            try:
+                rows = [
+                    row async for row in
+                    Order.objects.filter(pk__in=order_ids).values_list('pk', 'status', 'payment_status')
+                ]
+            except Exception:
+                # A database hiccup mustn't kill the poller; the streams just wait a bit longer
+                logger.exception("Order status poll failed")
+                continue
+            for order_id, status, payment_status in rows:
+                if order_id in self.last_seen and self.last_seen[order_id] != (status, payment_status):
+                    self.last_seen[order_id] = (status, payment_status)
+                    self.publish(order_id, (status, payment_status))
+
+
+order_status_hub = OrderStatusHub()
+
+
+# --- SSE ---
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def order_status_poll(order_id, status, payment_status):
+    """The whole response under WSGI: the current status, with a reconnect delay while it's Pending."""
+    event = sse_event('status', {'order': order_id, 'status': status, 'payment_status': payment_status})
+    if status != PENDING_STATUS:
+        return event
+    return f"retry: {ORDER_EVENTS_POLL_RETRY_MS}\n{event}"
+
+
+async def order_status_events(order_id, status, payment_status, hub=order_status_hub):
+    """
+    The body of a stream: the current status at once, then every change, until the
+    order leaves Pending (or ORDER_EVENTS_MAX_SECONDS pass). Closing the connection
+    cancels this generator, which unsubscribes it.
+    """
+    yield sse_event('status', {'order': order_id, 'status': status, 'payment_status': payment_status})
+    if status != PENDING_STATUS:
+        return
+
+    queue = hub.subscribe(order_id, (status, payment_status))
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + ORDER_EVENTS_MAX_SECONDS
+    try:
+        while True:
+            timeout = min(ORDER_EVENTS_KEEPALIVE, deadline - loop.time())
+            if timeout <= 0:
+                yield sse_event('timeout', {'order': order_id})
+                return
+            try:
+                status, payment_status = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"  # an SSE comment: keeps proxies from closing an idle connection
+                continue
+            yield sse_event('status', {'order': order_id, 'status': status, 'payment_status': payment_status})
+            if status != PENDING_STATUS:
+                return
+    finally:
+        hub.unsubscribe(order_id, queue)
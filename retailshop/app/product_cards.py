@@ -0,0 +1,56 @@
+# retailshop/app/product_cards.py
+# Product cards for the listing pages (home, products).
+#
+# A card only shows id, name, price, image and the start of the description, so the
+# listing queries fetch just those columns (values_list, no model instances), cut the
+# description down in SQL (no multi-KB text per row), and build a small __slots__
+# object with the image URL already worked out.
+
+from django.db.models.functions import Substr
+from django.utils.text import Truncator
+
+from .models import Product
+
+CARD_FIELDS = ('pk', 'name', 'price', 'image', 'short_description')
+
+
+class ProductCard:
+    """What a product card needs; a fraction of the memory of a Product instance."""
+    __slots__ = ('pk', 'name', 'price', 'description', 'image_url')
+
+    def __init__(self, pk, name, price, description, image_url):
+        self.pk = pk
+        self.name = name
+        self.price = price
+        self.description = description
+        self.image_url = image_url
+
+    @property
+    def id(self):
+        return self.pk
+
+    def __repr__(self):
+        return f"<ProductCard {self.pk}: {self.name}>"
+
+
+def product_cards(queryset, description_length):
+    """
+    Cards for the products of the queryset, in its order. The description is cut to
+    description_length characters (with "…", like |truncatechars).
+    """
+    # One extra character, so Truncator can still tell if the text was longer
+    rows = queryset.annotate(
+        short_description=Substr('description', 1, description_length + 1)
+    ).values_list(*CARD_FIELDS)
+
+    storage = Product._meta.get_field('image').storage
+    cards = []
+    for pk, name, price, image, description in rows:
+        cards.append(ProductCard(
+            pk,
+            name,
+            price,
+            Truncator(description).chars(description_length) if len(description) > description_length else description,
+            storage.url(image) if image else None,
+        ))
+    return cards
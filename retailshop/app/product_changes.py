@@ -0,0 +1,56 @@
+# retailshop/app/product_changes.py
+# Consumer of the ProductChange outbox: invalidates ONLY what depends on the changed
+# products, instead of flushing whole caches.
+#
+# Anything that caches product data registers a handler:
+#
+#   @on_product_change
+#   def drop_my_cache(changes):   # list of ProductChange rows
+#       ...
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CartItem, ProductChange, cart_summary_cache_key
+
+PRODUCT_CHANGE_HANDLERS = []
+
+
+def on_product_change(handler):
+    PRODUCT_CHANGE_HANDLERS.append(handler)
+    return handler
+
+
+def process_product_changes(batch_size=500):
+    """Runs every handler over the unprocessed changes (oldest first), batch by batch."""
+    processed = 0
+    while True:
+        with transaction.atomic():
+            changes = list(
+                ProductChange.objects.filter(processed_at__isnull=True).order_by('pk')[:batch_size]
+            )
+            if not changes:
+                return processed
+
+            for handler in PRODUCT_CHANGE_HANDLERS:
+                handler(changes)
+
+            ProductChange.objects.filter(pk__in=[c.pk for c in changes]).update(processed_at=timezone.now())
+            processed += len(changes)
+
+
+# --- BUILT-IN HANDLERS ---
+
+@on_product_change
+def invalidate_cart_totals(changes):
+    """
+    A price change makes the cached summary of every cart holding that product stale.
+    Runs in the job worker: the delete reaches the web processes because run_workers
+    only starts with a shared cache (Redis, or CACHE_DIR on one machine).
+    """
+    product_ids = {c.product_id for c in changes if c.field == 'price'}
+    if not product_ids:
+        return
+    cart_ids = CartItem.objects.filter(product_id__in=product_ids).values_list('cart_id', flat=True).distinct()
+    cache.delete_many([cart_summary_cache_key(cart_id) for cart_id in cart_ids])
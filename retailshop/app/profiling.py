@@ -0,0 +1,187 @@
+# retailshop/app/profiling.py
+# Opt-in statistical profiler for live requests (PROFILING_ENABLED=1, see settings.py).
+#
+# A sampled request registers its thread with one background sampler thread, which reads
+# the thread's Python stack every PROFILING_INTERVAL seconds (sys._current_frames()).
+# Stacks are aggregated per URL name in the cache, in the "collapsed" format used by
+# flamegraph.pl and speedscope:  module:func;module:func;module:func <count>
+#
+# Not sampled requests cost one counter increment; with profiling disabled the
+# middleware removes itself (MiddlewareNotUsed).
+
+import itertools
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+from django.shortcuts import redirect, render
+from django.views.decorators.http import require_POST
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'  # staff send "X-Profile: 1" to profile one request
+MAX_STACK_DEPTH = 100
+MAX_STACKS_PER_URL = 5000
+PROFILE_CACHE_TIMEOUT = 7 * 24 * 60 * 60
+URL_NAMES_KEY = 'profiling:url-names'
+
+
+# --- SAMPLER ---
+
+def collapse(frame):
+    """One stack as 'module:func;...' from the outermost call to the innermost."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        names.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """One daemon thread samples every registered request thread; it sleeps when there are none."""
+    def __init__(self):
+        self.targets = {}  # thread id -> Counter of collapsed stacks
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread = None
+
+    def start(self):
+        samples = Counter()
+        with self.lock:
+            self.targets[threading.get_ident()] = samples
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='profiling-sampler', daemon=True)
+                self.thread.start()
+            self.active.set()
+        return samples
+
+    def stop(self):
+        with self.lock:
+            self.targets.pop(threading.get_ident(), None)
+            if not self.targets:
+                self.active.clear()
+
+    def run(self):
+        interval = getattr(settings, 'PROFILING_INTERVAL', 0.005)
+        while True:
+            self.active.wait()
+            time.sleep(interval)
+            with self.lock:
+                targets = list(self.targets.items())
+            frames = sys._current_frames()
+            for thread_id, samples in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[collapse(frame)] += 1
+
+
+sampler = Sampler()
+
+
+# --- STORAGE ---
+
+def profile_key(url_name):
+    return f"profiling:url:{url_name}"
+
+
+def record_profile(url_name, samples, seconds):
+    """
+    Merges one request's samples into the URL's aggregate. A read-modify-write on the
+    cache: two processes saving at the same moment can lose a request, which is fine
+    for a statistical profile.
+    """
+    profile = cache.get(profile_key(url_name)) or {'requests': 0, 'seconds': 0.0, 'stacks': {}}
+    profile['requests'] += 1
+    profile['seconds'] += seconds
+    stacks = Counter(profile['stacks'])
+    stacks.update(samples)
+    profile['stacks'] = dict(stacks.most_common(MAX_STACKS_PER_URL))
+    cache.set(profile_key(url_name), profile, PROFILE_CACHE_TIMEOUT)
+
+    url_names = cache.get(URL_NAMES_KEY) or set()
+    if url_name not in url_names:
+        cache.set(URL_NAMES_KEY, url_names | {url_name}, PROFILE_CACHE_TIMEOUT)
+
+
+def get_profiles():
+    url_names = sorted(cache.get(URL_NAMES_KEY) or ())
+    profiles = cache.get_many([profile_key(name) for name in url_names])
+    return {name: profiles[profile_key(name)] for name in url_names if profile_key(name) in profiles}
+
+
+# --- MIDDLEWARE ---
+
+class SamplingProfilerMiddleware:
+    """
+    Profiles 1 in PROFILING_SAMPLE_RATE requests (0 = none), plus any request from a
+    staff user carrying the X-Profile header. Goes after AuthenticationMiddleware.
+    """
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        self.counter = itertools.count(1)
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        samples = sampler.start()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop()
+        seconds = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unresolved'
+        record_profile(url_name, samples, seconds)
+        return response
+
+    def should_profile(self, request):
+        if PROFILE_HEADER in request.META:
+            return request.user.is_staff
+        return bool(self.sample_rate) and next(self.counter) % self.sample_rate == 0
+
+
+# --- STAFF VIEWS ---
+
+@staff_member_required
+def profile_list(request):
+    """Profiled URL names with request counts, average time and sample counts."""
+    rows = [
+        {
+            'url_name': name,
+            'requests': profile['requests'],
+            'avg_ms': 1000 * profile['seconds'] / profile['requests'],
+            'samples': sum(profile['stacks'].values()),
+        }
+        for name, profile in get_profiles().items()
+    ]
+    rows.sort(key=lambda row: row['avg_ms'] * row['requests'], reverse=True)
+    return render(request, 'app/profiles.html', {'profiles': rows, 'enabled': getattr(settings, 'PROFILING_ENABLED', False)})
+
+
+@staff_member_required
+def profile_collapsed(request, url_name):
+    """The URL's stacks in collapsed format: `flamegraph.pl profile.txt > profile.svg`, or drop into speedscope."""
+    profile = cache.get(profile_key(url_name))
+    if profile is None:
+        raise Http404("No profile for this URL name.")
+    lines = [f"{stack} {count}" for stack, count in sorted(profile['stacks'].items())]
+    response = HttpResponse("\n".join(lines) + "\n", content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'inline; filename="{url_name}.collapsed.txt"'
+    return response
+
+
+@staff_member_required
+@require_POST
+def profile_reset(request):
+    cache.delete_many([profile_key(name) for name in cache.get(URL_NAMES_KEY) or ()] + [URL_NAMES_KEY])
+    return redirect('profile_list')
@@ -0,0 +1,116 @@
+# retailshop/app/recommendations.py
+# "Customers also bought": item-to-item cosine similarity over co-purchases (OrderItem)
+# and, with a lower weight, co-carting (CartItem), computed with SciPy sparse matrices.
+#
+# Runs as a batch (`manage.py build_recommendations`, nightly from cron, or the
+# 'catalogue.build_recommendations' job) and stores the top-K neighbours per product in
+# ProductRecommendation. product_detail then reads them with one indexed query.
+#
+# NumPy/SciPy are only needed by the batch, so they are imported inside the functions:
+# web processes never load them.
+
+from django.db import transaction
+
+from .catalogue_io import batched
+from .models import CartItem, OrderItem, ProductRecommendation
+
+TOP_K = 10
+# A product sitting in the same cart is a weaker signal than one bought in the same order
+CO_CART_WEIGHT = 0.5
+LOAD_CHUNK_SIZE = 20000
+
+
+def load_pairs(queryset, basket_field):
+    """Streams (basket id, product id) pairs from the DB into two int64 arrays."""
+    import numpy as np
+
+    rows = (
+        queryset.exclude(product=None)
+        .values_list(basket_field, 'product_id')
+        .iterator(chunk_size=LOAD_CHUNK_SIZE)
+    )
+    pairs = np.fromiter(rows, dtype=[('basket', 'i8'), ('product', 'i8')])
+    return pairs['basket'], pairs['product']
+
+
+def basket_matrix(baskets, products, product_index, weight=1.0):
+    """Baskets x products matrix, `weight` where the product is in the basket (repeats count once)."""
+    import numpy as np
+    from scipy import sparse
+
+    rows = np.unique(baskets, return_inverse=True)[1]
+    cols = np.searchsorted(product_index, products)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(rows.max() + 1 if len(rows) else 0, len(product_index)),
+    )
+    matrix.sum_duplicates()
+    matrix.data[:] = weight
+    return matrix
+
+
+def similarity_top_k(order_pairs, cart_pairs=None, top_k=TOP_K):
+    """
+    order_pairs / cart_pairs: (basket ids, product ids) arrays.
+    Returns {product id: [(neighbour id, score), ...]} with at most top_k neighbours, best first.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    all_products = [order_pairs[1]] + ([cart_pairs[1]] if cart_pairs is not None else [])
+    product_index = np.unique(np.concatenate(all_products))
+    if not len(product_index):
+        return {}
+
+    # 1. Co-occurrence counts: C[i, j] = (weighted) number of baskets holding both i and j
+    orders = basket_matrix(*order_pairs, product_index)
+    co_occurrence = (orders.T @ orders).tocsr()
+    if cart_pairs is not None and len(cart_pairs[0]):
+        # sqrt: both sides of carts.T @ carts carry the weight, so each co-cart counts CO_CART_WEIGHT
+        carts = basket_matrix(*cart_pairs, product_index, weight=np.sqrt(CO_CART_WEIGHT))
+        co_occurrence = co_occurrence + (carts.T @ carts).tocsr()
+
+    # 2. Cosine normalisation: S[i, j] = C[i, j] / sqrt(C[i, i] * C[j, j]), so best sellers don't dominate
+    norms = np.sqrt(co_occurrence.diagonal())
+    norms[norms == 0] = 1
+    inverse = sparse.diags(1 / norms)
+    similarity = (inverse @ co_occurrence @ inverse).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+
+    # 3. Top-K per row (argpartition: no full sort of long rows)
+    neighbours = {}
+    indptr, indices, data = similarity.indptr, similarity.indices, similarity.data
+    for row in range(similarity.shape[0]):
+        start, end = indptr[row], indptr[row + 1]
+        if start == end:
+            continue
+        scores = data[start:end]
+        if end - start > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+        else:
+            best = np.arange(end - start)
+        best = best[np.argsort(-scores[best], kind='stable')]
+        neighbours[int(product_index[row])] = [
+            (int(product_index[indices[start + i]]), float(scores[i])) for i in best
+        ]
+    return neighbours
+
+
+def build_recommendations(top_k=TOP_K, batch_size=5000):
+    """Recomputes every product's neighbours and swaps them into ProductRecommendation."""
+    order_pairs = load_pairs(OrderItem.objects.all(), 'order_id')
+    cart_pairs = load_pairs(CartItem.objects.all(), 'cart_id')
+    neighbours = similarity_top_k(order_pairs, cart_pairs, top_k)
+
+    rows = (
+        ProductRecommendation(product_id=product_id, recommended_id=recommended_id, rank=rank, score=score)
+        for product_id, ranked in neighbours.items()
+        for rank, (recommended_id, score) in enumerate(ranked, start=1)
+    )
+    # One transaction: product pages see the old set or the new one, never a half-written table
+    with transaction.atomic():
+        ProductRecommendation.objects.all().delete()
+        for batch in batched(rows, batch_size):
+            ProductRecommendation.objects.bulk_create(batch)
+    return len(neighbours)
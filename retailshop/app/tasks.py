@@ -0,0 +1,151 @@
+# retailshop/app/tasks.py
+# Background job handlers (run by `manage.py run_workers`, queued with app.jobs.enqueue).
+
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .jobs import task
+from .models import Order, Product
+from .mpesa import callback_url
+from .order_archive import archive_orders
+from .product_changes import process_product_changes
+from .recommendations import build_recommendations
+
+logger = logging.getLogger(__name__)
+
+class PaymentError(Exception):
+    pass
+
+
+# --- PAYMENTS ---
+
+_mpesa_client = None
+
+def get_mpesa_client():
+    """One MpesaClient per worker process, created on first use."""
+    global _mpesa_client
+    if _mpesa_client is None:
+        from django_daraja.mpesa.core import MpesaClient
+        _mpesa_client = MpesaClient()
+    return _mpesa_client
+
+
+def mark_payment_failed(payload, exc):
+    # Through save(), not update(): its post_save signal expires the customer's cached "My Orders"
+    with transaction.atomic():
+        order = Order.objects.select_for_update().filter(pk=payload['order_id'], status='Pending').first()
+        if order is not None:
+            order.status = 'Payment Failed'
+            order.payment_status = 'STK push failed'
+            order.save(update_fields=['status', 'payment_status'])
+
+
+@task('payments.stk_push', on_failure=mark_payment_failed)
+def stk_push(payload):
+    """
+    Sends the M-Pesa STK prompt for an order, and stores the CheckoutRequestID
+    that the callback will later be matched on.
+    payload: order_id, phone_number, amount, account_reference, transaction_desc
+    """
+    response = get_mpesa_client().stk_push(
+        phone_number=payload['phone_number'],
+        amount=int(payload['amount']),
+        account_reference=payload['account_reference'],
+        transaction_desc=payload['transaction_desc'],
+        callback_url=callback_url(payload['order_id']),
+    )
+    if str(response.response_code) != '0' or not response.checkout_request_id:
+        raise PaymentError(f"STK push rejected: {response.error_message or response.response_description}")
+
+    Order.objects.filter(pk=payload['order_id']).update(checkout_request_id=response.checkout_request_id)
+
+
+@task('payments.reconcile_callback')
+def reconcile_callback(payload):
+    """
+    Applies an M-Pesa STK callback to its order: Paid (and stock taken) or Payment Failed.
+    Safe to run twice: an order that's no longer Pending is left alone.
+    payload: the callback body, plus the order_id its (signed) callback URL was issued for.
+    """
+    callback = payload['Body']['stkCallback']
+    checkout_request_id = callback['CheckoutRequestID']
+
+    with transaction.atomic():
+        order = (
+            Order.objects.select_for_update()
+            .filter(checkout_request_id=checkout_request_id)
+            .first()
+        )
+        if order is None:
+            # The callback can beat the stk_push job's UPDATE; raising makes it retry shortly
+            raise LookupError(f"No order for CheckoutRequestID {checkout_request_id} yet")
+        if 'order_id' in payload and order.pk != payload['order_id']:
+            # A genuine callback URL replayed with another order's CheckoutRequestID
+            logger.error("Callback for order #%s names order #%s's payment", payload['order_id'], order.pk)
+            return
+        if order.status != 'Pending':
+            return
+
+        if int(callback['ResultCode']) == 0:
+            order.status = 'Paid'
+            order.payment_status = 'Paid'
+            # Through Product.save() (rows locked) so each stock change lands in the ProductChange outbox
+            for item in order.items.exclude(product=None):
+                product = Product.objects.select_for_update().get(pk=item.product_id)
+                product.stock -= item.quantity
+                product.save(update_fields=['stock', 'updated_at'])
+        else:
+            order.status = 'Payment Failed'
+            order.payment_status = str(callback.get('ResultDesc', ''))[:30]
+        order.save(update_fields=['status', 'payment_status'])
+
+
+# --- CATALOGUE ---
+
+@task('catalogue.process_product_changes')
+def product_changes(payload):
+    """Applies pending ProductChange rows (targeted cache invalidation)."""
+    process_product_changes()
+
+
+@task('catalogue.build_recommendations')
+def recommendations(payload):
+    """Nightly rebuild of ProductRecommendation (same as `manage.py build_recommendations`)."""
+    build_recommendations()
+
+
+@task('orders.archive')
+def order_archive(payload):
+    """Nightly move of old finished orders to the archive tables (same as `manage.py archive_orders`)."""
+    archive_orders()
+
+
+# --- MEDIA DERIVATIVES ---
+
+THUMBNAIL_SIZE = (400, 400)
+
+def thumbnail_name(image_name):
+    root, _ = os.path.splitext(os.path.basename(image_name))
+    return f"products/thumbs/{root}.jpg"
+
+
+@task('media.product_thumbnail')
+def product_thumbnail(payload):
+    """Writes a 400x400 (max) JPEG thumbnail of a product image to products/thumbs/."""
+    from PIL import Image
+
+    with default_storage.open(payload['image']) as f:
+        image = Image.open(f)
+        image.thumbnail(THUMBNAIL_SIZE)
+        buffer = BytesIO()
+        image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True)
+
+    name = thumbnail_name(payload['image'])
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
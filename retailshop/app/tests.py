@@ -1,3 +1,1398 @@
-from django.test import TestCase
+# retailshop/app/tests.py
+# Behaviour tests for the app. Run with `python manage.py test app`.
 
-# Create your tests here.
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed, ValidationError
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.http import HttpResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
+
+from .admin import EstimatedCountPaginator
+from .analytics import MAX_REPORT_DAYS, SALES_STATUSES, build_report, export_rows, get_sales_report
+from .api import MAX_BULK_IDS
+from .autocomplete import CATEGORY, PRODUCT, autocomplete_index
+from .backends import ProfileModelBackend
+from .benchmark import CHECKOUT_FORM, compare, run_in_process, summarize
+from .category_tree import build_category_tree, invalidate_category_tree, products_in_category
+from .compression import CompressionMiddleware, brotli, choose_encoding
+from .facets import facet_index
+from .jobs import (
+    DONE_JOB_RETENTION, FAILED_JOB_RETENTION, STALE_JOB_TIMEOUT, TASKS, claim_jobs, enqueue,
+    prune_finished_jobs, requeue_stale_jobs, run_job, send_heartbeat, task,
+)
+from .management.commands.bench_templates import build_contexts, normalize, storefront_engines
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Category, CategoryClosure, Job, Order, OrderItem, Product,
+    ProductChange, ProductRecommendation, Profile, Review, cart_summary_cache_key, get_cart_summary,
+    order_history_version, rebuild_category_closure, recount_category_products,
+)
+from .mpesa import callback_url
+from .object_cache import MISSING, TOMBSTONE, product_cache
+from .order_archive import archive_orders
+from .product_cards import product_cards
+from .profiling import SamplingProfilerMiddleware, get_profiles
+from .product_changes import process_product_changes
+from .recommendations import build_recommendations, similarity_top_k
+from .tasks import mark_payment_failed, reconcile_callback
+from .warmup import STEPS, warm_up
+
+
+def make_products(count, category=None, **fields):
+    """`count` products in one INSERT (bulk_create: no save() side effects needed here)."""
+    category = category or Category.objects.create(name='Shoes', slug='shoes')
+    return Product.objects.bulk_create(
+        Product(category=category, name=f"Product {i}", price=100 + i, stock=5, **fields)
+        for i in range(count)
+    )
+
+
+def fresh_index(test, index):
+    """A shared in-memory index (facets, autocomplete), emptied for this test and synced in the request (not a thread)."""
+    for patch in (
+        mock.patch.object(index, 'snapshot', None),
+        mock.patch.object(index, 'dirty', set()),
+        mock.patch.object(index, 'sync_in_background', False),
+    ):
+        patch.start()
+        test.addCleanup(patch.stop)
+
+
+# --- ACCOUNTS ---
+
+class ProfileTests(TestCase):
+    def test_registration_creates_the_profile(self):
+        response = self.client.post(reverse('register'), {
+            'username': 'newcomer', 'email': 'new@example.com',
+            'password1': 'a-long-Passphrase-1', 'password2': 'a-long-Passphrase-1',
+        })
+        self.assertRedirects(response, reverse('login'), fetch_redirect_response=False)
+        self.assertTrue(Profile.objects.filter(user__username='newcomer').exists())
+
+    def test_login_does_not_touch_the_profile(self):
+        user = User.objects.create_user('shopper', password='secret')
+        Profile.objects.create(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'shopper', 'password': 'secret'})
+        self.assertEqual(response.status_code, 302)
+        # Saving last_login used to re-save the Profile through a post_save signal
+        self.assertFalse([q for q in queries if Profile._meta.db_table in q['sql']])
+
+    def test_users_without_a_profile_get_one_on_first_use(self):
+        user = User.objects.create(username='made-in-admin')
+        self.client.force_login(user)
+
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+        self.assertEqual(Profile.objects.filter(user=user).count(), 1)
+
+
+# --- CART ---
+
+class CartSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()  # summaries cached by earlier tests' carts with the same ids
+        self.user = User.objects.create(username='shopper')
+        Profile.objects.create(user=self.user)
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = make_products(1)[0]
+        self.client.force_login(self.user)
+
+    def summary(self):
+        return get_cart_summary(self.user)['item_count']
+
+    def test_request_user_comes_with_profile_and_cart(self):
+        user = ProfileModelBackend().get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.profile.pk, user.cart.pk), (self.user.profile.pk, self.cart.pk))
+
+    def test_item_changes_expire_the_cached_summary(self):
+        self.assertEqual(self.summary(), 0)  # cached
+        self.client.get(reverse('add_to_cart', args=[self.product.pk]))
+        self.assertEqual(self.summary(), 1)
+        self.client.post(reverse('add_to_cart', args=[self.product.pk]), {'quantity': 2})
+        self.assertEqual(self.summary(), 3)
+        self.client.post(reverse('update_cart', args=[self.product.pk]), {'quantity': 5})
+        self.assertEqual(self.summary(), 5)
+        self.client.post(reverse('update_cart', args=[self.product.pk]), {'quantity': 0})
+        self.assertEqual(self.summary(), 0)
+
+    def test_checkout_expires_the_cached_summary(self):
+        CartItem.objects.create(cart=self.cart, product=self.product, quantity=2)
+        self.assertEqual(self.summary(), 2)
+
+        response = self.client.post(reverse('process_order'), {**CHECKOUT_FORM, 'payment_method': 'Cash on Delivery'})
+        self.assertRedirects(response, reverse('order_confirmation', args=[Order.objects.get().pk]))
+        self.assertEqual(self.summary(), 0)
+
+
+# --- SESSIONS ---
+
+class SessionTests(TestCase):
+    def make_sessions(self, count, expire_date):
+        return [
+            Session.objects.create(session_key=f"{expire_date:%Y%m%d}-{i}", session_data='', expire_date=expire_date).pk
+            for i in range(count)
+        ]
+
+    def test_login_survives_a_cache_flush(self):
+        # cached_db (the default SESSION_MODE): the cache is only in front of the session table
+        self.client.force_login(User.objects.create(username='shopper'))
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('profile')).status_code, 200)
+
+    def test_expired_sessions_are_deleted_in_chunks(self):
+        now = timezone.now()
+        self.make_sessions(5, now - timedelta(days=1))
+        live = self.make_sessions(2, now + timedelta(days=1))
+
+        out = StringIO()
+        call_command('clear_expired_sessions', chunk_size=2, stdout=out)
+        self.assertEqual(out.getvalue().count("Deleted "), 3)  # 2 + 2 + 1
+        self.assertEqual(sorted(Session.objects.values_list('pk', flat=True)), sorted(live))
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_no_session_table_to_clean_with_signed_cookies(self):
+        self.make_sessions(1, timezone.now() - timedelta(days=1))
+        out = StringIO()
+        call_command('clear_expired_sessions', stdout=out)
+        self.assertIn("no session table", out.getvalue())
+        self.assertEqual(Session.objects.count(), 1)
+
+
+# --- CATALOGUE API ---
+
+class ProductApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = make_products(250)
+
+    def test_bulk_ids_returns_every_requested_row(self):
+        # More ids than the default page size (100): none may be dropped
+        ids = [p.pk for p in self.products[:150]]
+        response = self.client.get(reverse('api_products'), {'ids': ','.join(map(str, ids))})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], 150)
+        self.assertIsNone(data['next'])
+        self.assertEqual([row['id'] for row in data['results']], sorted(ids))
+
+    def test_bulk_ids_ignores_limit(self):
+        ids = [p.pk for p in self.products[:20]]
+        response = self.client.get(reverse('api_products'), {'ids': ','.join(map(str, ids)), 'limit': 5})
+        self.assertEqual(response.json()['count'], 20)
+
+    def test_too_many_ids_is_a_bad_request(self):
+        ids = [p.pk for p in self.products[:MAX_BULK_IDS + 1]]
+        response = self.client.get(reverse('api_products'), {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, 400)
+
+    def test_keyset_pages_cover_everything_once(self):
+        seen, after = [], None
+        while True:
+            params = {'limit': 100, 'fields': 'id'}
+            if after is not None:
+                params['after'] = after
+            data = self.client.get(reverse('api_products'), params).json()
+            seen += [row['id'] for row in data['results']]
+            after = data['next']
+            if after is None:
+                break
+        self.assertEqual(seen, sorted(p.pk for p in self.products))
+
+
+# --- CONDITIONAL GET (ETag / 304) ---
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        fresh_index(self, facet_index)
+        self.products = make_products(3)
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_catalogue_is_a_304(self):
+        for url in (reverse('home'), reverse('products'), reverse('product_detail', args=[self.products[0].pk])):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('must-revalidate', response['Cache-Control'])
+            self.assertIn('Cookie', response['Vary'])
+            self.assertEqual(self.revalidate(url, response['ETag']).status_code, 304)
+
+    def test_product_changes_move_the_etag(self):
+        url = reverse('home')
+        etag = self.client.get(url)['ETag']
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.price += 1
+        product.save()
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+        # A deleted product leaves no updated_at behind: its category is bumped instead
+        etag = self.client.get(url)['ETag']
+        product.delete()
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_etag_follows_the_category_tree_the_page_was_built_from(self):
+        cache.clear()
+        url = reverse('categories')
+        etag = self.client.get(url)['ETag']
+
+        # Renamed by another process: this one still has the old tree cached (LocMem)
+        Category.objects.filter(pk=self.products[0].category_id).update(name='Sneakers', updated_at=timezone.now())
+        response = self.revalidate(url, etag)
+        self.assertNotContains(response, 'Sneakers')
+
+        # Its tree expires: the page served from the old tree must not be confirmed
+        invalidate_category_tree()
+        self.assertContains(self.revalidate(url, response['ETag']), 'Sneakers')
+
+    def test_detail_etag_follows_the_cached_product(self):
+        cache.clear()
+        product = self.products[0]
+        url = reverse('product_detail', args=[product.pk])
+        etag = self.client.get(url)['ETag']
+
+        # Repriced by another process: this one still has the old row cached (LocMem)
+        Product.objects.filter(pk=product.pk).update(price=777, updated_at=timezone.now())
+        response = self.revalidate(url, etag)
+        self.assertNotContains(response, '777')
+
+        # Its entry expires: the page served from the old row must not be confirmed
+        product_cache.invalidate([product.pk])
+        self.assertContains(self.revalidate(url, response['ETag']), '777')
+
+    def test_review_moves_only_its_product_page(self):
+        reviewed, other = self.products[:2]
+        urls = [reverse('product_detail', args=[pk]) for pk in (reviewed.pk, other.pk)]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+
+        Review.objects.create(product=reviewed, user=User.objects.create(username='reviewer'), rating=4)
+        self.assertEqual(self.revalidate(urls[0], etags[0]).status_code, 200)
+        self.assertEqual(self.revalidate(urls[1], etags[1]).status_code, 304)
+
+    def test_logged_in_pages_are_private(self):
+        self.client.force_login(User.objects.create(username='shopper'))
+        response = self.client.get(reverse('products'))
+        self.assertNotIn('ETag', response)
+        self.assertIn('private', response['Cache-Control'])
+
+
+# --- PRODUCTS PAGE ---
+
+class ProductsPageTests(TestCase):
+    def setUp(self):
+        fresh_index(self, facet_index)
+        self.products = make_products(3)
+        self.reviewer = User.objects.create(username='reviewer')
+
+    def test_new_review_changes_the_etag(self):
+        etag = self.client.get(reverse('products'))['ETag']
+        self.assertEqual(self.client.get(reverse('products'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Review.objects.create(product=self.products[0], user=self.reviewer, rating=5)
+        response = self.client.get(reverse('products'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.context['facets']['rating'][0]['count'], 1)  # 4★ & up
+
+    def test_deleted_review_changes_the_etag(self):
+        review = Review.objects.create(product=self.products[0], user=self.reviewer, rating=5)
+        etag = self.client.get(reverse('products'))['ETag']
+        review.delete()
+        self.assertEqual(self.client.get(reverse('products'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+    def test_etag_follows_the_snapshot_the_page_was_built_from(self):
+        Product.objects.filter(pk=self.products[0].pk).update(stock=0)
+        url = f"{reverse('products')}?in_stock=1"
+        etag = self.client.get(url)['ETag']
+
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.stock = 5
+        product.save()
+        with facet_index.lock:  # the sync this starts is still running: the old snapshot is served
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.context['result_count'], 2)
+        stale = response['ETag']
+
+        # Synced: the page served under `stale` is out of date, so it can't be a 304
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=stale)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result_count'], 3)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class FacetIndexTests(TestCase):
+    def setUp(self):
+        fresh_index(self, facet_index)
+        self.products = make_products(4)
+
+    def in_stock_count(self):
+        return facet_index.search({})[1]['in_stock'].get(True, 0)
+
+    def test_search_does_not_wait_for_a_running_sync(self):
+        self.assertEqual(self.in_stock_count(), 4)
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.stock = 0
+        product.save()
+        published = facet_index.snapshot
+
+        with facet_index.lock:  # a sync is running
+            self.assertEqual(self.in_stock_count(), 4)  # answered from the published snapshot
+        self.assertEqual(self.in_stock_count(), 3)  # the next one syncs
+
+        # Synced into a copy: a search still holding the old snapshot isn't changed under it
+        self.assertIsNot(facet_index.snapshot, published)
+        self.assertEqual(published.search({})[1]['in_stock'][True], 4)
+
+    def rated_4_and_up(self):
+        return facet_index.search({})[1]['rating'].get(4, 0)
+
+    def test_reviews_changed_by_another_process_are_picked_up(self):
+        reviewers = [User.objects.create(username=f"reviewer-{i}") for i in range(2)]
+        review = Review.objects.create(product=self.products[0], user=reviewers[0], rating=5)
+        self.assertEqual(self.rated_4_and_up(), 1)
+
+        # Edited elsewhere (no signal here, but save() moved updated_at)
+        Review.objects.filter(pk=review.pk).update(rating=2, updated_at=timezone.now())
+        facet_index.checked_at = 0  # FACET_SYNC_INTERVAL later
+        self.assertEqual(self.rated_4_and_up(), 0)
+
+        # Deleted and another one written elsewhere: the count is the same as before
+        Review.objects.filter(pk=review.pk).update(rating=5, updated_at=timezone.now())
+        facet_index.checked_at = 0
+        self.assertEqual(self.rated_4_and_up(), 1)
+        Review.objects.filter(pk=review.pk)._raw_delete('default')
+        Review.objects.bulk_create([Review(product=self.products[1], user=reviewers[1], rating=1)])
+        facet_index.checked_at = 0
+        self.assertEqual(self.rated_4_and_up(), 0)
+        self.assertEqual(facet_index.search({})[1]['rating'].get(1, 0), 1)
+
+    def test_products_deleted_by_another_process_are_dropped(self):
+        self.in_stock_count()
+        # Deleted elsewhere: no signal reaches this process
+        Product.objects.filter(pk=self.products[0].pk)._raw_delete('default')
+        self.assertEqual(self.in_stock_count(), 4)  # not looked for yet
+        facet_index.checked_at = 0  # FACET_SYNC_INTERVAL later
+        self.assertEqual(self.in_stock_count(), 3)
+
+
+# --- AUTOCOMPLETE ---
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        fresh_index(self, autocomplete_index)
+        self.shoes = Category.objects.create(name='Shoes', slug='shoes')
+        self.runner, self.sandal = make_products(2, category=self.shoes)
+        Product.objects.filter(pk=self.runner.pk).update(name='Nike Air Sneakers')
+        Product.objects.filter(pk=self.sandal.pk).update(name='Bata Sandals')
+
+    def suggest(self, query):
+        return self.client.get(reverse('api_autocomplete'), {'q': query}).json()['results']
+
+    def test_matches_the_start_of_any_word(self):
+        self.assertEqual([row['name'] for row in self.suggest('sne')], ['Nike Air Sneakers'])
+        self.assertEqual([row['name'] for row in self.suggest('s')], ['Shoes', 'Bata Sandals', 'Nike Air Sneakers'])
+        self.assertEqual(self.suggest('ir'), [])
+
+    def test_changes_are_synced_without_touching_the_built_index(self):
+        self.suggest('s')
+        base = autocomplete_index.snapshot.base
+        runner = Product.objects.get(pk=self.runner.pk)
+        runner.name = 'Nike Air Runners'
+        runner.save()
+        self.sandal.delete()
+        Product.objects.create(category=self.shoes, name='Adidas Sneakers', price=100, stock=5)
+
+        self.assertEqual([row['name'] for row in self.suggest('sne')], ['Adidas Sneakers'])
+        self.assertEqual([row['name'] for row in self.suggest('s')], ['Shoes', 'Adidas Sneakers'])
+        self.assertEqual([row['name'] for row in self.suggest('run')], ['Nike Air Runners'])
+        self.assertIs(autocomplete_index.snapshot.base, base)
+        self.assertEqual(autocomplete_index.snapshot.count(PRODUCT), 2)
+
+    def test_suggest_does_not_wait_for_a_running_sync(self):
+        self.suggest('s')
+        Product.objects.filter(pk=self.runner.pk).update(name='Nike Air Runners')
+        autocomplete_index.dirty.add((PRODUCT, self.runner.pk))
+
+        with autocomplete_index.lock:  # a sync is running
+            self.assertEqual(len(self.suggest('sne')), 1)  # the published snapshot
+        self.assertEqual(self.suggest('sne'), [])
+
+    def test_too_many_pending_changes_rebuild(self):
+        self.suggest('s')
+        with mock.patch('app.autocomplete.MAX_PENDING_CHANGES', 1):
+            autocomplete_index.dirty |= {(PRODUCT, self.runner.pk), (CATEGORY, self.shoes.pk)}
+            self.suggest('s')
+        self.assertEqual(autocomplete_index.snapshot.changes, {})
+
+
+# --- OBJECT CACHE ---
+
+class ObjectCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = make_products(3)
+        self.pk = self.products[0].pk
+
+    def test_saves_invalidate_on_commit(self):
+        product_cache.get(self.pk)
+        product = Product.objects.get(pk=self.pk)
+        product.price = 999
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+            self.assertEqual(cache.get(product_cache.key(self.pk)).price, 100)  # not before the commit
+
+        self.assertEqual(cache.get(product_cache.key(self.pk)), TOMBSTONE)
+        self.assertEqual(product_cache.get(self.pk).price, 999)
+        # Read from the database during the grace period, not put back in the cache
+        self.assertEqual(cache.get(product_cache.key(self.pk)), TOMBSTONE)
+
+    def test_fill_does_not_overwrite_a_newer_tombstone(self):
+        old_rows = list(Product.objects.filter(pk=self.pk))
+
+        def read_then_change(**lookups):
+            # The row was read just before another request's change committed
+            product_cache.invalidate([self.pk])
+            return old_rows
+
+        with mock.patch.object(Product.objects, 'filter', side_effect=read_then_change):
+            self.assertEqual(product_cache.get(self.pk).pk, self.pk)
+        self.assertEqual(cache.get(product_cache.key(self.pk)), TOMBSTONE)
+
+    def test_get_many_loads_every_miss_in_one_query(self):
+        product_cache.get(self.pk)
+        pks = [product.pk for product in self.products] + [0]
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = product_cache.get_many(pks)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(sorted(rows), sorted(pks[:-1]))
+        self.assertEqual(cache.get(product_cache.key(0)), MISSING)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(sorted(product_cache.get_many(pks)), sorted(pks[:-1]))
+        self.assertEqual(len(queries), 0)
+
+    def test_stats_count_hits_and_misses(self):
+        product_cache.stats()  # flushes what earlier tests counted...
+        product_cache.reset_stats()  # ...and drops it
+
+        product_cache.get(self.pk)
+        product_cache.get(self.pk)
+        stats = product_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_rate']), (1, 1, 0.5))
+
+
+# --- CATEGORY TREE ---
+
+class CategoryTreeTests(TestCase):
+    def setUp(self):
+        # Fashion > Shoes > Sneakers, and Sports
+        self.fashion = Category.objects.create(name='Fashion', slug='fashion')
+        self.shoes = Category.objects.create(name='Shoes', slug='shoes', parent=self.fashion)
+        self.sneakers = Category.objects.create(name='Sneakers', slug='sneakers', parent=self.shoes)
+        self.sports = Category.objects.create(name='Sports', slug='sports')
+        self.runners = make_products(2, category=self.sneakers)
+        recount_category_products()  # bulk_create skips the counting, as in the bulk imports
+
+    def closure(self):
+        return set(CategoryClosure.objects.values_list('ancestor__name', 'descendant__name', 'depth'))
+
+    def assert_closure_matches_parents(self):
+        """The rows save() maintained are exactly the ones a rebuild from the parent pointers writes."""
+        maintained = self.closure()
+        rebuild_category_closure()
+        self.assertEqual(maintained, self.closure())
+
+    def test_new_categories_link_to_every_ancestor(self):
+        self.assertLessEqual({('Fashion', 'Sneakers', 2), ('Shoes', 'Sneakers', 1), ('Sneakers', 'Sneakers', 0)}, self.closure())
+        self.assert_closure_matches_parents()
+
+    def test_moving_a_subtree_moves_its_products(self):
+        self.shoes.parent = self.sports
+        self.shoes.save()
+
+        self.assertIn(('Sports', 'Sneakers', 2), self.closure())
+        self.assertNotIn(('Fashion', 'Sneakers', 2), self.closure())
+        self.assert_closure_matches_parents()
+        self.assertFalse(products_in_category(self.fashion.pk).exists())
+        self.assertEqual(set(products_in_category(self.sports.pk)), set(self.runners))
+
+        # ...and out again, as a root
+        self.shoes.parent = None
+        self.shoes.save()
+        self.assert_closure_matches_parents()
+        self.assertFalse(products_in_category(self.sports.pk).exists())
+
+    def test_cannot_move_under_its_own_subtree(self):
+        self.fashion.parent = self.sneakers
+        with self.assertRaises(ValidationError):
+            self.fashion.clean()
+        with self.assertRaises(ValidationError):
+            self.fashion.save()
+        self.assert_closure_matches_parents()
+
+    def test_tree_totals_follow_product_moves(self):
+        runner = Product.objects.get(pk=self.runners[0].pk)
+        runner.category = self.sports
+        runner.save()
+
+        tree = build_category_tree()
+        totals = {node.name: (node.product_count, node.total_count) for node in tree.nodes}
+        self.assertEqual(totals['Fashion'], (0, 1))
+        self.assertEqual(totals['Sneakers'], (1, 1))
+        self.assertEqual(totals['Sports'], (1, 1))
+        self.assertEqual([node.name for node in tree.nodes], ['Fashion', 'Shoes', 'Sneakers', 'Sports'])
+
+
+# --- RECOMMENDATIONS ---
+
+def basket_pairs(baskets):
+    """{basket id: [product ids]} -> the (basket ids, product ids) arrays load_pairs() reads."""
+    import numpy as np
+    pairs = [(basket, product) for basket, products in baskets.items() for product in products]
+    return np.array([b for b, _ in pairs], dtype='i8'), np.array([p for _, p in pairs], dtype='i8')
+
+
+class RecommendationTests(TestCase):
+    # 1 was bought with 2 twice, with 3 and with 4 once each; 2 with 3 once
+    ORDERS = {10: [1, 2, 3], 11: [1, 2], 12: [1, 4, 4]}
+
+    def test_neighbours_best_first_without_the_product_itself(self):
+        neighbours = similarity_top_k(basket_pairs(self.ORDERS))
+
+        self.assertEqual([pk for pk, _ in neighbours[1]], [2, 3, 4])
+        # Cosine: co-purchases / sqrt(purchases of each); 4 counts once in order 12
+        self.assertAlmostEqual(neighbours[1][0][1], 2 / 6 ** 0.5, places=5)
+        self.assertAlmostEqual(neighbours[4][0][1], 1 / 3 ** 0.5, places=5)
+        self.assertEqual([pk for pk, _ in neighbours[2]], [1, 3])  # 2/sqrt(2*3) > 1/sqrt(2*1)
+        for product, ranked in neighbours.items():
+            self.assertNotIn(product, [pk for pk, _ in ranked])
+
+    def test_top_k_and_co_carting(self):
+        self.assertEqual([pk for pk, _ in similarity_top_k(basket_pairs(self.ORDERS), top_k=1)[1]], [2])
+
+        # Carted together (a weaker signal) puts 4 ahead of 3 for 1
+        neighbours = similarity_top_k(basket_pairs(self.ORDERS), basket_pairs({20: [1, 4]}))
+        self.assertEqual([pk for pk, _ in neighbours[1]], [2, 4, 3])
+
+    def test_nothing_to_recommend(self):
+        self.assertEqual(similarity_top_k(basket_pairs({})), {})
+        self.assertEqual(similarity_top_k(basket_pairs({10: [1], 11: [1, 1]})), {})
+
+    def test_build_stores_ranked_rows(self):
+        products = make_products(3)
+        user = User.objects.create(username='buyer')
+        for basket in ([0, 1, 2], [0, 1]):
+            order = Order.objects.create(user=user, total_amount=100, status='Paid')
+            OrderItem.objects.bulk_create(OrderItem(order=order, product=products[i], price=1) for i in basket)
+
+        self.assertEqual(build_recommendations(), 3)
+        ranked = ProductRecommendation.objects.filter(product=products[0]).order_by('rank')
+        self.assertEqual([(r.rank, r.recommended_id) for r in ranked], [(1, products[1].pk), (2, products[2].pk)])
+
+
+# --- CATALOGUE IMPORT / EXPORT ---
+
+class CatalogueRoundTripTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export_and_reimport(self, filename):
+        path = os.path.join(self.directory.name, filename)
+        call_command('export_catalogue', path, stdout=StringIO())
+        errors = StringIO()
+        call_command('import_catalogue', path, stdout=StringIO(), stderr=errors)
+        return errors.getvalue()
+
+    def test_products_created_without_sku_get_one(self):
+        category = Category.objects.create(name='Bags', slug='bags')
+        saved = Product.objects.create(category=category, name='Tote', price=10)
+        bulk = make_products(2, category=category)
+        saved.sku = ''
+        saved.save()
+
+        skus = list(Product.objects.values_list('sku', flat=True))
+        self.assertTrue(all(skus))
+        self.assertEqual(len(set(skus)), 3)
+        self.assertTrue(all(p.sku for p in bulk))
+
+    def assert_round_trip(self, filename):
+        make_products(30)
+        columns = ('pk', 'sku', 'name', 'category_id', 'price', 'stock')
+        before = list(Product.objects.order_by('pk').values_list(*columns))
+
+        self.assertEqual(self.export_and_reimport(filename), '')  # no rejected rows
+        self.assertEqual(list(Product.objects.order_by('pk').values_list(*columns)), before)
+
+    def test_csv_export_reimports_unchanged(self):
+        self.assert_round_trip('catalogue.csv')
+
+    def test_jsonl_export_reimports_unchanged(self):
+        self.assert_round_trip('catalogue.jsonl')
+        self.assertFalse(ProductChange.objects.exists())  # nothing changed, nothing logged
+
+    def test_import_logs_price_and_stock_changes(self):
+        category = Category.objects.create(name='Bags', slug='bags')
+        tote = Product.objects.create(category=category, name='Tote', sku='TOTE', price=10, stock=3)
+        ProductChange.objects.all().delete()
+        path = os.path.join(self.directory.name, 'update.csv')
+        with open(path, 'w', newline='') as f:
+            f.write("sku,name,category,price,stock,description,image\n")
+            f.write("TOTE,Tote,bags,12.50,3,,\n")
+            f.write("CLUTCH,Clutch,bags,30,1,,\n")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_catalogue', path, stdout=StringIO())
+
+        clutch = Product.objects.get(sku='CLUTCH')
+        self.assertEqual(
+            set(ProductChange.objects.values_list('product_id', 'field', 'old_value', 'new_value')),
+            {(tote.pk, 'price', Decimal('10'), Decimal('12.5')),  # the unchanged stock isn't logged
+             (clutch.pk, 'price', None, Decimal('30')), (clutch.pk, 'stock', None, Decimal('1'))},
+        )
+        self.assertTrue(Job.objects.filter(name='catalogue.process_product_changes', status=Job.QUEUED).exists())
+
+
+# --- ADMIN ---
+
+class CartAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='x')
+
+    def checked_out(self):
+        """{username: 'Order Placed' column} for every cart, as the changelist computes it."""
+        request = RequestFactory().get('/admin/app/cart/')
+        request.user = self.admin
+        rows = site._registry[Cart].get_queryset(request)
+        return {cart.user.username: cart._is_checked_out for cart in rows}
+
+    def test_checked_out_follows_the_cart_contents(self):
+        product = make_products(1)[0]
+        Cart.objects.create(user=User.objects.create(username='new'))
+        shopper = User.objects.create(username='shopper')
+        cart = Cart.objects.create(user=shopper)
+        Order.objects.create(user=shopper, total_amount=100, status='Paid')
+
+        # Ordered, and checkout emptied the cart
+        self.assertEqual(self.checked_out(), {'new': False, 'shopper': True})
+
+        # Shopping again: the same cart is open again
+        CartItem.objects.create(cart=cart, product=product)
+        self.assertEqual(self.checked_out(), {'new': False, 'shopper': False})
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    def test_page_past_the_real_end_serves_the_last_page(self):
+        products = make_products(6)
+        # MAX(id) still says 6 rows (3 pages of 2), but only 2 are left
+        Product.objects.filter(pk__in=[p.pk for p in products[1:5]]).delete()
+
+        paginator = EstimatedCountPaginator(Product.objects.order_by('pk'), 2)
+        self.assertEqual(paginator.num_pages, 3)
+        page = paginator.page(3)
+
+        self.assertEqual(page.number, 1)
+        self.assertEqual([p.pk for p in page.object_list], [products[0].pk, products[5].pk])
+        self.assertEqual(paginator.count, 2)
+        self.assertEqual(list(paginator.get_elided_page_range(3)), [1])
+
+
+# --- BACKGROUND JOBS ---
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        # A throwaway task, registered for this test only
+        registry = mock.patch.dict(TASKS)
+        registry.start()
+        self.addCleanup(registry.stop)
+        self.runs, self.failures = [], []
+        task('tests.flaky', on_failure=lambda payload, exc: self.failures.append(payload))(self.flaky)
+
+    def flaky(self, payload):
+        self.runs.append(payload)
+        if payload.get('fail'):
+            raise RuntimeError("boom")
+
+    def run_due_jobs(self):
+        for job in claim_jobs('test-worker', 10):
+            run_job(job)
+
+    def test_same_idempotency_key_enqueues_once(self):
+        first = enqueue('tests.flaky', {'n': 1}, idempotency_key='once')
+        second = enqueue('tests.flaky', {'n': 2}, idempotency_key='once')
+        self.assertEqual(first.pk, second.pk)
+        self.run_due_jobs()
+        self.assertEqual(self.runs, [{'n': 1}])
+
+    def test_success_is_done(self):
+        job = enqueue('tests.flaky', {})
+        self.run_due_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+
+    def test_failure_is_retried_later_then_given_up(self):
+        job = enqueue('tests.flaky', {'fail': True}, max_attempts=2)
+
+        with self.assertLogs('app.jobs', 'WARNING'):
+            self.run_due_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())  # backed off
+        self.run_due_jobs()
+        self.assertEqual(len(self.runs), 1)  # not due yet
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('app.jobs', 'ERROR'):
+            self.run_due_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(self.failures, [{'fail': True}])
+
+    def test_only_jobs_without_a_heartbeat_are_requeued(self):
+        alive, dead = enqueue('tests.flaky', {}), enqueue('tests.flaky', {})
+        claim_jobs('test-worker', 10)
+        long_ago = timezone.now() - STALE_JOB_TIMEOUT * 3
+        Job.objects.update(started_at=long_ago, heartbeat_at=long_ago)
+
+        send_heartbeat([alive.pk])  # still running, however long ago it started
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.get(pk=alive.pk).status, Job.RUNNING)
+        self.assertEqual(Job.objects.get(pk=dead.pk).status, Job.QUEUED)
+
+    def test_old_finished_jobs_are_pruned(self):
+        now = timezone.now()
+        keep = [
+            Job.objects.create(name='tests.flaky', status=Job.QUEUED),
+            Job.objects.create(name='tests.flaky', status=Job.DONE, finished_at=now),
+            Job.objects.create(name='tests.flaky', status=Job.FAILED, finished_at=now - DONE_JOB_RETENTION * 2),
+        ]
+        Job.objects.create(name='tests.flaky', status=Job.DONE, finished_at=now - DONE_JOB_RETENTION * 2)
+        Job.objects.create(name='tests.flaky', status=Job.FAILED, finished_at=now - FAILED_JOB_RETENTION * 2)
+
+        self.assertEqual(prune_finished_jobs(), 2)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {job.pk for job in keep})
+
+    def test_run_workers_refuses_a_per_process_cache(self):
+        # The test settings use the default LocMem cache
+        with self.assertRaises(CommandError):
+            call_command('run_workers', '--once', stdout=StringIO())
+
+
+class PaymentTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.order = Order.objects.create(user=self.user, total_amount=200, status='Pending', payment_method='M-Pesa')
+        self.product = make_products(1)[0]
+        OrderItem.objects.create(order=self.order, product=self.product, quantity=2, price=100)
+
+    def post_callback(self, url, checkout_request_id='ws_CO_1', result_code=0):
+        body = {'Body': {'stkCallback': {'CheckoutRequestID': checkout_request_id, 'ResultCode': result_code}}}
+        return self.client.post(url, json.dumps(body), content_type='application/json')
+
+    def signed_callback_path(self, order_id):
+        ref = parse_qs(urlsplit(callback_url(order_id)).query)['ref'][0]
+        return f"{reverse('mpesa_callback')}?ref={ref}"
+
+    def test_failed_stk_push_expires_the_order_history(self):
+        version = order_history_version(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_payment_failed({'order_id': self.order.pk}, RuntimeError())
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Payment Failed')
+        self.assertNotEqual(order_history_version(self.user.id), version)
+
+    def test_callback_without_a_valid_ref_is_refused(self):
+        for url in (reverse('mpesa_callback'), f"{reverse('mpesa_callback')}?ref={self.order.pk}:forged"):
+            self.assertEqual(self.post_callback(url).status_code, 403)
+        self.assertFalse(Job.objects.filter(name='payments.reconcile_callback').exists())
+
+    def test_signed_callback_is_queued_once(self):
+        url = self.signed_callback_path(self.order.pk)
+        self.assertEqual(self.post_callback(url).status_code, 200)
+        self.assertEqual(self.post_callback(url).status_code, 200)  # Safaricom retrying
+
+        job = Job.objects.get(name='payments.reconcile_callback')
+        self.assertEqual(job.payload['order_id'], self.order.pk)
+
+    def test_callback_applies_to_its_own_order_only(self):
+        self.order.checkout_request_id = 'ws_CO_1'
+        self.order.save()
+        payload = {'Body': {'stkCallback': {'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0}}}
+
+        with self.assertLogs('app.tasks', 'ERROR'):
+            reconcile_callback({**payload, 'order_id': self.order.pk + 1})
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, 'Pending')
+
+        reconcile_callback({**payload, 'order_id': self.order.pk})
+        self.order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(self.order.status, 'Paid')
+        self.assertEqual(self.product.stock, 3)
+
+
+class ProductChangeTests(TestCase):
+    def test_price_change_expires_the_cart_summaries_holding_it(self):
+        product, other = make_products(2)
+        buyer, browser = User.objects.create(username='buyer'), User.objects.create(username='browser')
+        CartItem.objects.create(cart=Cart.objects.create(user=buyer), product=product)
+        CartItem.objects.create(cart=Cart.objects.create(user=browser), product=other)
+        self.assertEqual(get_cart_summary(buyer)['total'], product.price)
+        get_cart_summary(browser)
+
+        product = Product.objects.get(pk=product.pk)  # loaded, so save() sees the change
+        with self.captureOnCommitCallbacks(execute=True):
+            product.price += 50
+            product.save()
+        self.assertTrue(Job.objects.filter(name='catalogue.process_product_changes').exists())
+        process_product_changes()  # what that job runs
+
+        self.assertIsNone(cache.get(cart_summary_cache_key(buyer.cart.pk)))
+        self.assertIsNotNone(cache.get(cart_summary_cache_key(browser.cart.pk)))
+        self.assertEqual(get_cart_summary(buyer)['total'], product.price)
+
+
+# --- LOAD-TEST HARNESS ---
+
+class BenchmarkHarnessTests(TestCase):
+    def setUp(self):
+        fresh_index(self, facet_index)
+
+    def test_every_journey_runs_without_errors(self):
+        call_command('seed_benchmark', categories=3, products=40, users=4, reviews=20, carts=2, orders=10, stdout=StringIO())
+        results, _ = run_in_process(150, 'bench-user-0', warmup=0)
+
+        summary = summarize(results, 1.0)
+        self.assertEqual(summary['total']['errors'], 0)
+        # Every step of every scenario ran, and queries were counted
+        self.assertGreaterEqual(set(summary['steps']), {'home', 'products', 'add_to_cart', 'place_order', 'mpesa_callback'})
+        self.assertTrue(all(step['queries'] for step in summary['steps'].values()))
+
+    def test_clear_deletes_only_seeded_data(self):
+        make_products(2)
+        call_command('seed_benchmark', categories=2, products=10, users=2, reviews=5, carts=1, orders=3, stdout=StringIO())
+        call_command('seed_benchmark', clear=True, stdout=StringIO())
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertFalse(User.objects.filter(username__startswith='bench-').exists())
+        self.assertFalse(Order.objects.exists())
+
+    def test_compare_flags_queries_errors_and_real_slowdowns(self):
+        def step(p95_ms, queries=3.0, errors=0):
+            return {'steps': {'products': {'p95_ms': p95_ms, 'queries': queries, 'errors': errors}}}
+
+        baseline = step(10.0)
+        self.assertEqual(compare(step(14.0), baseline, 0.25), [])  # 40% slower but only 4ms: noise
+        self.assertEqual(compare(step(2.0), step(1.0), 0.25), [])
+        self.assertEqual(len(compare(step(16.0), baseline, 0.25)), 1)
+        self.assertEqual(compare(step(10.0, queries=4.0), baseline, 0.25), ["products: queries/request 3.0 -> 4.0"])
+        self.assertEqual(compare(step(10.0, errors=2), baseline, 0.25), ["products: 2 server errors"])
+
+
+# --- ORDER HISTORY ---
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()  # "My Orders" pages cached by earlier tests' users with the same ids
+        self.user = User.objects.create(username='buyer')
+        self.product = make_products(1)[0]
+        self.client.force_login(self.user)
+
+    def order(self, status='Pending', **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.user, total_amount=100, status=status, **fields)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=100)
+        return order
+
+    def statuses(self, page=1):
+        response = self.client.get(reverse('order_history'), {'page': page})
+        return [order['status'] for order in response.context['page']['orders']]
+
+    def test_a_cached_page_runs_no_order_queries(self):
+        self.order()
+        self.statuses()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.statuses(), ['Pending'])
+        self.assertFalse([q for q in queries if Order._meta.db_table in q['sql']])
+
+    def test_placing_an_order_expires_the_history(self):
+        CartItem.objects.create(cart=Cart.objects.create(user=self.user), product=self.product)
+        self.assertEqual(self.statuses(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('process_order'), {**CHECKOUT_FORM, 'payment_method': 'Cash on Delivery'})
+        self.assertEqual(self.statuses(), ['Processing'])
+
+    def test_status_change_expires_every_page(self):
+        oldest = self.order()
+        for _ in range(10):
+            self.order('Paid')
+        self.assertEqual(self.statuses(page=2), ['Pending'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            oldest.status = 'Payment Failed'
+            oldest.save()
+        self.assertEqual(self.statuses(page=2), ['Payment Failed'])
+
+    def test_payment_callback_expires_the_history(self):
+        self.order(checkout_request_id='ws_CO_1')
+        self.assertEqual(self.statuses(), ['Pending'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reconcile_callback({'Body': {'stkCallback': {'CheckoutRequestID': 'ws_CO_1', 'ResultCode': 0}}})
+        self.assertEqual(self.statuses(), ['Paid'])
+
+
+# --- ORDER STATUS STREAM ---
+
+class OrderStatusStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='buyer')
+        self.order = Order.objects.create(user=self.user, total_amount=100, status='Pending', payment_method='M-Pesa')
+        self.url = reverse('order_status_stream', args=[self.order.pk])
+
+    def test_wsgi_answers_once_and_the_browser_polls(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+
+        self.assertFalse(response.streaming)  # no worker thread held open
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = response.content.decode()
+        self.assertTrue(body.startswith('retry: '))
+        self.assertIn('"status": "Pending"', body)
+
+        Order.objects.filter(pk=self.order.pk).update(status='Paid')
+        body = self.client.get(self.url).content.decode()
+        self.assertNotIn('retry: ', body)  # final: EventSource is closed by the page
+        self.assertIn('"status": "Paid"', body)
+
+    def test_only_the_owner_can_follow_an_order(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(User.objects.create(username='someone-else'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    async def test_asgi_streams(self):
+        await Order.objects.filter(pk=self.order.pk).aupdate(status='Paid')
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+
+        self.assertTrue(response.streaming)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(body.count('event: status'), 1)  # Paid is final: the stream ends
+
+
+# --- ORDER ARCHIVE ---
+
+class OrderArchiveTests(TestCase):
+    def setUp(self):
+        cache.clear()  # "My Orders" pages cached by earlier tests' users with the same ids
+        self.user = User.objects.create(username='buyer')
+        self.product = make_products(1)[0]
+        self.old = timezone.now() - timedelta(days=400)
+        self.orders = {
+            label: self.order(status, method, created_at)
+            for label, status, method, created_at in [
+                ('paid', 'Paid', 'M-Pesa', self.old),
+                ('cod', 'Processing', 'Cash on Delivery', self.old),
+                ('failed', 'Payment Failed', 'M-Pesa', self.old),
+                ('awaiting_mpesa', 'Processing', 'M-Pesa', self.old),
+                ('pending', 'Pending', 'M-Pesa', self.old),
+                ('recent', 'Paid', 'M-Pesa', timezone.now()),
+            ]
+        }
+
+    def order(self, status, payment_method, created_at):
+        order = Order.objects.create(
+            user=self.user, total_amount=300, status=status, payment_method=payment_method, created_at=created_at,
+        )
+        OrderItem.objects.create(order=order, product=self.product, quantity=3, price=100)
+        return order
+
+    def test_old_finished_and_cash_on_delivery_orders_move(self):
+        archive_orders(days=365)
+
+        moved = {'paid', 'cod', 'failed'}
+        moved_ids = {self.orders[label].pk for label in moved}
+        self.assertEqual(set(ArchivedOrder.objects.values_list('pk', flat=True)), moved_ids)
+        self.assertEqual(set(ArchivedOrderItem.objects.values_list('order_id', flat=True)), moved_ids)
+        self.assertEqual(
+            set(Order.objects.values_list('pk', flat=True)),
+            {order.pk for label, order in self.orders.items() if label not in moved},
+        )
+        self.assertEqual(ArchivedOrder.objects.get(pk=self.orders['cod'].pk).status, 'Processing')
+        self.assertTrue(Profile.objects.get(user=self.user).has_archived_orders)
+
+    def test_reports_and_export_read_both_tables(self):
+        start, end = timezone.localdate(self.old) - timedelta(days=1), timezone.localdate()
+        before = build_report(start, end)
+        export_before = list(export_rows(start, end))
+
+        archive_orders(days=365)
+
+        after = build_report(start, end)
+        self.assertEqual((after['revenue'], after['order_count']), (before['revenue'], before['order_count']))
+        self.assertEqual(after['top_sellers'], before['top_sellers'])
+        self.assertEqual(list(export_rows(start, end)), export_before)
+
+    def test_order_history_links_to_the_archive_without_querying_it(self):
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get(reverse('order_history')), '?archived=1')
+
+        with self.captureOnCommitCallbacks(execute=True):  # expires the cached page
+            archive_orders(days=365)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('order_history'))
+        self.assertContains(response, '?archived=1')
+        self.assertFalse([q for q in queries if ArchivedOrder._meta.db_table in q['sql']])
+
+        response = self.client.get(reverse('order_history') + '?archived=1')
+        self.assertContains(response, f"Order #{self.orders['cod'].pk}")
+        self.assertNotContains(response, f"Order #{self.orders['pending'].pk}")
+
+
+# --- SALES ANALYTICS ---
+
+class SalesReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        users = [User.objects.create_user(f'buyer{i}', password='pw') for i in range(3)] + [None]
+        categories = [Category.objects.create(name=name, slug=name.lower()) for name in ('Bags', 'Shoes')]
+        products = make_products(2, categories[0]) + make_products(2, categories[1])
+        statuses = ['Paid', 'Processing', 'Complete', 'Pending', 'Payment Failed']
+        now = timezone.now()
+        for i in range(40):
+            order = Order.objects.create(
+                user=users[i % 4], total_amount=0, status=statuses[i % 5],
+                created_at=now - timedelta(days=i * 2, hours=i),
+            )
+            lines = [(products[(i + j) % 4], 1 + (i + j) % 3, Decimal(10 + i) + Decimal(j) / 4) for j in range(1 + i % 2)]
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=quantity, price=price) for product, quantity, price in lines
+            )
+            Order.objects.filter(pk=order.pk).update(total_amount=sum(q * p for _, q, p in lines))
+        self.start, self.end = timezone.localdate() - timedelta(days=60), timezone.localdate()
+
+    def per_row_report(self, start, end):
+        """The report as the dashboard used to compute it: ORM aggregates and Python loops."""
+        orders = Order.objects.filter(
+            status__in=SALES_STATUSES, created_at__date__gte=start, created_at__date__lte=end,
+        )
+        lines = OrderItem.objects.filter(order__in=orders)
+        daily = {
+            row['day']: (row['revenue'], row['count'])
+            for row in orders.annotate(day=TruncDate('created_at')).values('day')
+            .annotate(revenue=Sum('total_amount'), count=Count('id'))
+        }
+        line_revenue = Sum(F('quantity') * F('price'))
+        first_orders = {}
+        for user_id, created_at in orders.filter(user__isnull=False).order_by('created_at').values_list('user_id', 'created_at'):
+            first_orders.setdefault(user_id, []).append(created_at)
+        cohorts = {}
+        for dates in first_orders.values():
+            month = timezone.localdate(dates[0]).replace(day=1)
+            customers, repeaters = cohorts.get(month, (0, 0))
+            cohorts[month] = (customers + 1, repeaters + (len(dates) > 1))
+        totals = orders.aggregate(revenue=Sum('total_amount'), count=Count('id'))
+        return {
+            'revenue': round(float(totals['revenue'] or 0), 2),
+            'order_count': totals['count'],
+            'daily': [
+                (start + timedelta(days=i), *daily.get(start + timedelta(days=i), (0, 0)))
+                for i in range((end - start).days + 1)
+            ],
+            'top_sellers': [
+                (row['product'], round(float(row['revenue']), 2), row['units'])
+                for row in lines.values('product').annotate(revenue=line_revenue, units=Sum('quantity'))
+                .order_by('-revenue', 'product')[:10]
+            ],
+            'categories': [
+                (row['product__category__name'], round(float(row['revenue']), 2), row['units'])
+                for row in lines.values('product__category__name').annotate(revenue=line_revenue, units=Sum('quantity'))
+                .order_by('-revenue')
+            ],
+            'cohorts': [(month, *counts) for month, counts in sorted(cohorts.items())],
+        }
+
+    def test_matches_the_per_row_computation(self):
+        report = build_report(self.start, self.end)
+        expected = self.per_row_report(self.start, self.end)
+
+        self.assertEqual(report['revenue'], expected['revenue'])
+        self.assertEqual(report['order_count'], expected['order_count'])
+        self.assertEqual(
+            [(day['date'], day['revenue'], day['order_count']) for day in report['daily']],
+            [(day, round(float(revenue), 2), count) for day, revenue, count in expected['daily']],
+        )
+        self.assertEqual(
+            [(row['product_id'], row['revenue'], row['units']) for row in report['top_sellers']],
+            expected['top_sellers'],
+        )
+        self.assertEqual([(row['name'], row['revenue'], row['units']) for row in report['categories']], expected['categories'])
+        self.assertEqual(
+            [(row['month'], row['customers'], row['repeat_customers']) for row in report['cohorts']],
+            expected['cohorts'],
+        )
+
+    def test_late_payment_in_a_closed_month_expires_the_cached_report(self):
+        order = Order.objects.filter(status='Pending', created_at__lt=timezone.now() - timedelta(days=40)).first()
+        before = get_sales_report(self.start, self.end)
+
+        order.status = 'Paid'
+        with self.captureOnCommitCallbacks(execute=True):
+            order.save()
+
+        after = get_sales_report(self.start, self.end)
+        self.assertEqual(after['order_count'], before['order_count'] + 1)
+        self.assertEqual(after['revenue'], round(before['revenue'] + float(order.total_amount), 2))
+
+    def test_range_is_clamped(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('sales_dashboard'), {'start': '1900-01-01', 'end': '2999-12-31'})
+        report = response.context['report']
+        self.assertEqual(report['end'], timezone.localdate())
+        self.assertEqual(report['start'], timezone.localdate() - timedelta(days=MAX_REPORT_DAYS - 1))
+
+
+# --- PROFILING ---
+
+@override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0)
+class ProfilingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+
+    def test_staff_header_profiles_the_request(self):
+        self.client.force_login(self.staff)
+        self.client.get(reverse('home'))
+        self.assertEqual(get_profiles(), {})
+
+        self.client.get(reverse('home'), HTTP_X_PROFILE='1')
+        self.assertEqual(get_profiles()['home']['requests'], 1)
+        response = self.client.get(reverse('profile_collapsed', args=['home']))
+        self.assertEqual(response.status_code, 200)
+
+    def test_header_from_a_customer_is_ignored(self):
+        self.client.force_login(User.objects.create_user('buyer', password='pw'))
+        self.client.get(reverse('home'), HTTP_X_PROFILE='1')
+        self.assertEqual(get_profiles(), {})
+
+    def test_samples_the_stack_of_the_running_request(self):
+        def slow_view(request):
+            time.sleep(0.1)
+            return HttpResponse()
+
+        request = RequestFactory().get('/', HTTP_X_PROFILE='1')
+        request.user = self.staff
+        SamplingProfilerMiddleware(slow_view)(request)
+
+        stacks = get_profiles()['unresolved']['stacks']
+        self.assertTrue(any(stack.endswith('app.tests:slow_view') for stack in stacks))
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_removed_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SamplingProfilerMiddleware(lambda request: HttpResponse())
+
+
+# --- WARM-UP ---
+
+class WarmUpTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fresh_index(self, facet_index)
+        fresh_index(self, autocomplete_index)
+        make_products(3)
+
+    def test_every_step_runs_without_errors(self):
+        report = warm_up()
+
+        self.assertEqual([name for name, *_ in report], [name for name, _ in STEPS])
+        self.assertEqual({name: errors for name, _, _, errors in report}, {name: [] for name, _ in STEPS})
+        self.assertEqual(report[-1][2], "4 names")  # three products and their category
+
+    def test_strict_command_fails_on_errors(self):
+        with mock.patch('django.test.Client.get', return_value=HttpResponse(status=500)):
+            with self.assertRaises(CommandError):
+                call_command('warmup', '--step', 'pages', '--strict', stdout=StringIO())
+
+
+# --- JINJA2 STOREFRONT ---
+
+class JinjaStorefrontTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        fresh_index(self, facet_index)
+        self.products = make_products(3)
+        Review.objects.create(product=self.products[0], user=User.objects.create_user('buyer', password='pw'), rating=4, text="Fits well")
+
+    def test_ports_render_the_same_html_as_the_django_templates(self):
+        dtl, jinja = storefront_engines()
+        request = RequestFactory().get('/products/')
+        request.user = AnonymousUser()
+
+        for name, context in build_contexts(3).items():
+            with self.subTest(name):
+                self.assertEqual(
+                    normalize(jinja.get_template(name).render(context, request)),
+                    normalize(dtl.get_template(name).render(context, request)),
+                )
+
+    def test_storefront_pages_use_jinja2_when_enabled(self):
+        with override_settings(TEMPLATES=[settings.STOREFRONT_JINJA2_ENGINE, *settings.TEMPLATES]):
+            response = self.client.get(reverse('products'))
+            self.assertContains(response, self.products[0].name)
+            # Only DTL renders are recorded: the page and its base template came from Jinja2
+            self.assertNotIn('app/products.html', [template.name for template in response.templates])
+
+
+# --- PRODUCT CARDS ---
+
+class ProductCardTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Bags', slug='bags')
+        self.products = Product.objects.bulk_create([
+            Product(category=category, name="Tote", price=100, stock=5, description="Canvas tote " * 20, image='products/tote.jpg'),
+            Product(category=category, name="Clutch", price=80, stock=5, description="Small"),
+            Product(category=category, name="Satchel", price=120, stock=5, description="x" * 30),
+        ])
+
+    def test_cards_match_the_products(self):
+        queryset = Product.objects.order_by('-price')
+        with CaptureQueriesContext(connection) as queries:
+            cards = product_cards(queryset, 30)
+
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SUBSTR', queries[0]['sql'].upper())  # the description is cut in SQL
+        self.assertEqual([card.id for card in cards], [product.pk for product in queryset])
+        for card, product in zip(cards, queryset):
+            with self.subTest(product.name):
+                self.assertEqual((card.name, card.price), (product.name, product.price))
+                # Same text as {{ description|truncatechars:30 }} on the full description
+                self.assertEqual(card.description, Truncator(product.description).chars(30))
+                self.assertEqual(card.image_url, product.image.url if product.image else None)
+
+
+# --- COMPRESSION ---
+
+class CompressionTests(TestCase):
+    BODY = "<p>Hello, world.</p>\n" * 50
+
+    def compress(self, response, accept='gzip', csrf_token=False):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        if csrf_token:
+            get_token(request)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_negotiation(self):
+        with mock.patch('app.compression.brotli', object()):  # as if installed
+            for header, expected in [
+                ('gzip, deflate', 'gzip'),
+                ('gzip, br', 'br'),
+                ('br;q=0.5, gzip', 'gzip'),
+                ('*', 'br'),
+                ('*;q=0, gzip', 'gzip'),
+                ('gzip;q=0', None),
+                ('identity', None),
+                ('', None),
+            ]:
+                with self.subTest(header):
+                    self.assertEqual(choose_encoding(header), expected)
+        with mock.patch('app.compression.brotli', None):
+            self.assertEqual(choose_encoding('br, gzip'), 'gzip')
+
+    def test_gzip(self):
+        response = self.compress(HttpResponse(self.BODY))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content).decode(), self.BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    @skipIf(brotli is None, "the brotli package isn't installed")
+    def test_brotli(self):
+        response = self.compress(HttpResponse(self.BODY), accept='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content).decode(), self.BODY)
+
+    def test_identity_when_nothing_acceptable(self):
+        for accept in ('identity', 'gzip;q=0'):
+            with self.subTest(accept):
+                response = self.compress(HttpResponse(self.BODY), accept=accept)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(response.content.decode(), self.BODY)
+                self.assertIn('Accept-Encoding', response['Vary'])  # another client would get it compressed
+
+    def test_only_compressible_types(self):
+        for content_type in ('image/png', 'text/event-stream', 'application/zip'):
+            with self.subTest(content_type):
+                response = self.compress(HttpResponse(self.BODY, content_type=content_type))
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertFalse(response.has_header('Vary'))
+        response = self.compress(HttpResponse(self.BODY, content_type='application/vnd.api+json'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_short_bodies_are_left_alone(self):
+        response = self.compress(HttpResponse("<p>Hi</p>"))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b"<p>Hi</p>")
+
+    def test_streaming_is_compressed_chunk_by_chunk(self):
+        rows = [f"{i},Product {i},100.00\n" for i in range(5000)]
+        response = self.compress(StreamingHttpResponse(iter(rows), content_type='text/csv'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), 2)  # flushed along the way, not buffered whole
+        self.assertEqual(gzip.decompress(b''.join(chunks)).decode(), ''.join(rows))
+
+    def test_strong_etag_becomes_weak(self):
+        response = HttpResponse(self.BODY)
+        response['ETag'] = '"v1"'
+        self.assertEqual(self.compress(response)['ETag'], 'W/"v1"')
+
+        response = HttpResponse(self.BODY)
+        response['ETag'] = 'W/"v1"'
+        self.assertEqual(self.compress(response)['ETag'], 'W/"v1"')
+
+    def test_pages_with_a_csrf_token_get_padded_gzip(self):
+        with mock.patch('app.compression.brotli', object()):  # brotli would be preferred...
+            response = self.compress(HttpResponse(self.BODY), accept='br, gzip', csrf_token=True)
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')  # ...but it can't be padded
+        self.assertEqual(response.content[3], 0x08)  # FNAME flag: the random-length file name
+        self.assertEqual(gzip.decompress(response.content).decode(), self.BODY)
+        self.assertEqual(self.compress(HttpResponse(self.BODY)).content[3], 0x00)
@@ -1,9 +1,10 @@
 from django.urls import path
-from . import views
+from .views import accounts, analytics, cart, catalogue, checkout, payments
+from . import api
+from . import profiling
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
-from app.views import CustomLoginView
 
 urlpatterns = [
     # 🛑 REMOVED THE PROBLEM LINE: path('mpesa/', views.mpesa_payment, name='mpesa_payment'),
@@ -12,43 +13,61 @@ urlpatterns = [
     # 🟢 M-PESA & CHECKOUT VIEWS (Combined the new paths here)
     # ------------------------------------------------------------------
     # M-Pesa Initiation (Used by the 'Buy Now' form)
-    path('mpesa/initiate/<int:product_id>/', views.initiate_mpesa, name='initiate_mpesa'),
+    path('mpesa/initiate/<int:product_id>/', payments.initiate_mpesa, name='initiate_mpesa'),
     
     # M-Pesa Callback (Used by the Safaricom API)
-    path('mpesa/callback/', views.mpesa_callback, name='mpesa_callback'),
+    path('mpesa/callback/', payments.mpesa_callback, name='mpesa_callback'),
     
     # Cash Checkout (Used by the cash form)
-    path('cash/checkout/<int:product_id>/', views.cash_checkout_view, name='cash_checkout'),
+    path('cash/checkout/<int:product_id>/', checkout.cash_checkout_view, name='cash_checkout'),
     
     # ------------------------------------------------------------------
     # Public Views
     # ------------------------------------------------------------------
-    path('', views.home, name='home'),
-    path('products/', views.products, name='products'),
+    path('', catalogue.home, name='home'),
+    path('products/', catalogue.products, name='products'),
     
     # Detail/Cart Actions (Needs the ID)
-    path('product/<int:pk>/', views.product_detail, name='product_detail'),
-    path('add/<int:product_id>/', views.add_to_cart, name='add_to_cart'), 
-    path('update/<int:product_id>/', views.update_cart, name='update_cart'),
+    path('product/<int:pk>/', catalogue.product_detail, name='product_detail'),
+    path('add/<int:product_id>/', cart.add_to_cart, name='add_to_cart'), 
+    path('update/<int:product_id>/', cart.update_cart, name='update_cart'),
     
     # Authentication Views
     path("login/", auth_views.LoginView.as_view(template_name='app/login.html'), name="login"),
     path("logout/", auth_views.LogoutView.as_view(next_page='/app/login/'), name="logout"),
-    path("register/", views.register_user, name="register"), 
+    path("register/", accounts.register_user, name="register"), 
     
     # User/Cart Views
-    path('cart/', views.cart_view, name='cart_view'),
+    path('cart/', cart.cart_view, name='cart_view'),
     
     # User profile Views
-    path('profile/', views.profile_view, name='profile'),
-    path('profile/edit/', views.profile_edit_view, name='profile_edit'),
-    path('checkout/', views.checkout_view, name='checkout'),
-    path('order/process/', views.process_order, name='process_order'),
+    path('profile/', accounts.profile_view, name='profile'),
+    path('profile/edit/', accounts.profile_edit_view, name='profile_edit'),
+    path('checkout/', checkout.checkout_view, name='checkout'),
+    path('order/process/', checkout.process_order, name='process_order'),
+    path('order/<int:order_id>/confirmation/', checkout.order_confirmation, name='order_confirmation'),
+    # Live payment status for the confirmation page (Server-Sent Events, needs ASGI)
+    path('order/<int:order_id>/status/stream/', payments.order_status_stream, name='order_status_stream'),
+    path('orders/', checkout.order_history, name='order_history'),
     # CATEGORY Views
-    path('categories/', views.categories, name='categories'), 
-    path('categories/update/<slug:category_slug>/', views.update_category, name='update_category'),
-    path('admin/sales/', views.sales_dashboard, name='sales_dashboard'),
-    path('login/', CustomLoginView.as_view(template_name='app/login.html'), name='login'),
+    path('categories/', catalogue.categories, name='categories'), 
+    path('categories/update/<slug:category_slug>/', catalogue.update_category, name='update_category'),
+    path('dashboard/sales/', analytics.sales_dashboard, name='sales_dashboard'),
+    path('dashboard/sales/export.csv', analytics.sales_export, name='sales_export'),
+    path('dashboard/object-cache/', analytics.object_cache_stats, name='object_cache_stats'),
+    path('dashboard/profiles/', profiling.profile_list, name='profile_list'),
+    path('dashboard/profiles/reset/', profiling.profile_reset, name='profile_reset'),
+    path('dashboard/profiles/<str:url_name>.txt', profiling.profile_collapsed, name='profile_collapsed'),
+
+    # ------------------------------------------------------------------
+    # JSON API (read-only catalogue, see app/api.py)
+    # ------------------------------------------------------------------
+    path('api/products/', api.product_list, name='api_products'),
+    path('api/categories/', api.category_list, name='api_categories'),
+    path('api/product-changes/', api.product_change_feed, name='api_product_changes'),
+    path('api/autocomplete/', api.autocomplete, name='api_autocomplete'),
+
+    path('login/', accounts.CustomLoginView.as_view(template_name='app/login.html'), name='login'),
 ]
 
 # Static/Media Files Configuration (Keep this at the end)
@@ -0,0 +1,28 @@
+# retailshop/app/views/
+# The views, one module per area of the shop:
+#   catalogue  - home, products, product detail, categories
+#   cart       - shopping cart
+#   checkout   - checkout and the customer's orders
+#   payments   - M-Pesa "Buy Now", callback and live payment status
+#   analytics  - staff sales dashboard, object cache hit rates
+#   accounts   - registration, login, profile
+#
+# Re-exported here so `from app import views; views.home` keeps working.
+
+from .accounts import CustomLoginView, profile_edit_view, profile_view, register_user
+from .analytics import object_cache_stats, parse_report_range, sales_dashboard, sales_export
+from .cart import add_to_cart, cart_view, update_cart
+from .catalogue import categories, home, product_detail, products, update_category
+from .checkout import (
+    cash_checkout_view, checkout_view, generic_checkout_view, order_confirmation, order_history, process_order,
+)
+from .payments import initiate_mpesa, mpesa_callback, order_status_stream
+
+__all__ = [
+    'CustomLoginView', 'profile_edit_view', 'profile_view', 'register_user',
+    'object_cache_stats', 'parse_report_range', 'sales_dashboard', 'sales_export',
+    'add_to_cart', 'cart_view', 'update_cart',
+    'categories', 'home', 'product_detail', 'products', 'update_category',
+    'cash_checkout_view', 'checkout_view', 'generic_checkout_view', 'order_confirmation', 'order_history', 'process_order',
+    'initiate_mpesa', 'mpesa_callback', 'order_status_stream',
+]
@@ -0,0 +1,103 @@
+# retailshop/app/views/accounts.py
+# Registration, login and the user's profile.
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import LoginView as BaseLoginView
+from django.db import transaction
+from django.shortcuts import redirect, render
+from django.urls import reverse_lazy
+
+from ..forms import ProfileUpdateForm, UserRegisterForm, UserUpdateForm
+from ..models import Profile, get_user_profile
+
+
+# --- USER AUTHENTICATION VIEWS ---
+
+def register_user(request):
+    """Handles user registration using the UserRegisterForm."""
+    if request.method == 'POST':
+        # 🟢 CRITICAL FIX: Include request.FILES for file uploads (like profile_image)
+        form = UserRegisterForm(request.POST, request.FILES) 
+        
+        if form.is_valid():
+            user = form.save()
+            # Create the Profile here (once) instead of via a post_save signal on every User save
+            Profile.objects.create(user=user)
+            username = form.cleaned_data.get('username')
+            messages.success(request, f'Account created for {username}! You can now log in.')
+            return redirect('login') 
+            
+        # 🟢 If validation fails, the form object (with errors) is passed to the context.
+        # This is where the errors are finally visible in your custom template.
+            
+    else:
+        form = UserRegisterForm()
+        
+    context = {'form': form, 'title': 'Register'}
+    # Standard render call is correct.
+    return render(request, 'app/register.html', context)
+
+
+# --- USER PROFILE VIEWS ---    
+
+#  PROFILE VIEW (Basic implementation)
+@login_required(login_url='login')
+def profile_view(request):
+    """Renders the user profile page."""
+    context = {
+        'user': request.user,
+        # Already loaded with the user by ProfileModelBackend (no extra query)
+        'profile': get_user_profile(request.user),
+        'title': 'User Profile'
+    }
+    return render(request, 'app/profile.html', context)
+
+
+# 🎯 PROFILE EDIT VIEW (Basic implementation)
+@login_required(login_url='login')
+@transaction.atomic # Ensures both forms are saved or neither is
+def profile_edit_view(request):
+    """Handles updating User and Profile data."""
+    profile = get_user_profile(request.user)
+    if request.method == 'POST':
+        u_form = UserUpdateForm(request.POST, instance=request.user)
+        p_form = ProfileUpdateForm(request.POST, request.FILES, instance=profile)
+        
+        if u_form.is_valid() and p_form.is_valid():
+            u_form.save()
+            p_form.save()
+            messages.success(request, 'Your account has been updated!')
+            return redirect('profile')
+            
+    else:
+        u_form = UserUpdateForm(instance=request.user)
+        p_form = ProfileUpdateForm(instance=profile)
+        
+    context = {
+        'u_form': u_form,
+        'p_form': p_form,
+        'title': 'Edit Profile'
+    }
+    return render(request, 'app/profile_edit.html', context)
+
+
+# 🎯 CUSTOM LOGIN VIEW
+class CustomLoginView(BaseLoginView):
+    """
+    A custom login view that ensures the 'next' parameter is respected,
+    making sure the user returns to the page they intended (e.g., 'add to cart').
+    """
+    def get_success_url(self):
+        # 1. Check if the 'next' parameter is present in the GET request
+        # This will contain the URL the user was trying to access (e.g., /add-to-cart/5/)
+        next_url = self.request.GET.get('next')
+
+        if next_url:
+            # If 'next' is present, return to that URL
+            return next_url
+        
+        # 2. If 'next' is NOT present (regular login from navbar), 
+        # fall back to the cart view explicitly.
+        # This completely overrides the LOGIN_REDIRECT_URL setting.
+        return reverse_lazy('cart_view')
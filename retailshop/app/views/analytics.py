@@ -0,0 +1,66 @@
+# retailshop/app/views/analytics.py
+# Staff sales dashboard and CSV export (the numbers come from app/analytics.py),
+# and the object cache hit rates.
+
+from datetime import timedelta
+
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import redirect, render
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ..analytics import clamp_range, export_rows, get_sales_report
+from ..object_cache import OBJECT_CACHES
+
+
+def parse_report_range(request):
+    """?start=YYYY-MM-DD&end=YYYY-MM-DD, defaulting to the last 30 days (clamped, see clamp_range)."""
+    today = timezone.localdate()
+    end = parse_date(request.GET.get('end') or '') or today
+    start = parse_date(request.GET.get('start') or '') or end - timedelta(days=29)
+    if start > end:
+        start, end = end, start
+    return clamp_range(start, end)
+
+
+@staff_member_required # Ensures only staff/superusers can access
+def sales_dashboard(request):
+    """KPIs, daily history, top sellers, category revenue and cohorts for any date range."""
+    try:
+        start, end = parse_report_range(request)
+    except ValueError:
+        # parse_date raises on well-formed but impossible dates (e.g. 2024-02-31)
+        messages.error(request, "Invalid date range.")
+        return redirect('sales_dashboard')
+
+    report = get_sales_report(start, end)
+
+    context = {
+        'report': report,
+        'total_sales': report['revenue'],
+        'recent_sales_count': report['last_7_days_orders'],
+        'recent_sales_revenue': report['last_7_days_revenue'],
+        'sales_history': report['daily'][::-1], # Display newest dates first
+    }
+    return render(request, 'app/sales_dashboard.html', context)
+
+
+@staff_member_required
+def sales_export(request):
+    """Streams every sales order line of the range as CSV (never held in memory)."""
+    try:
+        start, end = parse_report_range(request)
+    except ValueError:
+        return HttpResponse("Invalid date range.", status=400)
+
+    response = StreamingHttpResponse(export_rows(start, end), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="sales-{start}-to-{end}.csv"'
+    return response
+
+
+@staff_member_required
+def object_cache_stats(request):
+    """Hits, misses, coalesced misses and hit rate of each object cache (app/object_cache.py), all processes."""
+    return JsonResponse({name: object_cache.stats() for name, object_cache in OBJECT_CACHES.items()})
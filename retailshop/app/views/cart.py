@@ -0,0 +1,135 @@
+# retailshop/app/views/cart.py
+# Shopping cart: add, view, change quantities.
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db.models import F
+from django.shortcuts import redirect, render
+
+from ..models import Cart, CartItem
+from ..object_cache import product_cache
+
+
+#  ADD TO CART VIEW (Consolidated, database-driven)
+ 
+@login_required(login_url='login')
+def add_to_cart(request, product_id):
+    
+    # From the object cache (app/object_cache.py): no product query on a hit
+    product = product_cache.get_or_404(product_id)
+    cart, _ = Cart.objects.get_or_create(user=request.user)
+    
+    # --- DETERMINE QUANTITY BASED ON REQUEST TYPE ---
+    
+    quantity = 1  # Default quantity for all requests unless specified otherwise
+    
+    if request.method == 'POST':
+        # Logic for POST (coming from the Product Detail page form)
+        try:
+            quantity = int(request.POST.get('quantity', 1))
+        except ValueError:
+            quantity = 1
+    
+    elif request.method == 'GET':
+        # Logic for GET (coming from the Home Page direct link)
+        # We check the URL query string for a quantity, otherwise, it remains the default of 1.
+        try:
+            # We assume you updated the home link to include ?quantity=1 (as previously advised)
+            # Example: <a href="{% url 'add_to_cart' product.id %}?quantity=1" ...>
+            quantity_param = request.GET.get('quantity')
+            if quantity_param:
+                 quantity = int(quantity_param)
+        except (TypeError, ValueError):
+            quantity = 1 # Fallback to 1
+    
+    # Ensure quantity is valid before proceeding
+    if quantity <= 0:
+        messages.error(request, "Invalid quantity specified.")
+        return redirect('cart_view')
+
+
+    # --- CORE ADD/UPDATE LOGIC (Moved outside of the request method check) ---
+    
+    # 2. Try to retrieve the existing CartItem or create a new one
+    cart_item, created = CartItem.objects.get_or_create(
+        cart=cart, 
+        product=product,
+        # If it's a new item, 'defaults' will set the initial quantity
+        defaults={'quantity': quantity} 
+    )
+
+    if created:
+        # 3. If a new item was created
+        messages.success(request, f"Added {quantity} x '{product.name}' to your cart.")
+    else:
+        # 4. If the item already exists, update its quantity atomically
+        cart_item.quantity = F('quantity') + quantity
+        cart_item.save()
+        cart_item.refresh_from_db() # Reload to see the updated value for the message.
+        
+        messages.success(
+            request, 
+            f"Added {quantity} more to the cart. Total: {cart_item.quantity} x {product.name}."
+        )
+    
+    return redirect('cart_view')
+#  CART VIEW
+@login_required(login_url='login')
+def cart_view(request):
+    """Renders the shopping cart page with items and totals."""
+    try:
+        # The user's cart is loaded together with request.user (see app/backends.py),
+        # so this raises Cart.DoesNotExist without a query if there's no cart yet
+        cart = request.user.cart
+        
+        # One query for the items; their products come from the object cache in one batch
+        cart_items = cart.items_with_products()
+        
+        # Calculate totals
+        cart_total = sum(item.subtotal() for item in cart_items)
+        
+        context = {
+            "cart_items": cart_items,
+            "cart_total": cart_total,
+        }
+    except Cart.DoesNotExist:
+        # Handle the case where the user hasn't added anything yet (no cart object)
+        context = {
+            "cart_items": [],
+            "cart_total": 0.00,
+        }
+        
+    return render(request, "app/cart.html", context)
+
+
+# UPDATE CART VIEW
+@login_required(login_url='login')
+def update_cart(request, product_id):
+    """
+    Handles POST request to update the quantity of a CartItem.
+    The product_id is needed to find the specific CartItem for the current user.
+    """
+    if request.method == 'POST':
+        # 1. Get the new quantity from the form
+        new_quantity = request.POST.get('quantity')
+
+        # 2. Find the CartItem for the current user and product
+        try:
+            cart_item = CartItem.objects.get(
+                cart__user=request.user, 
+                product__pk=product_id
+            )
+            
+            if new_quantity and int(new_quantity) > 0:
+                cart_item.quantity = int(new_quantity)
+                cart_item.save()
+                messages.success(request, f"Quantity for {cart_item.product.name} updated.")
+            elif int(new_quantity) == 0:
+                cart_item.delete()
+                messages.warning(request, f"{cart_item.product.name} removed from cart.")
+                
+        except CartItem.DoesNotExist:
+            messages.error(request, "Item not found in your cart.")
+            
+    # Always redirect back to the cart page
+    return redirect('cart_view')
@@ -0,0 +1,187 @@
+# retailshop/app/views/catalogue.py
+# Storefront pages: home, product list (facets + search), product detail, categories.
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.paginator import Paginator
+from django.db.models import Avg, Q
+from django.shortcuts import get_object_or_404, redirect, render
+
+from ..facets import facet_options, facet_snapshot, parse_facet_filters
+from ..forms import CategoryForm
+from ..http_cache import conditional_catalogue_page, product_detail_version, products_version
+from ..category_tree import category_tree
+from ..models import Category, Product, ProductRecommendation
+from ..object_cache import cached_product
+from ..product_cards import product_cards
+
+
+# 🎯 HOME VIEW
+HOME_DESCRIPTION_CHARS = 50
+
+@conditional_catalogue_page()
+def home(request):
+    """
+    Renders the homepage, fetching categories for banners 
+    and a selection of random products for the main feed.
+    """
+    
+    # 1. Top-level categories for the banners (each lists its subcategories),
+    # from the cached category tree: no category queries at all
+    categories = category_tree(request).roots
+    
+    # 2. Fetch Randomized Products for the Main Feed
+    # We fetch up to 8 products randomly. 
+    # The '.order_by('?').' is crucial for random selection.
+    # Cards only: 5 columns, the description cut down in SQL (see app/product_cards.py)
+    try:
+        random_products = product_cards(Product.objects.all().order_by('?')[:8], HOME_DESCRIPTION_CHARS)
+    except Exception as e:
+        # Fallback in case the random order fails (e.g., if the DB is empty or misconfigured)
+        print(f"Error fetching random products: {e}")
+        random_products = []
+
+    context = {
+        'categories': categories,        # Used for the Category Banners section
+        'random_products': random_products, # Used for the Randomized Product Feed section
+    }
+    return render(request, 'app/home.html', context)
+
+
+# 🎯 PRODUCTS VIEW (Consolidated, database-driven)
+PRODUCTS_PER_PAGE = 24
+PRODUCT_CARD_DESCRIPTION_CHARS = 100  # the card shows one line of it
+
+@conditional_catalogue_page(products_version)
+def products(request):
+    """
+    Renders the product listing page: faceted filtering (category, price range, in stock,
+    rating) with live counts, plus text search. Facets come from the in-memory
+    index in app/facets.py, so the counts cost no queries.
+    """
+    
+    # 1. The category tree (for sidebar/filter menu), cached
+    tree = category_tree(request)
+    title = "All Products"
+    
+    # 2. Read the selected facets (?category=&price=&in_stock=&rating=)
+    selected = parse_facet_filters(request)
+    category_name = request.GET.get('category')
+    if category_name:
+        title = f"Products in {category_name}"
+    
+    # 3. Handle Search (text search stays in SQL; facets are then limited to its results)
+    search_query = request.GET.get('q')
+    search_ids = None
+    if search_query:
+        search_ids = Product.objects.filter(
+            Q(name__icontains=search_query) | Q(description__icontains=search_query)
+        ).values_list('pk', flat=True)
+        title = f"Search Results for '{search_query}'"
+
+    # 4. Matching ids + counts from the facet index (the snapshot the ETag came from),
+    # then load only this page's products
+    matching_ids, counts = facet_snapshot(request).search(selected, restrict_to=search_ids)
+    paginator = Paginator(matching_ids, PRODUCTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('page'))
+    page_products = product_cards(
+        Product.objects.filter(pk__in=page.object_list).order_by('pk'), PRODUCT_CARD_DESCRIPTION_CHARS
+    )
+
+    # 5. Prepare the context dictionary
+    context = {
+        'title': title,
+        'products': page_products,
+        'page': page,
+        'result_count': paginator.count,
+        'categories': tree.nodes,
+        'facets': facet_options(tree, selected, counts),
+        'selected_category': category_name, 
+    }
+    
+    return render(request, 'app/products.html', context)
+
+
+# 🎯 PRODUCT DETAIL VIEW (Consolidated, database-driven with reviews)
+RELATED_PRODUCTS = 3
+
+@conditional_catalogue_page(product_detail_version)
+def product_detail(request, pk):
+    """Fetches a single product and related data from the database."""
+    
+    # The product and its category by primary key, from the object cache (app/object_cache.py),
+    # the same copies the ETag came from
+    product = cached_product(request, pk)
+    
+    # Fetch Reviews/Ratings
+    reviews = product.reviews.all().order_by('-created_at') 
+    
+    # Calculate average rating
+    average_rating = reviews.aggregate(Avg('rating'))['rating__avg']
+    
+    # Fetch Related Products: precomputed "customers also bought" (one indexed lookup),
+    # topped up with random same-category products for new items with no sales yet
+    related_products = [
+        rec.recommended for rec in
+        ProductRecommendation.objects.filter(product_id=pk).select_related('recommended').order_by('rank')[:RELATED_PRODUCTS]
+    ]
+    if len(related_products) < RELATED_PRODUCTS:
+        related_products += Product.objects.filter(
+            category_id=product.category_id
+        ).exclude(pk__in=[pk] + [p.pk for p in related_products]).order_by('?')[:RELATED_PRODUCTS - len(related_products)]
+    
+    context = {
+        "product": product,
+        "reviews": reviews,
+        "average_rating": average_rating,
+        "related_products": related_products,
+    }
+    
+    return render(request, "app/product_detail.html", context)
+
+
+# --- PRODUCT CATEGORY VIEWS ---
+@conditional_catalogue_page()
+def categories(request):
+    """Renders the category tree: a card per top-level category, with its subcategories."""
+    
+    # The cached tree: no queries, and product counts include the subcategories
+    all_categories = category_tree(request).roots
+    
+    context = {
+        'categories': all_categories,
+        'title': 'All Product Categories'
+    }
+    
+    return render(request, 'app/categories.html', context)
+
+
+@login_required(login_url='login')
+def update_category(request, category_slug):
+    """
+    Handles updating an existing Category object.
+    Requires a category_slug to fetch the object.
+    """
+    # 1. Fetch the existing category instance using the slug
+    category = get_object_or_404(Category, slug=category_slug)
+
+    if request.method == 'POST':
+        # 2. Bind the POST data and the existing instance to the form
+        form = CategoryForm(request.POST, instance=category)
+        
+        if form.is_valid():
+            form.save()
+            messages.success(request, f"Category '{category.name}' updated successfully.")
+            # Redirect to the category list or the updated category's page
+            return redirect('categories')  # Assuming you have a 'categories' list view
+
+    else:
+        # 3. For GET request, pre-populate the form with existing instance data
+        form = CategoryForm(instance=category)
+    
+    context = {
+        'form': form,
+        'category': category,
+        'title': f"Update Category: {category.name}"
+    }
+    return render(request, 'app/update_category.html', context)
@@ -0,0 +1,292 @@
+# retailshop/app/views/checkout.py
+# Checkout (whole cart, M-Pesa or cash on delivery) and the customer's orders.
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import transaction
+from django.db.models import Prefetch, Sum
+from django.http import Http404
+from django.shortcuts import redirect, render
+
+from ..forms import CheckoutForm
+from ..jobs import enqueue  # M-Pesa calls run in background jobs (see app/tasks.py), not inside the request
+from ..models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, Order, OrderItem, ORDER_HISTORY_CACHE_TIMEOUT, get_user_profile,
+    order_history_version,
+)
+from ..object_cache import product_cache
+
+
+@login_required(login_url='login')
+def checkout_view(request):
+    """
+    Renders the final checkout page, confirming cart contents and collecting
+    final order details (like address and selected payment method) using the CheckoutForm.
+    """
+    
+    # Fetch the user's cart and calculate total
+    try:
+        # Cart comes with request.user; the products come from the object cache in one batch
+        cart = request.user.cart
+        cart_items = cart.items_with_products()
+        cart_total = sum(item.subtotal() for item in cart_items)
+    except Cart.DoesNotExist:
+        messages.error(request, "Your cart is empty.")
+        return redirect('products') # Redirect if nothing to checkout
+
+    # 🟢 CRITICAL: Instantiate the CheckoutForm
+    address_form = CheckoutForm()
+
+    context = {
+        'cart': cart,             # Pass the cart object itself (used for get_total_price on button)
+        'cart_items': cart_items,
+        'cart_total': cart_total,
+        'address_form': address_form, # Pass the instantiated form to the template
+    }
+    
+    return render(request, 'app/checkout.html', context)
+
+
+@login_required(login_url='login')
+@transaction.atomic # Ensures all database changes are saved together
+def process_order(request):
+    """
+    Handles form submission from checkout, creates the Order, and initiates payment.
+    """
+    if request.method == 'POST':
+        # 1. Fetch Cart and Cart Total
+        try:
+            cart = request.user.cart
+            cart_total = cart.get_total_price() # 🟢 Automatically fetches the dynamic total
+            
+            if cart_total <= 0:
+                messages.error(request, "Your cart is empty or the total is zero.")
+                return redirect('cart_view')
+                
+        except Cart.DoesNotExist:
+            messages.error(request, "Your cart is empty.")
+            return redirect('products')
+
+        # 2. Extract Data from POST
+        address_form = CheckoutForm(request.POST)
+        payment_method = request.POST.get('payment_method')
+        fulfillment_method = request.POST.get('fulfillment_method') # From the radio button
+        
+        # M-Pesa specific field (may be empty if Cash is selected)
+        mpesa_phone_number = request.POST.get('phone_number')
+
+        if address_form.is_valid():
+            
+            # --- Address/Fulfillment Handling ---
+            if fulfillment_method == 'Delivery':
+                # Use cleaned data only if delivery is selected
+                shipping_address = {
+                    'first_name': address_form.cleaned_data['first_name'],
+                    'phone_number': address_form.cleaned_data['phone_number'],
+                    'address_line_1': address_form.cleaned_data['address_line_1'],
+                    'city': address_form.cleaned_data['city'],
+                    # ... include all necessary address fields
+                }
+            else:
+                # Set shipping details to empty if Pickup is selected
+                shipping_address = {}
+
+
+            # 3. Create the Order Object (Status is Pending until payment confirms)
+            order = Order.objects.create(
+                user=request.user,
+                total_amount=cart_total,
+                payment_method=payment_method,
+                status='Pending', # Initial Status
+                fulfillment_method=fulfillment_method,
+                
+                # Apply shipping address only if Delivery was chosen
+                **shipping_address
+            )
+
+            # 4. Transfer CartItems to OrderItems
+            # IMPORTANT: Assuming you have an OrderItem model defined!
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=cart_item.product,
+                    quantity=cart_item.quantity,
+                    price=cart_item.product.price # Save the price at the time of purchase
+                )
+                for cart_item in cart.items.select_related('product')
+            ])
+
+            # --- PAYMENT METHOD EXECUTION ---
+            if payment_method == 'M-Pesa':
+                
+                # Check for required M-Pesa phone number
+                if not mpesa_phone_number or not mpesa_phone_number.startswith('2547'):
+                    messages.error(request, "Invalid M-Pesa phone number. Must be in 2547XXXXXXXX format.")
+                    # 🛑 CRITICAL: Delete the order since payment cannot be initiated
+                    order.delete() 
+                    return redirect('checkout')
+
+                # 5. Queue the M-Pesa STK Push (committed together with the order)
+                # Amount must be an integer and cannot be zero or negative
+                amount_int = max(1, int(cart_total)) 
+                enqueue(
+                    'payments.stk_push',
+                    {
+                        'order_id': order.id,
+                        'phone_number': mpesa_phone_number,
+                        'amount': amount_int,
+                        'account_reference': f"ORD{order.id}", # Unique identifier tied to the order
+                        'transaction_desc': f"Payment for Order #{order.id}",
+                    },
+                    idempotency_key=f"stk-push:order-{order.id}",
+                )
+
+                # 6. Clear the Cart (if the push fails for good, the order is marked 'Payment Failed')
+                cart.items.all().delete()
+                
+                messages.success(request, f"M-Pesa STK Push initiated for Ksh {amount_int}. Please check your phone!")
+                return redirect('order_confirmation', order_id=order.id)
+
+
+            elif payment_method == 'Cash on Delivery':
+                # 5. Handle Cash on Delivery (COD)
+                order.status = 'Processing' # Or 'Pending COD'
+                order.payment_status = 'Pending COD'
+                order.save()
+                
+                # 6. Clear the Cart
+                cart.items.all().delete()
+                
+                messages.success(request, f"Order #{order.id} placed successfully! You will pay cash on {fulfillment_method}.")
+                return redirect('order_confirmation', order_id=order.id)
+
+        else:
+            # Form validation failed
+            messages.error(request, "Please correct the errors in the shipping details.")
+            return redirect('checkout')
+            
+    return redirect('checkout')
+
+
+@login_required(login_url='login')
+def generic_checkout_view(request):
+    messages.info(request, "This is the generic checkout page. Logic needs implementation.")
+    # Implement cart checkout logic here
+    return render(request, 'app/checkout.html', {})
+
+# 🎯 CASH CHECKOUT VIEW (Placeholder - kept for completeness)
+@login_required(login_url='login')
+def cash_checkout_view(request, product_id):
+    """Handles the Cash payment/order confirmation."""
+    # Note: Use the quantity from the POST request if needed, but for 'Buy Now' quantity is usually 1.
+    product = product_cache.get_or_404(product_id)
+    
+    if request.method == 'POST':
+        # 1. Get quantity (from the hidden form field)
+        quantity = request.POST.get('quantity', 1)
+        
+        # 2. Implement Order Creation/Storage with Payment Type='Cash' here
+        # Example: Order.objects.create(user=request.user, product=product, quantity=quantity, payment_type='Cash')
+        
+        messages.success(request, f"Order for {quantity} x {product.name} confirmed. You will pay Cash on Delivery/Collection.")
+        return redirect('home') # Redirect to a success page
+
+    return redirect('products') # Redirect if accessed via GET
+
+
+# --- ORDER VIEWS ---
+
+ORDERS_PER_PAGE = 10
+
+def order_items_prefetch(item_model=OrderItem):
+    """Loads every order's items AND their products in one extra query (no N+1)."""
+    return Prefetch('items', queryset=item_model.objects.select_related('product').order_by('pk'))
+
+
+@login_required(login_url='login')
+def order_confirmation(request, order_id):
+    """Shows one order, archived ones included. Users can only see their own orders."""
+    order = (
+        Order.objects.prefetch_related(order_items_prefetch()).filter(pk=order_id, user=request.user).first()
+        or ArchivedOrder.objects.prefetch_related(order_items_prefetch(ArchivedOrderItem))
+        .filter(pk=order_id, user=request.user).first()
+    )
+    if order is None:
+        raise Http404("No such order.")
+    context = {
+        'order': order,
+        'order_items': order.items.all(),
+        'title': f"Order #{order.id} Confirmed",
+    }
+    return render(request, 'app/order_confirmation.html', context)
+
+
+@login_required(login_url='login')
+def order_history(request):
+    """
+    "My Orders": paginated, newest first. With ?archived=1, the archived (older) orders.
+    Always 3 queries on a cache miss (count, orders, items+products) no matter how many
+    orders or items there are, and 0 order queries on a hit; whether there are archived
+    orders comes with request.user (Profile.has_archived_orders). The cache is
+    per user and is invalidated whenever one of their orders is created, changed, deleted
+    or archived.
+    """
+    page_number = request.GET.get('page', '1')
+    archived = request.GET.get('archived') == '1'
+    order_model, item_model = (ArchivedOrder, ArchivedOrderItem) if archived else (Order, OrderItem)
+    version = order_history_version(request.user.id)
+    cache_key = f"order-history:{request.user.id}:v{version}:{'archived' if archived else 'recent'}:p{page_number}"
+
+    page_data = cache.get(cache_key)
+    if page_data is None:
+        orders = (
+            order_model.objects.filter(user=request.user)
+            .annotate(item_count=Sum('items__quantity'))  # per-order totals computed in SQL
+            .prefetch_related(order_items_prefetch(item_model))
+            .order_by('-created_at', '-pk')
+        )
+        paginator = Paginator(orders, ORDERS_PER_PAGE)
+        try:
+            page = paginator.page(page_number)
+        except (EmptyPage, PageNotAnInteger):
+            raise Http404("No such page.")
+
+        # Cache plain data (not model instances) so a hit needs no DB at all
+        page_data = {
+            'number': page.number,
+            'num_pages': paginator.num_pages,
+            'has_previous': page.has_previous(),
+            'has_next': page.has_next(),
+            'archived': archived,
+            'has_archived': archived or get_user_profile(request.user).has_archived_orders,
+            'orders': [
+                {
+                    'id': order.id,
+                    'created_at': order.created_at,
+                    'status': order.status,
+                    'payment_method': order.payment_method,
+                    'total_amount': order.total_amount,
+                    'item_count': order.item_count or 0,
+                    'items': [
+                        {
+                            'name': item.product.name if item.product else "(product removed)",
+                            'product_id': item.product_id,
+                            'quantity': item.quantity,
+                            'price': item.price,
+                            'subtotal': item.subtotal(),
+                        }
+                        for item in order.items.all()
+                    ],
+                }
+                for order in page.object_list
+            ],
+        }
+        cache.set(cache_key, page_data, ORDER_HISTORY_CACHE_TIMEOUT)
+
+    context = {
+        'page': page_data,
+        'title': 'My Orders',
+    }
+    return render(request, 'app/order_history.html', context)
@@ -0,0 +1,155 @@
+# retailshop/app/warmup.py
+# Gets a freshly started process to steady-state latency before it takes traffic:
+# compiles the project's templates, populates the URL resolvers, opens the database
+# connections, runs the hot pages (home, products, product_detail) once, and builds
+# the autocomplete index.
+#
+# Two ways to run it:
+#   - `manage.py warmup` after a deploy: reports per-step timings and warms what is
+#     shared between processes (database caches and plans, Redis entries).
+#   - WARMUP_ON_STARTUP=1: wsgi.py/asgi.py call warm_up() as each worker boots, which
+#     also warms that worker's own state (template cache, resolvers, facet and autocomplete indexes).
+#     Not with gunicorn --preload: the master would open the DB connections before forking.
+
+import logging
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.urls import get_resolver, reverse
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+# Anonymous GETs of the busiest pages (url name, needs a product id); each runs twice, cold then warm
+HOT_PAGES = [
+    ('home', False),
+    ('products', False),
+    ('product_detail', True),
+]
+
+
+# --- STEPS ---
+
+def project_templates():
+    """(engine, name) for every template in the project's own template dirs (not Django's or admin's)."""
+    base_dir = Path(settings.BASE_DIR).resolve()
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            directory = Path(directory).resolve()
+            if not directory.is_relative_to(base_dir):
+                continue
+            for path in sorted(directory.rglob('*.html')):
+                yield engine, path.relative_to(directory).as_posix()
+
+
+def compile_templates():
+    """Fills the cached template loader, so no request parses a template."""
+    compiled, errors = 0, []
+    for engine, name in project_templates():
+        try:
+            engine.get_template(name)
+            compiled += 1
+        except TemplateSyntaxError as e:
+            errors.append(f"{name}: {e}")
+    return f"{compiled} templates", errors
+
+
+def populate_url_resolvers():
+    """Builds the reverse lookup tables (the first {% url %} otherwise does it) for every namespace."""
+    resolver = get_resolver()
+    resolvers = [resolver]
+    names = 0
+    while resolvers:
+        current = resolvers.pop()
+        names += sum(1 for key in current.reverse_dict if isinstance(key, str))
+        resolvers.extend(sub_resolver for _, sub_resolver in current.namespace_dict.values())
+    return f"{names} URL names", []
+
+
+def open_connections():
+    """Connects every configured database (with a pool configured, this opens the pool)."""
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return f"{len(connections.all())} database(s)", []
+
+
+def warm_pages():
+    """Renders the hot pages as an anonymous visitor: their queries, templates and the facet index."""
+    from django.test import Client  # only needed here, keeps it out of normal worker boot
+
+    latest = Product.objects.order_by('-pk').values_list('pk', flat=True).first()
+    client = Client(HTTP_HOST=warmup_host(), raise_request_exception=False)
+
+    timings, errors = [], []
+    for url_name, needs_product in HOT_PAGES:
+        if needs_product and latest is None:
+            continue
+        url = reverse(url_name, args=[latest] if needs_product else [])
+        milliseconds = []
+        for _ in range(2):
+            start = time.perf_counter()
+            response = client.get(url)
+            milliseconds.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            errors.append(f"{url}: HTTP {response.status_code}")
+        timings.append(f"{url_name} {milliseconds[0]:.0f}ms -> {milliseconds[1]:.0f}ms")
+    return "; ".join(timings), errors
+
+
+def build_autocomplete_index():
+    """Builds this process's search-as-you-type index (app/autocomplete.py) before the first keystroke."""
+    from .autocomplete import autocomplete_index
+    snapshot = autocomplete_index.current()
+    return f"{len(snapshot.base.names)} names", []
+
+
+def warmup_host():
+    """A host name that passes ALLOWED_HOSTS."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and '*' not in host:
+            return host.lstrip('.')
+    return 'localhost'  # allowed when DEBUG=True and ALLOWED_HOSTS is empty
+
+
+STEPS = [
+    ('templates', compile_templates),
+    ('urls', populate_url_resolvers),
+    ('database', open_connections),
+    ('pages', warm_pages),
+    ('autocomplete', build_autocomplete_index),
+]
+
+
+def warm_up(steps=None):
+    """Runs the steps in order; returns [(step, ms, summary, errors)]. Errors don't stop it."""
+    report = []
+    for name, step in STEPS:
+        if steps is not None and name not in steps:
+            continue
+        start = time.perf_counter()
+        try:
+            summary, errors = step()
+        except Exception as e:
+            summary, errors = "failed", [f"{type(e).__name__}: {e}"]
+        report.append((name, (time.perf_counter() - start) * 1000, summary, errors))
+    return report
+
+
+def warm_up_on_startup(close_connections=False):
+    """
+    The WSGI/ASGI hook (WARMUP_ON_STARTUP=1): warms this process and logs the timings.
+    close_connections: under ASGI, sync views run in another thread with its own
+    connection, so the one opened here in the main thread would just sit idle.
+    """
+    report = warm_up()
+    for name, ms, summary, errors in report:
+        logger.info("warmup %s: %.1f ms, %s", name, ms, summary)
+        for error in errors:
+            logger.warning("warmup %s: %s", name, error)
+    if close_connections:
+        connections.close_all()
+    return report
@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'retailshop.settings')
 
 application = get_asgi_application()
+
+# Optional: warm this worker up before it serves traffic (WARMUP_ON_STARTUP=1, see app/warmup.py)
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP_ON_STARTUP:
+    from app.warmup import warm_up_on_startup
+    warm_up_on_startup(close_connections=True)
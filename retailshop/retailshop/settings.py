@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,10 +46,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # brotli/gzip (app/compression.py); high up, so it compresses what the others produced
+    'app.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Removes itself unless PROFILING_ENABLED (needs request.user, so after auth)
+    'app.profiling.SamplingProfilerMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,11 +70,34 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'app.context_processors.cart_summary',
             ],
         },
     },
 ]
 
+# Optional Jinja2 engine for the hot storefront pages (home, products, product_detail),
+# ported to app/jinja2/. Turn it on with STOREFRONT_JINJA2=1 (needs the jinja2 package).
+# It goes first, so those template names resolve to the Jinja2 ports; every other
+# template (admin, sales dashboard, forms...) isn't in app/jinja2/ and stays on DTL.
+# `manage.py bench_templates` compares the two engines.
+STOREFRONT_JINJA2 = os.environ.get('STOREFRONT_JINJA2') == '1'
+STOREFRONT_JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [],
+    'APP_DIRS': True,  # <app>/jinja2/
+    'OPTIONS': {
+        'environment': 'app.jinja_env.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+            'django.contrib.messages.context_processors.messages',
+            'app.context_processors.cart_summary',
+        ],
+    },
+}
+if STOREFRONT_JINJA2:
+    TEMPLATES.insert(0, STOREFRONT_JINJA2_ENGINE)
+
 WSGI_APPLICATION = 'retailshop.wsgi.application'
 
 
@@ -84,6 +112,99 @@ DATABASES = {
 }
 
 
+# Cache
+# Per-process memory cache by default. Set REDIS_URL to share one cache between
+# all worker processes/nodes. 'cache' and 'cached_db' sessions need a shared cache
+# as soon as more than one worker process is running, or workers will see stale sessions.
+# Without Redis, CACHE_DIR gives the processes of ONE machine a shared file-based cache
+# (slower; for development). `manage.py run_workers` refuses to start without either:
+# the jobs expire cached pages (order status, cart totals) the web processes must see.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_DIR = os.environ.get('CACHE_DIR')
+SHARED_CACHE = bool(REDIS_URL or CACHE_DIR)
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': CACHE_DIR,
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'retailshop',
+            # The default (300 entries) is far too small once sessions live in the cache
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        }
+    }
+
+
+# Sessions
+# Choose with the SESSION_MODE environment variable:
+# - 'cached_db' (default): reads come from the cache, writes go to cache + DB
+# - 'cache': cache only (fastest, but sessions are lost if the cache is flushed)
+# - 'signed_cookies': no server-side storage at all, for stateless nodes
+# - 'db': Django's default, every request reads the django_session table
+
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'cached_db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+
+if SESSION_MODE == 'signed_cookies':
+    # Session data is readable (but not forgeable) by the client, keep it out of JS
+    SESSION_COOKIE_HTTPONLY = True
+
+
+# Sampling profiler (app/profiling.py), off unless PROFILING_ENABLED=1.
+# Profiles 1 in PROFILING_SAMPLE_RATE requests (0 = none), plus staff requests sent with
+# an "X-Profile: 1" header. Results: /dashboard/profiles/
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = int(os.environ.get('PROFILING_SAMPLE_RATE', '100'))
+PROFILING_INTERVAL = 0.005  # seconds between stack samples
+
+
+# Response compression (app/compression.py). Brotli needs the `brotli` package; without
+# it everything is gzip. `manage.py bench_compression` compares levels on real pages.
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '5'))
+
+
+# Deploy warm-up (app/warmup.py). `manage.py warmup` can always be run; with
+# WARMUP_ON_STARTUP=1 wsgi.py/asgi.py also warm up every worker as it boots
+# (don't combine with gunicorn --preload).
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP') == '1'
+
+
+# Search-as-you-type index (app/autocomplete.py), one per process. Past this many
+# products only the best-ranked are indexed (about 300 bytes per product name).
+AUTOCOMPLETE_MAX_PRODUCTS = int(os.environ.get('AUTOCOMPLETE_MAX_PRODUCTS', '1000000'))
+
+# Seconds a Product/Category row stays in the object cache (app/object_cache.py).
+# Saves invalidate it in the cache they run against: with Redis that is every process,
+# with the per-process memory cache only the saving one, so the others are kept short.
+OBJECT_CACHE_TIMEOUT = int(os.environ.get('OBJECT_CACHE_TIMEOUT', 15 * 60 if SHARED_CACHE else 30))
+
+# Order archival (app/order_archive.py): Paid, Complete and Payment Failed orders older
+# than this many days move to the archive tables (`manage.py archive_orders`, nightly).
+ORDER_ARCHIVE_AFTER_DAYS = int(os.environ.get('ORDER_ARCHIVE_AFTER_DAYS', '365'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -131,6 +252,9 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Custom auth backend: loads request.user together with its Profile (one query instead of two)
+AUTHENTICATION_BACKENDS = ['app.backends.ProfileModelBackend']
+
 # URL to redirect to after successful login (default is /accounts/profile/)
 LOGIN_URL = 'login/' # Must match the exact path in your urls.py
 
@@ -145,6 +269,10 @@ LOGOUT_REDIRECT_URL = '/' # Redirects to the root URL
 # =====THE MPESA ENVIRONMENT======
 MPESA_ENVIRONMENT = 'sandbox'
 
+# Public URL of the 'mpesa_callback' view (use ngrok or a public URL for a real M-Pesa setup!)
+# Each STK push adds a signed ?ref= to it (app/mpesa.py); callbacks without one are refused.
+MPESA_CALLBACK_URL = 'https://your_public_url.com/app/mpesa/callback/'
+
 # Credentials for the daraja app
 
 MPESA_CONSUMER_KEY = 'mpesa_consumer_key'
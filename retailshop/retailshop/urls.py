@@ -16,8 +16,6 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.contrib.auth import views as auth_views
-from app import views 
 
 urlpatterns = [
     path('admin/', admin.site.urls),   